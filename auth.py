@@ -1,43 +1,318 @@
+import os
+import json
+import time
+import hmac
+import base64
+import hashlib
+import secrets
+import threading
+from datetime import datetime
 from fastapi import HTTPException, Depends, status
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from db import get_db_connection, get_db_cursor
+from fastapi.security import HTTPBasic, HTTPBasicCredentials, HTTPBearer, HTTPAuthorizationCredentials
+from db import get_db_connection, get_db_cursor, release_db_connection, ao_confirmar
+from senhas import hash_password, verify_password, verify_dummy_password, needs_rehash
+from metricas import TEMPO_AUTENTICACAO, medir
 
-security = HTTPBasic(auto_error=True)
+security = HTTPBasic(auto_error=False)
+bearer = HTTPBearer(auto_error=False)
+
+# Cache de usuários autenticados: evita consultar o banco a cada requisição
+AUTH_CACHE_TTL = float(os.environ.get('AUTH_CACHE_TTL', 60))
+AUTH_CACHE_MAX = int(os.environ.get('AUTH_CACHE_MAX', 1024))
+
+_auth_cache = {}  # digest das credenciais -> (usuario, expira_em)
+_auth_cache_lock = threading.Lock()
+_auth_cache_key = os.urandom(32)
+
+def _credentials_digest(email: str, senha: str) -> str:
+    return hmac.new(_auth_cache_key, f"{email}\x00{senha}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+def _cache_get(digest: str):
+    with _auth_cache_lock:
+        entry = _auth_cache.get(digest)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if expires_at < time.monotonic():
+            del _auth_cache[digest]
+            return None
+        return dict(user)
+
+def _cache_put(digest: str, user: dict):
+    with _auth_cache_lock:
+        if len(_auth_cache) >= AUTH_CACHE_MAX:
+            now = time.monotonic()
+            for key in [k for k, (_, exp) in _auth_cache.items() if exp < now]:
+                del _auth_cache[key]
+            while len(_auth_cache) >= AUTH_CACHE_MAX:
+                del _auth_cache[next(iter(_auth_cache))]
+        _auth_cache[digest] = (dict(user), time.monotonic() + AUTH_CACHE_TTL)
+
+def invalidate_auth_cache(id_usuario: int = None):
+    """Remove do cache as credenciais de um usuário (ou todas, se id_usuario for None)"""
+    with _auth_cache_lock:
+        if id_usuario is None:
+            _auth_cache.clear()
+            return
+        for key in [k for k, (user, _) in _auth_cache.items() if user.get("id_usuario") == id_usuario]:
+            del _auth_cache[key]
+
+# Tokens de sessão: HMAC-SHA256 sobre o payload, validados sem acesso ao banco.
+# Com vários workers, todos precisam do mesmo AUTH_SECRET: sem ele cada
+# processo sorteia a própria chave e recusa os tokens emitidos pelos outros.
+AUTH_SECRET = os.environ.get('AUTH_SECRET', '').encode("utf-8")
+if not AUTH_SECRET:
+    print("=" * 60)
+    print("AVISO: AUTH_SECRET não definido; usando uma chave aleatória.")
+    print("Os tokens deixam de valer ao reiniciar a API e não são aceitos")
+    print("por outros workers. Defina AUTH_SECRET em produção.")
+    print("=" * 60)
+    AUTH_SECRET = secrets.token_bytes(32)
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 8 * 3600))
+
+# Revogações ficam na tabela token_revogado, compartilhada entre processos.
+# Cada processo mantém uma cópia em memória: recarregada quando o listener de
+# notificacoes.py conecta e atualizada pelo NOTIFY do trigger da tabela.
+_revoked_tokens = {}   # jti -> expiração do token
+_revoked_before = {}   # id_usuario -> (tokens emitidos até este instante são inválidos, expiração da regra)
+_revocation_lock = threading.Lock()
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(AUTH_SECRET, payload.encode("ascii"), hashlib.sha256).digest())
+
+def _token_error(detail: str):
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def create_token(user: dict) -> dict:
+    """Emite um token assinado para o usuário autenticado"""
+    now = time.time()
+    claims = {
+        "sub": user["id_usuario"],
+        "nome": user.get("nome"),
+        "email": user.get("email"),
+        "tipo": user.get("tipo_usuario"),
+        "iat": now,
+        "exp": int(now) + AUTH_TOKEN_TTL,
+        "jti": secrets.token_hex(16),
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return {
+        "access_token": f"{payload}.{_sign(payload)}",
+        "token_type": "bearer",
+        "expires_in": AUTH_TOKEN_TTL,
+    }
+
+def decode_token(token: str) -> dict:
+    """Valida assinatura, expiração e revogação; retorna as claims do token"""
+    # Caracteres não ASCII no token geram UnicodeEncodeError (um ValueError)
+    try:
+        payload, signature = token.split(".")
+        valida = hmac.compare_digest(signature.encode("ascii"), _sign(payload).encode("ascii"))
+    except ValueError:
+        raise _token_error("Token inválido")
+    if not valida:
+        raise _token_error("Token inválido")
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        raise _token_error("Token inválido")
+    if not isinstance(claims, dict):
+        raise _token_error("Token inválido")
+    if claims.get("exp", 0) < time.time():
+        raise _token_error("Token expirado")
+    with _revocation_lock:
+        if claims.get("jti") in _revoked_tokens:
+            raise _token_error("Token revogado")
+        revogado_ate, _ = _revoked_before.get(claims.get("sub"), (0, 0))
+        if claims.get("iat", 0) <= revogado_ate:
+            raise _token_error("Token revogado")
+    return claims
+
+def verify_token(token: str) -> dict:
+    claims = decode_token(token)
+    return {
+        "id_usuario": claims["sub"],
+        "nome": claims.get("nome"),
+        "email": claims.get("email"),
+        "tipo_usuario": claims.get("tipo"),
+    }
+
+def _record_revocation(cursor, id_usuario: int, jti: str, revogado_em: float, expira_em: float):
+    """Grava a revogação na transação de `cursor`.
+
+    O trigger de token_revogado publica a linha no commit; este processo
+    aplica a revogação na memória logo após o commit (ao_confirmar).
+    """
+    cursor.execute("DELETE FROM token_revogado WHERE expira_em < now()")
+    cursor.execute(
+        """
+        INSERT INTO token_revogado (jti, id_usuario, revogado_em, expira_em)
+        VALUES (%s, %s, to_timestamp(%s), to_timestamp(%s))
+        """,
+        (jti, id_usuario, revogado_em, expira_em)
+    )
+    ao_confirmar(cursor.connection, lambda: _apply_revocation(id_usuario, jti, revogado_em, expira_em))
+
+def _apply_revocation(id_usuario: int, jti: str, revogado_em: float, expira_em: float):
+    now = time.time()
+    with _revocation_lock:
+        for key in [j for j, exp in _revoked_tokens.items() if exp < now]:
+            del _revoked_tokens[key]
+        for key in [u for u, (_, exp) in _revoked_before.items() if exp < now]:
+            del _revoked_before[key]
+        if jti is not None:
+            _revoked_tokens[jti] = expira_em
+        elif revogado_em > _revoked_before.get(id_usuario, (0, 0))[0]:
+            _revoked_before[id_usuario] = (revogado_em, expira_em)
+    if jti is None:
+        # Senha, e-mail ou tipo podem ter mudado: as credenciais em cache não valem mais
+        invalidate_auth_cache(id_usuario)
+
+def apply_revocation_notice(dados: dict):
+    """Aplica uma revogação recebida pelo NOTIFY de token_revogado (notificacoes.py)"""
+    _apply_revocation(
+        dados["id_usuario"],
+        dados.get("jti"),
+        datetime.fromisoformat(dados["revogado_em"]).timestamp(),
+        datetime.fromisoformat(dados["expira_em"]).timestamp(),
+    )
+
+def load_revocations():
+    """Substitui a cópia em memória pelas revogações em vigor no banco.
+
+    Chamada a cada conexão do listener: cobre as notificações perdidas
+    enquanto ele esteve desconectado.
+    """
+    conn = get_db_connection()
+    cursor = get_db_cursor(conn)
+    try:
+        cursor.execute(
+            """
+            SELECT jti, id_usuario,
+                   EXTRACT(EPOCH FROM revogado_em)::float8 AS revogado_em,
+                   EXTRACT(EPOCH FROM expira_em)::float8 AS expira_em
+            FROM token_revogado
+            WHERE expira_em >= now()
+            """
+        )
+        tokens, usuarios = {}, {}
+        for row in cursor.fetchall():
+            if row["jti"] is not None:
+                tokens[row["jti"]] = row["expira_em"]
+            elif row["revogado_em"] > usuarios.get(row["id_usuario"], (0, 0))[0]:
+                usuarios[row["id_usuario"]] = (row["revogado_em"], row["expira_em"])
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+    with _revocation_lock:
+        _revoked_tokens.clear()
+        _revoked_tokens.update(tokens)
+        _revoked_before.clear()
+        _revoked_before.update(usuarios)
+    # Usuários alterados por outros processos enquanto o listener esteve desconectado
+    invalidate_auth_cache()
+
+def revoke_token(token: str):
+    """Revoga um token (logout) em todos os processos"""
+    claims = decode_token(token)
+    conn = get_db_connection()
+    cursor = get_db_cursor(conn)
+    try:
+        _record_revocation(cursor, claims["sub"], claims["jti"], time.time(), claims["exp"])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+def revoke_user_tokens(cursor, id_usuario: int):
+    """Invalida, na transação de `cursor`, os tokens e o cache de credenciais do usuário.
+
+    Vale em todos os processos a partir do commit; se a transação for
+    desfeita, nada muda.
+    """
+    now = time.time()
+    _record_revocation(cursor, id_usuario, None, now, now + AUTH_TOKEN_TTL)
 
 def verify_credentials(credentials: HTTPBasicCredentials = Depends(security)):
+    with medir(TEMPO_AUTENTICACAO):
+        return _verify_credentials(credentials)
+
+def _verify_credentials(credentials: HTTPBasicCredentials):
     if not credentials or not credentials.username or not credentials.password:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciais ausentes",
             headers={"WWW-Authenticate": "Basic"},
         )
-    
+
+    digest = _credentials_digest(credentials.username, credentials.password)
+    cached = _cache_get(digest)
+    if cached is not None:
+        return cached
+
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     
     try:
         cursor.execute(
-            "SELECT id_usuario, nome, email, tipo_usuario FROM usuario WHERE email = %s AND senha = %s",
-            (credentials.username, credentials.password)
+            "SELECT id_usuario, nome, email, tipo_usuario, senha FROM usuario WHERE email = %s",
+            (credentials.username,)
         )
         user = cursor.fetchone()
         
         if not user:
+            # Mesmo custo de scrypt de um e-mail existente: o tempo de resposta
+            # não revela quais contas existem
+            verify_dummy_password(credentials.password)
+        if not user or not verify_password(credentials.username, credentials.password, user["senha"]):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Credenciais inválidas",
                 headers={"WWW-Authenticate": "Basic"},
             )
-        
-        return dict(user)
+
+        user = dict(user)
+        stored = user.pop("senha")
+        if needs_rehash(stored):
+            # Migra senhas em texto puro (ou com parâmetros antigos) no primeiro login
+            cursor.execute(
+                "UPDATE usuario SET senha = %s WHERE id_usuario = %s AND senha = %s",
+                (hash_password(credentials.password), user["id_usuario"], stored)
+            )
+            conn.commit()
+
+        _cache_put(digest, user)
+        return user
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
+
+def get_current_user(
+    token: HTTPAuthorizationCredentials = Depends(bearer),
+    credentials: HTTPBasicCredentials = Depends(security),
+):
+    """Aceita token Bearer (sem acesso ao banco) ou HTTP Basic (compatibilidade)"""
+    if token is not None:
+        return verify_token(token.credentials)
+    return verify_credentials(credentials)
 
-def require_auth(user: dict = Depends(verify_credentials)):
+def require_auth(user: dict = Depends(get_current_user)):
     return user
 
-def require_admin(user: dict = Depends(verify_credentials)):
+def require_admin(user: dict = Depends(get_current_user)):
     if user.get("tipo_usuario") != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -45,7 +320,7 @@ def require_admin(user: dict = Depends(verify_credentials)):
         )
     return user
 
-def require_admin_for_user_ops(user: dict = Depends(verify_credentials)):
+def require_admin_for_user_ops(user: dict = Depends(get_current_user)):
     """Operações de usuário são exclusivas para administradores"""
     if user.get("tipo_usuario") != "admin":
         raise HTTPException(
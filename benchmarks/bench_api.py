@@ -0,0 +1,236 @@
+"""Benchmark de carga da API em processo, contra o banco de benchmark.
+
+Sobe a aplicação FastAPI no próprio processo (httpx + ASGITransport, com o
+lifespan da API) e dispara clientes concorrentes em cada cenário por um
+tempo fixo, depois de um aquecimento:
+
+- leitura_autenticada: listagens e buscas por ID com HTTP Basic a cada requisição
+- pdv_itens: lançamento de itens em comandas abertas (POST /api/item_comanda/)
+- reservas: disponibilidade de campos e reservas de um dia
+- exportacao: exportação completa de movimentações (NDJSON em streaming)
+
+O resultado (vazão, percentis de latência e status por cenário, junto com o
+commit, a configuração e os volumes do banco) é gravado em JSON; compare dois
+arquivos com benchmarks/comparar.py.
+
+Uso:
+    python benchmarks/popular_banco.py            # uma vez (recria o banco)
+    python benchmarks/bench_api.py [--duracao 20] [--cenarios pdv_itens,reservas]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import psycopg2
+from popular_banco import argumentos_banco, configurar_banco, RAIZ
+import db
+
+ADMIN = ("admin@pinheiro.com", "admin123")
+FUNCIONARIO = ("funcionario@pinheiro.com", "func123")
+
+def _contexto_banco():
+    """Ids e datas do banco de benchmark usados para montar as requisições"""
+    conn = psycopg2.connect(**db.DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id_comanda FROM comanda WHERE status = 'aberta' ORDER BY id_comanda")
+            abertas = [row[0] for row in cur.fetchall()]
+            cur.execute("SELECT id_produto FROM produto ORDER BY id_produto")
+            produtos = [row[0] for row in cur.fetchall()]
+            cur.execute("SELECT MAX(id_comanda) FROM comanda")
+            max_comanda = cur.fetchone()[0]
+            cur.execute("SELECT MIN(data), MAX(data) FROM reserva")
+            reserva_min, reserva_max = cur.fetchone()
+            volumes = {}
+            for tabela in ("cliente", "produto", "comanda", "item_comanda", "movimenta", "reserva"):
+                cur.execute(f"SELECT COUNT(*) FROM {tabela}")
+                volumes[tabela] = cur.fetchone()[0]
+            cur.execute("SHOW server_version")
+            versao = cur.fetchone()[0]
+    finally:
+        conn.close()
+    if not abertas or not produtos or reserva_min is None:
+        raise SystemExit("Banco de benchmark vazio: rode benchmarks/popular_banco.py antes")
+    return {
+        "abertas": abertas,
+        "produtos": produtos,
+        "max_comanda": max_comanda,
+        "reserva_min": reserva_min,
+        "reserva_max": reserva_max,
+        "volumes": volumes,
+        "postgres": versao,
+    }
+
+def _dia(rng, inicio: date, fim: date) -> date:
+    return inicio + timedelta(days=rng.randint(0, max((fim - inicio).days, 0)))
+
+# Cada cenário gera (método, url, kwargs do httpx) a partir de um Random próprio do cliente
+def _leitura_autenticada(rng, ctx):
+    auth = ADMIN if rng.random() < 0.5 else FUNCIONARIO
+    escolha = rng.random()
+    if escolha < 0.4:
+        return "GET", "/api/produtos/", {"params": {"limit": 50}, "auth": auth}
+    if escolha < 0.6:
+        return "GET", "/api/mesas/", {"auth": auth}
+    if escolha < 0.8:
+        return "GET", "/api/comandas/", {"params": {"status": "aberta", "limit": 50}, "auth": auth}
+    return "GET", f"/api/comandas/{rng.randint(1, ctx['max_comanda'])}", {"auth": auth}
+
+def _pdv_itens(rng, ctx):
+    item = {
+        "id_comanda": rng.choice(ctx["abertas"]),
+        "id_produto": rng.choice(ctx["produtos"]),
+        "quantidade": rng.randint(1, 3),
+    }
+    return "POST", "/api/item_comanda/", {"json": item, "auth": FUNCIONARIO}
+
+def _reservas(rng, ctx):
+    dia = _dia(rng, ctx["reserva_min"], ctx["reserva_max"])
+    if rng.random() < 0.5:
+        params = {"data_inicio": dia.isoformat(), "data_fim": (dia + timedelta(days=6)).isoformat()}
+        return "GET", "/api/reservas/disponibilidade", {"params": params, "auth": FUNCIONARIO}
+    return "GET", "/api/reservas/", {"params": {"data": dia.isoformat(), "limit": 100}, "auth": FUNCIONARIO}
+
+def _exportacao(rng, ctx):
+    return "GET", "/api/movimentas/export", {"params": {"formato": "ndjson"}, "auth": ADMIN}
+
+# nome -> (gerador de requisições, concorrência padrão)
+CENARIOS = {
+    "leitura_autenticada": (_leitura_autenticada, 16),
+    "pdv_itens": (_pdv_itens, 16),
+    "reservas": (_reservas, 8),
+    "exportacao": (_exportacao, 2),
+}
+
+def _percentil(ordenadas, p):
+    if not ordenadas:
+        return None
+    return round(ordenadas[min(len(ordenadas) - 1, int(p / 100 * len(ordenadas)))], 3)
+
+async def _cliente(http, gerar, ctx, semente, ate, amostras):
+    rng = random.Random(semente)
+    while time.perf_counter() < ate:
+        metodo, url, kwargs = gerar(rng, ctx)
+        inicio = time.perf_counter()
+        try:
+            resposta = await http.request(metodo, url, **kwargs)
+            status = resposta.status_code
+            tamanho = len(resposta.content)
+        except Exception as e:
+            status, tamanho = type(e).__name__, 0
+        amostras.append((time.perf_counter() - inicio, status, tamanho))
+
+async def _rodar_cenario(http, nome, ctx, duracao, aquecimento, concorrencia):
+    gerar, padrao = CENARIOS[nome]
+    concorrencia = concorrencia or padrao
+    if aquecimento > 0:
+        fim = time.perf_counter() + aquecimento
+        await asyncio.gather(*[_cliente(http, gerar, ctx, 1000 + i, fim, []) for i in range(concorrencia)])
+
+    amostras = []
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+    await asyncio.gather(*[_cliente(http, gerar, ctx, i, fim, amostras) for i in range(concorrencia)])
+    decorrido = time.perf_counter() - inicio
+
+    latencias = sorted(a[0] * 1000 for a in amostras)
+    por_status = {}
+    for _, status, _ in amostras:
+        por_status[str(status)] = por_status.get(str(status), 0) + 1
+    erros = sum(n for status, n in por_status.items() if not status.startswith("2"))
+    return {
+        "concorrencia": concorrencia,
+        "duracao_s": round(decorrido, 3),
+        "requisicoes": len(amostras),
+        "erros": erros,
+        "vazao_rps": round(len(amostras) / decorrido, 2),
+        "bytes_recebidos": sum(a[2] for a in amostras),
+        "latencia_ms": {
+            "media": round(sum(latencias) / len(latencias), 3) if latencias else None,
+            "p50": _percentil(latencias, 50),
+            "p90": _percentil(latencias, 90),
+            "p95": _percentil(latencias, 95),
+            "p99": _percentil(latencias, 99),
+            "max": round(latencias[-1], 3) if latencias else None,
+        },
+        "status": por_status,
+    }
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return "desconhecido"
+
+async def _executar(args, nomes, ctx):
+    import main
+    resultados = {}
+    async with main.lifespan(main.app):
+        transporte = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as http:
+            for nome in nomes:
+                print(f"Cenário {nome}...")
+                resultado = await _rodar_cenario(http, nome, ctx, args.duracao, args.aquecimento, args.concorrencia)
+                lat = resultado["latencia_ms"]
+                print(
+                    f"  {resultado['vazao_rps']:9.1f} req/s  p50 {lat['p50'] or 0:8.2f} ms  "
+                    f"p95 {lat['p95'] or 0:8.2f} ms  p99 {lat['p99'] or 0:8.2f} ms  erros {resultado['erros']}"
+                )
+                resultados[nome] = resultado
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga da API")
+    argumentos_banco(parser)
+    parser.add_argument("--cenarios", default=",".join(CENARIOS), help="lista separada por vírgula")
+    parser.add_argument("--duracao", type=float, default=20.0, help="segundos medidos por cenário")
+    parser.add_argument("--aquecimento", type=float, default=3.0, help="segundos descartados antes da medição")
+    parser.add_argument("--concorrencia", type=int, default=None, help="clientes simultâneos (padrão por cenário)")
+    parser.add_argument("--saida", default=None, help="arquivo JSON de resultado")
+    args = parser.parse_args()
+
+    nomes = [n.strip() for n in args.cenarios.split(",") if n.strip()]
+    desconhecidos = [n for n in nomes if n not in CENARIOS]
+    if desconhecidos:
+        parser.error(f"cenários desconhecidos: {', '.join(desconhecidos)} (disponíveis: {', '.join(CENARIOS)})")
+
+    configurar_banco(args)
+    ctx = _contexto_banco()
+    commit = _commit()
+    resultados = asyncio.run(_executar(args, nomes, ctx))
+
+    relatorio = {
+        "commit": commit,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "postgres": ctx["postgres"],
+            "pool_max": db.POOL_CONFIG["maxconn"],
+        },
+        "config": {"duracao_s": args.duracao, "aquecimento_s": args.aquecimento, "concorrencia": args.concorrencia},
+        "volumes": ctx["volumes"],
+        "cenarios": resultados,
+    }
+    saida = args.saida or os.path.join(RAIZ, "benchmarks", "resultados", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultado gravado em {saida}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
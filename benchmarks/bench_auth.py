@@ -0,0 +1,60 @@
+"""Benchmark do custo de autenticação em regime estável.
+
+Mede o scrypt "frio" (primeira requisição de uma sessão) e o caminho quente
+(cache de verificação e cache de usuários autenticados do auth.py), falhando
+com código de saída 1 se o caminho quente passar do limite configurado.
+
+Uso: python benchmarks/bench_auth.py [--limit-us 50] [--iterations 100000]
+Não precisa de banco de dados.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.security import HTTPBasicCredentials
+import auth
+from senhas import hash_password, verify_password
+
+def _per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limit-us", type=float, default=50.0)
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+
+    email, senha = "bench@pinheiro.com", "senha-de-teste"
+    stored = hash_password(senha)
+
+    start = time.perf_counter()
+    assert verify_password(email, senha, stored)
+    cold_us = (time.perf_counter() - start) * 1_000_000
+
+    warm_us = _per_call_us(lambda: verify_password(email, senha, stored), args.iterations)
+
+    # Caminho completo de verify_credentials com o usuário já em cache
+    credentials = HTTPBasicCredentials(username=email, password=senha)
+    user = {"id_usuario": 1, "nome": "Bench", "email": email, "tipo_usuario": "admin"}
+    auth._cache_put(auth._credentials_digest(email, senha), user)
+    request_us = _per_call_us(lambda: auth.verify_credentials(credentials), args.iterations)
+
+    print(f"scrypt (primeira verificação): {cold_us:10.1f} us")
+    print(f"verify_password em cache:      {warm_us:10.2f} us")
+    print(f"verify_credentials em cache:   {request_us:10.2f} us")
+
+    worst = max(warm_us, request_us)
+    if worst > args.limit_us:
+        print(f"FALHOU: {worst:.2f} us > limite de {args.limit_us:.0f} us")
+        return 1
+    print(f"OK: abaixo do limite de {args.limit_us:.0f} us")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
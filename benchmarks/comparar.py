@@ -0,0 +1,71 @@
+"""Compara dois resultados de benchmarks/bench_api.py.
+
+Mostra, por cenário, vazão e percentis de latência da base e do candidato
+com a variação percentual, e sai com código 1 se algum cenário regredir
+mais que --limite (em %) na vazão ou no p95.
+
+Uso: python benchmarks/comparar.py base.json candidato.json [--limite 10]
+"""
+import sys
+import json
+import argparse
+
+METRICAS = [
+    ("vazao_rps", "req/s", True),
+    ("p50", "p50 ms", False),
+    ("p95", "p95 ms", False),
+    ("p99", "p99 ms", False),
+]
+
+def _valor(cenario, chave):
+    if chave in cenario:
+        return cenario[chave]
+    return cenario["latencia_ms"].get(chave)
+
+def _variacao(base, candidato):
+    if not base or candidato is None:
+        return None
+    return (candidato - base) / base * 100
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base")
+    parser.add_argument("candidato")
+    parser.add_argument("--limite", type=float, default=10.0, help="regressão máxima aceita (%%)")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as arquivo:
+        base = json.load(arquivo)
+    with open(args.candidato, encoding="utf-8") as arquivo:
+        candidato = json.load(arquivo)
+
+    print(f"base {base['commit']} ({base['data']})  x  candidato {candidato['commit']} ({candidato['data']})")
+    if base.get("volumes") != candidato.get("volumes"):
+        print("Aviso: volumes do banco diferentes entre os dois resultados")
+
+    regressoes = []
+    for nome, cenario in candidato["cenarios"].items():
+        if nome not in base["cenarios"]:
+            print(f"\n{nome}: sem resultado na base")
+            continue
+        print(f"\n{nome}")
+        for chave, rotulo, maior_melhor in METRICAS:
+            antes = _valor(base["cenarios"][nome], chave)
+            depois = _valor(cenario, chave)
+            variacao = _variacao(antes, depois)
+            texto = f"{variacao:+7.1f}%" if variacao is not None else "      -"
+            print(f"  {rotulo:<7} {antes or 0:10.2f} -> {depois or 0:10.2f}  {texto}")
+            if variacao is None or chave not in ("vazao_rps", "p95"):
+                continue
+            piora = -variacao if maior_melhor else variacao
+            if piora > args.limite:
+                regressoes.append(f"{nome} {rotulo} {variacao:+.1f}%")
+
+    if regressoes:
+        print(f"\nFALHOU: regressões acima de {args.limite:.0f}%: {', '.join(regressoes)}")
+        return 1
+    print(f"\nOK: nenhuma regressão acima de {args.limite:.0f}%")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
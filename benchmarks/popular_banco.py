@@ -0,0 +1,201 @@
+"""Cria e popula um banco de benchmark com volumes realistas.
+
+Recria o banco informado (padrão: arena_pinheiro_bench) a partir de
+sql/create_database_complete.sql e gera os dados com generate_series, de
+forma determinística (mesmos volumes => mesmos dados), para que resultados
+de commits diferentes sejam comparáveis.
+
+Volumes padrão: 100 mil comandas, 1 milhão de itens de comanda, 500 mil
+movimentações, 20 mil clientes, 500 produtos e 20 mil reservas.
+Use --escala 0.1 para uma carga menor durante o desenvolvimento.
+
+Uso: python benchmarks/popular_banco.py [--database arena_pinheiro_bench] [--escala 1.0]
+ATENÇÃO: o banco informado é apagado e recriado.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+import db
+from relatorios import atualizar_relatorios
+from visoes import VISOES_MATERIALIZADAS, atualizar_visao
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_SQL = os.path.join(RAIZ, "sql", "create_database_complete.sql")
+BANCO_PADRAO = "arena_pinheiro_bench"
+
+VOLUMES = {
+    "clientes": 20_000,
+    "produtos": 500,
+    "mesas": 40,
+    "comandas": 100_000,
+    "itens_comanda": 1_000_000,
+    "movimentas": 500_000,
+    "reservas": 20_000,
+}
+
+# Comandas mais recentes ficam abertas: são os alvos do cenário de lançamento de itens
+COMANDAS_ABERTAS = 500
+# Horários de reserva por campo e dia (08:00, 10:00, ..., 20:00, 2 horas cada)
+HORARIOS_RESERVA = 7
+DIAS_HISTORICO = 730
+
+CARGA = [
+    ("clientes", """
+        INSERT INTO cliente (cpf, nome, email, tipo, id_usuario_cadastrou)
+        SELECT lpad(i::text, 11, '0'), 'Cliente ' || i, 'cliente' || i || '@exemplo.com',
+               CASE WHEN i %% 10 = 0 THEN 'socio' ELSE 'avulso' END, %(admin)s
+        FROM generate_series(1, %(clientes)s) i
+    """),
+    ("produtos", """
+        INSERT INTO produto (nome, preco, quant_min_estoque, id_usuario_cadastrou)
+        SELECT 'Produto ' || i, 2 + (i * 37 %% 4800) / 100.0, 10, %(admin)s
+        FROM generate_series(1, %(produtos)s) i
+    """),
+    # Saldo alto: o cenário de PDV não deve esbarrar em estoque insuficiente
+    ("estoque", """
+        INSERT INTO estoque (id_produto, quant_present)
+        SELECT id_produto, 1000000000 FROM produto
+    """),
+    ("mesas", """
+        INSERT INTO mesa (numero, status)
+        SELECT i, 'disponivel' FROM generate_series(1, %(mesas)s) i
+        ON CONFLICT (numero) DO NOTHING
+    """),
+    ("comandas", """
+        INSERT INTO comanda (data, status, numero_mesa, cpf_cliente, id_usuario_responsavel)
+        SELECT CURRENT_DATE - ((%(comandas)s - i) * %(dias)s / %(comandas)s),
+               CASE WHEN i > %(comandas)s - %(abertas)s THEN 'aberta' ELSE 'fechada' END,
+               1 + i %% %(mesas)s,
+               CASE WHEN i %% 3 = 0 THEN lpad((1 + i %% %(clientes)s)::text, 11, '0') END,
+               CASE WHEN i %% 2 = 0 THEN %(admin)s ELSE %(funcionario)s END
+        FROM generate_series(1, %(comandas)s) i
+    """),
+    ("itens_comanda", """
+        INSERT INTO item_comanda (id_comanda, id_produto, quantidade, preco_unitario)
+        SELECT 1 + i %% %(comandas)s, p.id_produto, 1 + i %% 3, p.preco
+        FROM generate_series(1, %(itens_comanda)s) i
+        JOIN produto p ON p.id_produto = 1 + (i::bigint * 7919) %% %(produtos)s
+    """),
+    ("totais_comanda", """
+        UPDATE comanda c
+        SET subtotal = t.subtotal, quant_itens = t.quant_itens, atualizado_em = NOW()
+        FROM (
+            SELECT id_comanda, SUM(quantidade * preco_unitario) AS subtotal, SUM(quantidade) AS quant_itens
+            FROM item_comanda
+            GROUP BY id_comanda
+        ) t
+        WHERE t.id_comanda = c.id_comanda
+    """),
+    ("movimentas", """
+        INSERT INTO movimenta (id_estoque, tipo, quantidade, data)
+        SELECT 1 + (i::bigint * 104729) %% %(produtos)s,
+               CASE WHEN i %% 4 = 0 THEN 'entrada' ELSE 'saida' END,
+               1 + i %% 5,
+               CURRENT_DATE - ((%(movimentas)s - i) * %(dias)s / %(movimentas)s)
+        FROM generate_series(1, %(movimentas)s) i
+    """),
+    # Uma reserva por (dia, campo, horário), sem sobreposição; metade no futuro
+    ("reservas", """
+        INSERT INTO reserva (data, hora_inicio, quant_horas, status, cpf_cliente, id_campo, id_usuario_cadastrou)
+        SELECT CURRENT_DATE - %(dias_reserva)s / 2 + i / (%(horarios)s * 3),
+               make_time(8 + (i %% %(horarios)s) * 2, 0, 0),
+               2,
+               CASE WHEN i %% 20 = 0 THEN 'cancelada' ELSE 'confirmada' END,
+               lpad((1 + i %% %(clientes)s)::text, 11, '0'),
+               c.id_campo,
+               %(admin)s
+        FROM generate_series(0, %(reservas)s - 1) i
+        JOIN (SELECT id_campo, row_number() OVER (ORDER BY id_campo) - 1 AS ordem FROM campo) c
+          ON c.ordem = (i / %(horarios)s) %% 3
+    """),
+]
+
+def argumentos_banco(parser):
+    """Opções de conexão comuns aos scripts de benchmark"""
+    parser.add_argument("--host", default=db.DB_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=db.DB_CONFIG["port"])
+    parser.add_argument("--user", default=db.DB_CONFIG["user"])
+    parser.add_argument("--password", default=db.DB_CONFIG["password"])
+    parser.add_argument("--database", default=BANCO_PADRAO)
+
+def configurar_banco(args):
+    """Aponta db.DB_CONFIG (e portanto a API) para o banco de benchmark"""
+    db.DB_CONFIG.update(
+        host=args.host, port=args.port, user=args.user,
+        password=args.password, database=args.database,
+    )
+
+def _recriar_banco(args):
+    conn = psycopg2.connect(**dict(db.DB_CONFIG, database="postgres"))
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f'DROP DATABASE IF EXISTS "{args.database}"')
+            cur.execute(f'CREATE DATABASE "{args.database}"')
+    finally:
+        conn.close()
+
+def popular(args):
+    volumes = {nome: max(1, int(total * args.escala)) for nome, total in VOLUMES.items()}
+    volumes["produtos"] = max(volumes["produtos"], 10)
+    volumes["mesas"] = VOLUMES["mesas"]
+
+    print(f"Recriando o banco {args.database}...")
+    _recriar_banco(args)
+    conn = psycopg2.connect(**db.DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            with open(SCRIPT_SQL, encoding="utf-8") as arquivo:
+                cur.execute(arquivo.read())
+            cur.execute("SELECT email, id_usuario FROM usuario")
+            usuarios = dict(cur.fetchall())
+            params = dict(
+                volumes,
+                admin=usuarios["admin@pinheiro.com"],
+                funcionario=usuarios["funcionario@pinheiro.com"],
+                abertas=min(COMANDAS_ABERTAS, volumes["comandas"]),
+                dias=DIAS_HISTORICO,
+                horarios=HORARIOS_RESERVA,
+                dias_reserva=volumes["reservas"] // (HORARIOS_RESERVA * 3),
+            )
+            for etapa, comando in CARGA:
+                inicio = time.perf_counter()
+                cur.execute(comando, params)
+                print(f"  {etapa:<16} {cur.rowcount:>10} linhas  {time.perf_counter() - inicio:6.1f} s")
+        conn.commit()
+        # Consolida relatórios e views materializadas agora, para os jobs não
+        # recalcularem o histórico durante o benchmark
+        inicio = time.perf_counter()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            dias = atualizar_relatorios(cur)
+        print(f"  {'relatorios':<16} {len(dias):>10} dias    {time.perf_counter() - inicio:6.1f} s")
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            for nome in VISOES_MATERIALIZADAS:
+                duracao_ms = atualizar_visao(cur, nome, forcar=True)
+                print(f"  {nome:<16} {'refresh':>10}        {duracao_ms / 1000:6.1f} s")
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE")
+    finally:
+        conn.close()
+    return volumes
+
+def main():
+    parser = argparse.ArgumentParser(description="Cria o banco de benchmark")
+    argumentos_banco(parser)
+    parser.add_argument("--escala", type=float, default=1.0, help="multiplica os volumes padrão")
+    args = parser.parse_args()
+    configurar_banco(args)
+    inicio = time.perf_counter()
+    popular(args)
+    print(f"Banco {args.database} pronto em {time.perf_counter() - inicio:.1f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
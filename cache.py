@@ -0,0 +1,193 @@
+import os
+import time
+import hashlib
+import json
+import threading
+import functools
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from collections import OrderedDict
+from db import ao_confirmar
+from metricas import CACHE_RESPOSTAS
+
+# Cache de respostas dos GETs de catálogo (produtos, campos, mesas, estoque)
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 300))
+RESPONSE_CACHE_MAX = int(os.environ.get('RESPONSE_CACHE_MAX', 256))
+
+# Início do processo: Last-Modified das tabelas ainda não alteradas
+INICIO_PROCESSO = time.time()
+
+# Headers da resposta guardados junto com o corpo
+CABECALHOS_EM_CACHE = ("X-Next-Cursor",)
+
+class CacheRespostas:
+    """Cache LRU com TTL, invalidado por tabela.
+
+    Cada tabela tem um contador de geração incrementado a cada invalidação.
+    Uma resposta só é guardada se as gerações das suas tabelas não mudaram
+    desde o início da consulta, então uma leitura concorrente com uma escrita
+    não repõe no cache um resultado anterior à escrita.
+    """
+
+    def __init__(self, ttl, maximo):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._entradas = OrderedDict()  # chave -> (valor, cabeçalhos, tabelas, expira_em)
+        self._geracoes = {}
+        self._alteracoes = {}  # tabela -> instante (time.time) da última invalidação
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            if entrada[3] < time.monotonic():
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return entrada
+
+    def geracoes(self, tabelas):
+        with self._lock:
+            return tuple(self._geracoes.get(t, 0) for t in tabelas)
+
+    def guardar(self, chave, valor, cabecalhos, tabelas, geracoes):
+        with self._lock:
+            if tuple(self._geracoes.get(t, 0) for t in tabelas) != geracoes:
+                return
+            self._entradas[chave] = (valor, cabecalhos, tabelas, time.monotonic() + self.ttl)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def ultima_alteracao(self, tabelas):
+        with self._lock:
+            return max([self._alteracoes.get(t, INICIO_PROCESSO) for t in tabelas], default=INICIO_PROCESSO)
+
+    def invalidar(self, *tabelas):
+        agora = time.time()
+        with self._lock:
+            for tabela in tabelas:
+                self._geracoes[tabela] = self._geracoes.get(tabela, 0) + 1
+                self._alteracoes[tabela] = agora
+            for chave in [c for c, e in self._entradas.items() if set(e[2]) & set(tabelas)]:
+                del self._entradas[chave]
+
+    def limpar(self):
+        agora = time.time()
+        with self._lock:
+            for tabela in self._geracoes:
+                self._geracoes[tabela] += 1
+                self._alteracoes[tabela] = agora
+            self._entradas.clear()
+
+    def tamanho(self):
+        with self._lock:
+            return len(self._entradas)
+
+_cache = CacheRespostas(RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX)
+
+def _chave(request):
+    return request.url.path + "?" + "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+
+def em_cache(*tabelas):
+    """Guarda em cache a resposta de um GET que depende de `tabelas`.
+
+    O endpoint precisa declarar `request: Request` e `response: Response`.
+    As dependências (autenticação, validação dos parâmetros) continuam
+    rodando a cada requisição; num acerto o handler não é chamado e nenhuma
+    conexão com o banco é usada.
+    """
+    def decorador(endpoint):
+        nome = endpoint.__name__
+
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            request, response = kwargs["request"], kwargs["response"]
+            chave = _chave(request)
+            entrada = _cache.obter(chave)
+            if entrada is not None:
+                CACHE_RESPOSTAS.inc(nome, "hit")
+                valor, cabecalhos, _, _ = entrada
+                response.headers.update(cabecalhos)
+                return valor
+            CACHE_RESPOSTAS.inc(nome, "miss")
+            geracoes = _cache.geracoes(tabelas)
+            valor = endpoint(*args, **kwargs)
+            cabecalhos = {h: response.headers[h] for h in CABECALHOS_EM_CACHE if h in response.headers}
+            _cache.guardar(chave, valor, cabecalhos, tabelas, geracoes)
+            return valor
+        return wrapper
+    return decorador
+
+def _etag(valor, cabecalhos):
+    """ETag fraco a partir do conteúdo da resposta.
+
+    Depende só dos dados, não do processo: workers diferentes que servem o
+    mesmo resultado geram o mesmo ETag.
+    """
+    corpo = json.dumps([jsonable_encoder(valor), cabecalhos], sort_keys=True, separators=(",", ":"))
+    return f'W/"{hashlib.sha1(corpo.encode()).hexdigest()[:32]}"'
+
+def _nao_modificado(request, etag, ultima_alteracao):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Comparação fraca: W/"x" e "x" são equivalentes
+        recebidos = {e.strip().removeprefix("W/") for e in if_none_match.split(",")}
+        return "*" in recebidos or etag.removeprefix("W/") in recebidos
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    # Last-Modified tem resolução de segundos: alterações no último segundo
+    # não são distinguíveis pela data, então não geram 304
+    if time.time() - ultima_alteracao < 1:
+        return False
+    try:
+        desde = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(ultima_alteracao) <= desde
+
+def com_etag(*tabelas):
+    """GET condicional (ETag / Last-Modified) para um endpoint que depende de `tabelas`.
+
+    O ETag é um hash do resultado do handler; com @em_cache logo abaixo, um
+    acerto no cache responde 304 sem consultar o banco. Com If-None-Match
+    ainda válido (ou, sem ele, If-Modified-Since), responde 304 sem corpo.
+    O endpoint precisa declarar `request: Request` e `response: Response`.
+    """
+    def decorador(endpoint):
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            request, response = kwargs["request"], kwargs["response"]
+            # Lida antes da consulta: uma escrita concorrente nunca deixa a
+            # data anterior a ela para dados já alterados
+            ultima_alteracao = _cache.ultima_alteracao(tabelas)
+            valor = endpoint(*args, **kwargs)
+            cabecalhos = {
+                "ETag": _etag(valor, {h: response.headers[h] for h in CABECALHOS_EM_CACHE if h in response.headers}),
+                "Last-Modified": formatdate(ultima_alteracao, usegmt=True),
+                "Cache-Control": "no-cache",
+            }
+            if _nao_modificado(request, cabecalhos["ETag"], ultima_alteracao):
+                return Response(status_code=304, headers=cabecalhos)
+            response.headers.update(cabecalhos)
+            return valor
+        return wrapper
+    return decorador
+
+def invalidar_cache(conn, *tabelas):
+    """Invalida as respostas que dependem de `tabelas` quando a transação de `conn` for confirmada"""
+    ao_confirmar(conn, lambda: _cache.invalidar(*tabelas))
+
+def invalidar_tabelas(*tabelas):
+    """Invalidação imediata, para alterações já confirmadas (ex.: feitas por outro processo)"""
+    _cache.invalidar(*tabelas)
+
+def limpar_cache():
+    _cache.limpar()
+
+def estatisticas_cache():
+    return {"entradas": _cache.tamanho(), "maximo": _cache.maximo, "ttl": _cache.ttl}
@@ -0,0 +1,121 @@
+import os
+import re
+import threading
+from collections import deque
+from functools import lru_cache
+
+# Comandos acima deste tempo (ms) vão para o log de consultas lentas
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+# Modo de depuração: anexa o EXPLAIN (ANALYZE, BUFFERS) das consultas lentas.
+# Reexecuta a consulta, por isso só vale para SELECT e não deve ficar ligado em produção.
+QUERY_EXPLAIN = os.environ.get('QUERY_EXPLAIN', '0') == '1'
+# Limite de SQLs distintos acompanhados (os demais são somados em OUTRAS_CONSULTAS)
+QUERY_STATS_MAX = int(os.environ.get('QUERY_STATS_MAX', 500))
+# Tempos mais recentes guardados por SQL para o cálculo de p50/p95
+QUERY_STATS_AMOSTRAS = 1000
+
+OUTRAS_CONSULTAS = "<outras>"
+
+_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_PARAMETRO = re.compile(r"%\(\w+\)s|%s")
+_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_ARRAY = re.compile(r"ARRAY\[[^\]]*\]", re.IGNORECASE)
+_LISTA = re.compile(r"\((?:\s*(?:\?|NULL|DEFAULT)\s*,?)+\)", re.IGNORECASE)
+_LISTAS_REPETIDAS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_ESPACOS = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def normalizar_sql(query: str) -> str:
+    """SQL sem valores: literais e parâmetros viram ?, listas (VALUES, IN, ARRAY) viram (?)"""
+    texto = _LITERAL_TEXTO.sub("?", query)
+    texto = _PARAMETRO.sub("?", texto)
+    texto = _NUMERO.sub("?", texto)
+    texto = _ARRAY.sub("ARRAY[?]", texto)
+    texto = _LISTA.sub("(?)", texto)
+    texto = _LISTAS_REPETIDAS.sub("(?), ...", texto)
+    return _ESPACOS.sub(" ", texto).strip()
+
+_estatisticas = {}  # sql normalizado -> dict
+_lock = threading.Lock()
+
+def _nova_estatistica():
+    return {
+        "chamadas": 0,
+        "total": 0.0,
+        "max": 0.0,
+        "linhas": 0,
+        "lentas": 0,
+        "amostras": deque(maxlen=QUERY_STATS_AMOSTRAS),
+        "plano": None,
+    }
+
+def registrar_consulta(query: str, duracao: float, linhas: int, plano=None):
+    """Agrega um comando executado (duração em segundos) pelo seu SQL normalizado"""
+    chave = normalizar_sql(query)
+    with _lock:
+        stats = _estatisticas.get(chave)
+        if stats is None:
+            if len(_estatisticas) >= QUERY_STATS_MAX:
+                chave = OUTRAS_CONSULTAS
+                stats = _estatisticas.get(chave)
+            if stats is None:
+                stats = _estatisticas[chave] = _nova_estatistica()
+        stats["chamadas"] += 1
+        stats["total"] += duracao
+        stats["max"] = max(stats["max"], duracao)
+        stats["linhas"] += max(linhas, 0)
+        stats["amostras"].append(duracao)
+        if consulta_lenta(duracao):
+            stats["lentas"] += 1
+            if plano is not None:
+                stats["plano"] = plano
+
+def consulta_lenta(duracao: float) -> bool:
+    return duracao * 1000 >= SLOW_QUERY_MS
+
+# SELECTs com efeitos que o ROLLBACK TO SAVEPOINT não desfaz (nextval, locks
+# advisory de sessão) ou que não devem se repetir (locks de linha, NOTIFY)
+_EFEITOS_COLATERAIS = re.compile(
+    r"\bFOR\s+(?:NO\s+KEY\s+)?UPDATE\b|\bFOR\s+(?:KEY\s+)?SHARE\b|pg_notify|advisory|nextval|setval",
+    re.IGNORECASE,
+)
+
+def explicavel(query: str) -> bool:
+    """EXPLAIN ANALYZE executa o comando: só SELECTs são seguros de reexecutar"""
+    return QUERY_EXPLAIN and query.lstrip().upper().startswith("SELECT")
+
+def analisavel(query: str) -> bool:
+    """Se o SELECT pode ser reexecutado por EXPLAIN ANALYZE; senão, só o plano estimado"""
+    return _EFEITOS_COLATERAIS.search(query) is None
+
+def _percentil(ordenadas, p):
+    return ordenadas[int(round(p * (len(ordenadas) - 1)))]
+
+ORDENACOES_QUERY_STATS = ("total", "media", "p95", "max", "chamadas", "linhas")
+
+def relatorio_consultas(ordenar_por: str = "total", limite: int = 50):
+    """Estatísticas por SQL normalizado, tempos em milissegundos"""
+    with _lock:
+        copia = [(sql, dict(s, amostras=list(s["amostras"]))) for sql, s in _estatisticas.items()]
+    relatorio = []
+    for sql, s in copia:
+        amostras = sorted(s["amostras"])
+        relatorio.append({
+            "sql": sql,
+            "chamadas": s["chamadas"],
+            "total_ms": round(s["total"] * 1000, 3),
+            "media_ms": round(s["total"] * 1000 / s["chamadas"], 3),
+            "p50_ms": round(_percentil(amostras, 0.50) * 1000, 3),
+            "p95_ms": round(_percentil(amostras, 0.95) * 1000, 3),
+            "max_ms": round(s["max"] * 1000, 3),
+            "linhas": s["linhas"],
+            "lentas": s["lentas"],
+            "plano": s["plano"],
+        })
+    chave = {"total": "total_ms", "media": "media_ms", "p95": "p95_ms", "max": "max_ms"}.get(ordenar_por, ordenar_por)
+    relatorio.sort(key=lambda r: r[chave], reverse=True)
+    return relatorio[:limite]
+
+def limpar_estatisticas():
+    with _lock:
+        _estatisticas.clear()
@@ -0,0 +1,74 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from db import get_db_connection, get_db_cursor, release_db_connection
+from auth import require_admin
+from consultas import relatorio_consultas, limpar_estatisticas, ORDENACOES_QUERY_STATS, SLOW_QUERY_MS, QUERY_EXPLAIN
+from cache import estatisticas_cache, limpar_cache
+from metricas import CACHE_RESPOSTAS
+from visoes import VISOES_MATERIALIZADAS, MATVIEW_REFRESH_INTERVALO, atualizar_visao, situacao_visoes
+
+router = APIRouter()
+
+@router.get("/admin/query-stats", response_model=dict)
+def get_query_stats(
+    ordenar_por: str = Query("total", description="total, media, p95, max, chamadas ou linhas"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: dict = Depends(require_admin),
+):
+    """Tempo dos comandos SQL agregados por texto normalizado (desde o início ou o último reset)"""
+    if ordenar_por not in ORDENACOES_QUERY_STATS:
+        raise HTTPException(status_code=400, detail=f"Ordenação inválida. Use: {', '.join(ORDENACOES_QUERY_STATS)}")
+    return {
+        "slow_query_ms": SLOW_QUERY_MS,
+        "explain": QUERY_EXPLAIN,
+        "consultas": relatorio_consultas(ordenar_por, limit),
+    }
+
+@router.delete("/admin/query-stats", response_model=dict)
+def reset_query_stats(current_user: dict = Depends(require_admin)):
+    limpar_estatisticas()
+    return {"message": "Estatísticas de consultas zeradas"}
+
+@router.get("/admin/cache", response_model=dict)
+def get_cache(current_user: dict = Depends(require_admin)):
+    """Ocupação do cache de respostas e acertos/faltas por endpoint"""
+    por_endpoint = {}
+    for (endpoint, resultado), total in CACHE_RESPOSTAS.valores().items():
+        por_endpoint.setdefault(endpoint, {"hit": 0, "miss": 0})[resultado] = total
+    return {**estatisticas_cache(), "endpoints": por_endpoint}
+
+@router.delete("/admin/cache", response_model=dict)
+def reset_cache(current_user: dict = Depends(require_admin)):
+    limpar_cache()
+    return {"message": "Cache de respostas esvaziado"}
+
+@router.get("/admin/materialized-views", response_model=dict)
+def get_materialized_views(current_user: dict = Depends(require_admin)):
+    """Última atualização, duração do refresh e atraso de cada view materializada"""
+    conn = get_db_connection()
+    cursor = get_db_cursor(conn)
+    try:
+        return {"intervalo_segundos": MATVIEW_REFRESH_INTERVALO, "visoes": situacao_visoes(cursor)}
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+@router.post("/admin/materialized-views/{nome}/refresh", response_model=dict)
+def refresh_materialized_view(nome: str, current_user: dict = Depends(require_admin)):
+    """REFRESH CONCURRENTLY imediato, mesmo sem alterações pendentes"""
+    if nome not in VISOES_MATERIALIZADAS:
+        raise HTTPException(status_code=404, detail="View materializada não encontrada")
+    conn = get_db_connection()
+    cursor = get_db_cursor(conn)
+    try:
+        duracao_ms = atualizar_visao(cursor, nome, forcar=True)
+        if duracao_ms is None:
+            raise HTTPException(status_code=409, detail="Refresh desta view já em andamento")
+        return {"message": "View materializada atualizada", "nome": nome, "duracao_ms": round(duracao_ms, 3)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=f"Erro ao atualizar view: {str(e)}")
+    finally:
+        cursor.close()
+        release_db_connection(conn)
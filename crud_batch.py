@@ -0,0 +1,132 @@
+import re
+import inspect
+from typing import List
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.params import Depends as DependsParam
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from starlette.routing import Match
+from db import shared_transaction
+from models import OperacaoBatch
+from auth import require_auth, require_admin, require_admin_for_user_ops
+import crud_cliente, crud_produto, crud_comanda, crud_mesa, crud_campo, crud_reserva
+import crud_pagamento, crud_pag_comanda, crud_pag_compra, crud_pag_reserva
+import crud_estoque, crud_movimenta, crud_compra, crud_item_comanda, crud_item_compra
+
+router = APIRouter()
+
+BATCH_MAX_OPERACOES = 100
+BATCH_METODOS = {"POST", "PUT", "DELETE"}
+
+# Recursos disponíveis no batch. Usuários ficam de fora: a invalidação do
+# cache de autenticação precisa acontecer depois do commit.
+BATCH_ROUTERS = [
+    crud_cliente.router, crud_produto.router, crud_comanda.router, crud_mesa.router,
+    crud_campo.router, crud_reserva.router, crud_pagamento.router, crud_pag_comanda.router,
+    crud_pag_compra.router, crud_pag_reserva.router, crud_estoque.router, crud_movimenta.router,
+    crud_compra.router, crud_item_comanda.router, crud_item_compra.router,
+]
+
+# Dependências de autorização que podem ser reaplicadas ao usuário do batch
+DEPENDENCIAS_USUARIO = {require_auth, require_admin, require_admin_for_user_ops}
+
+# Referência a um resultado anterior: "$<id ou índice>.<campo>", ex.: "$comanda.id_comanda" ou "$0.id_comanda"
+REFERENCIA = re.compile(r"^\$([\w-]+)\.(\w+)$")
+
+def _resolver(valor, resultados: dict):
+    """Substitui referências "$ref.campo" pelos valores devolvidos por operações anteriores"""
+    if isinstance(valor, dict):
+        return {k: _resolver(v, resultados) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_resolver(v, resultados) for v in valor]
+    if isinstance(valor, str):
+        m = REFERENCIA.match(valor)
+        if m:
+            ref, campo = m.groups()
+            if ref not in resultados:
+                raise HTTPException(status_code=400, detail=f"Referência a operação inexistente ou posterior: {valor}")
+            resultado = resultados[ref]
+            if not isinstance(resultado, dict) or campo not in resultado:
+                raise HTTPException(status_code=400, detail=f"Campo '{campo}' não existe no resultado de '{ref}'")
+            return resultado[campo]
+    return valor
+
+def _resolver_path(path: str, resultados: dict) -> str:
+    return "/".join(str(_resolver(parte, resultados)) for parte in path.split("/"))
+
+def _encontrar_rota(method: str, path: str):
+    if path.startswith("/api/"):
+        path = path[len("/api"):]
+    elif not path.startswith("/"):
+        path = "/" + path
+    scope = {"type": "http", "method": method, "path": path, "root_path": ""}
+    for api_router in BATCH_ROUTERS:
+        for rota in api_router.routes:
+            if not isinstance(rota, APIRoute):
+                continue
+            match, child_scope = rota.matches(scope)
+            if match == Match.FULL:
+                return rota, child_scope.get("path_params", {})
+    raise HTTPException(status_code=404, detail=f"Rota não encontrada no batch: {method} {path}")
+
+def _argumentos(rota: APIRoute, path_params: dict, body, user: dict):
+    """Monta os argumentos do handler: parâmetros de path, corpo validado e usuário"""
+    kwargs = {}
+    for nome, param in inspect.signature(rota.endpoint).parameters.items():
+        if isinstance(param.default, DependsParam):
+            if param.default.dependency not in DEPENDENCIAS_USUARIO:
+                raise HTTPException(status_code=400, detail=f"Operação não suportada no batch: {rota.path}")
+            kwargs[nome] = param.default.dependency(user)
+        elif nome in path_params:
+            kwargs[nome] = TypeAdapter(param.annotation).validate_python(path_params[nome])
+        elif (inspect.isclass(param.annotation) and issubclass(param.annotation, BaseModel)) \
+                or getattr(param.annotation, "__origin__", None) is list:
+            kwargs[nome] = TypeAdapter(param.annotation).validate_python(body if body is not None else {})
+        else:
+            raise HTTPException(status_code=400, detail=f"Operação não suportada no batch: {rota.path}")
+    return kwargs
+
+@router.post("/batch", response_model=dict)
+def executar_batch(operacoes: List[OperacaoBatch], current_user: dict = Depends(require_auth)):
+    """Executa várias operações de escrita em uma única conexão e transação.
+
+    Cada operação é {"id", "method", "path", "body"} e chama o mesmo handler
+    da rota correspondente, com as mesmas permissões. Valores "$<id>.<campo>"
+    (ou "$<índice>.<campo>") no path e no body são trocados pelo resultado de
+    uma operação anterior, ex.: "$comanda.id_comanda". Se qualquer operação
+    falhar, nada é gravado e o erro indica qual foi.
+    """
+    if not operacoes:
+        raise HTTPException(status_code=400, detail="Nenhuma operação informada")
+    if len(operacoes) > BATCH_MAX_OPERACOES:
+        raise HTTPException(status_code=400, detail=f"Máximo de {BATCH_MAX_OPERACOES} operações por batch")
+
+    resultados = {}
+    saida = []
+    indice = 0
+    operacao = None
+    try:
+        with shared_transaction():
+            for indice, operacao in enumerate(operacoes):
+                metodo = operacao.method.upper()
+                if metodo not in BATCH_METODOS:
+                    raise HTTPException(status_code=400, detail=f"Método não permitido no batch: {operacao.method}")
+                path = _resolver_path(operacao.path, resultados)
+                body = _resolver(operacao.body, resultados)
+                rota, path_params = _encontrar_rota(metodo, path)
+                try:
+                    kwargs = _argumentos(rota, path_params, body, current_user)
+                except ValidationError as e:
+                    raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+                resultado = rota.endpoint(**kwargs)
+                resultados[str(indice)] = resultado
+                if operacao.id:
+                    resultados[operacao.id] = resultado
+                saida.append({"id": operacao.id, "resultado": resultado})
+    except HTTPException as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail={"indice": indice, "id": operacao.id if operacao else None, "erro": e.detail},
+            headers=e.headers,
+        )
+    return {"message": f"{len(saida)} operações executadas com sucesso", "resultados": saida}
@@ -1,49 +1,70 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import Campo, CampoCreate, CampoUpdate
 from typing import List
 from auth import require_auth
+from listagem import listagem, campos, paginar
+from cache import em_cache, com_etag
+from escrita import inserir, atualizar, remover, campos_informados
 
 router = APIRouter()
 
+LISTAGEM_CAMPO = listagem(
+    filtros={
+        "status": ("status", str),
+        "numero": ("numero", int),
+    },
+    ordenacao={
+        "numero": ("numero", int),
+    },
+)
+
+CAMPOS_CAMPO = campos([
+    "id_campo",
+    "numero",
+    "status",
+])
+
 @router.post("/campos/", response_model=dict)
-async def create_campo(campo: CampoCreate, current_user: dict = Depends(require_auth)):
+def create_campo(campo: CampoCreate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute(
-            "INSERT INTO campo (numero, status) VALUES (%s, %s)",
-            (campo.numero, campo.status)
-        )
+        novo = inserir(cursor, "campo", {
+            "numero": campo.numero,
+            "status": campo.status,
+        })
         conn.commit()
-        return {"message": "Campo criado com sucesso"}
+        return {"message": "Campo criado com sucesso", **novo}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar campo: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/campos/", response_model=List[dict])
-async def get_campos(current_user: dict = Depends(require_auth)):
+@com_etag("campo")
+@em_cache("campo")
+def get_campos(request: Request, response: Response, pagina: dict = Depends(LISTAGEM_CAMPO), colunas: str = Depends(CAMPOS_CAMPO), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM campo")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        return paginar(cursor, response, f"SELECT {colunas} FROM campo", "id_campo", pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/campos/{id_campo}", response_model=dict)
-async def get_campo(id_campo: int, current_user: dict = Depends(require_auth)):
+def get_campo(id_campo: int, colunas: str = Depends(CAMPOS_CAMPO), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM campo WHERE id_campo = %s", (id_campo,))
+        cursor.execute(f"SELECT {colunas} FROM campo WHERE id_campo = %s", (id_campo,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Campo não encontrado")
@@ -54,48 +75,38 @@ async def get_campo(id_campo: int, current_user: dict = Depends(require_auth)):
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.put("/campos/{id_campo}", response_model=dict)
-async def update_campo(id_campo: int, campo: CampoUpdate, current_user: dict = Depends(require_auth)):
+def update_campo(id_campo: int, campo: CampoUpdate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        updates = []
-        values = []
-        if campo.numero is not None:
-            updates.append("numero = %s")
-            values.append(campo.numero)
-        if campo.status is not None:
-            updates.append("status = %s")
-            values.append(campo.status)
-        
-        if not updates:
-            raise HTTPException(status_code=400, detail="Nenhum campo para atualizar")
-        
-        values.append(id_campo)
-        query = f"UPDATE campo SET {', '.join(updates)} WHERE id_campo = %s"
-        cursor.execute(query, values)
+        atualizado = atualizar(cursor, "campo", "id_campo", id_campo, campos_informados(campo, ["numero", "status"]))
         conn.commit()
-        return {"message": "Campo atualizado com sucesso"}
+        return {"message": "Campo atualizado com sucesso", **atualizado}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Erro ao atualizar campo: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/campos/{id_campo}", response_model=dict)
-async def delete_campo(id_campo: int, current_user: dict = Depends(require_auth)):
+def delete_campo(id_campo: int, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
-    cursor = conn.cursor()
+    cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM campo WHERE id_campo = %s", (id_campo,))
+        removido = remover(cursor, "campo", "id_campo", id_campo)
         conn.commit()
-        return {"message": "Campo deletado com sucesso"}
+        return {"message": "Campo deletado com sucesso", **removido}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Erro ao deletar campo: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
@@ -1,50 +1,76 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 import psycopg2
-from db import get_db_connection, get_db_cursor
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import Cliente, ClienteCreate, ClienteUpdate
 from typing import List
 from auth import require_auth
+from listagem import listagem, campos, paginar
+from escrita import inserir, atualizar, remover, campos_informados
 
 router = APIRouter()
 
+LISTAGEM_CLIENTE = listagem(
+    filtros={
+        "cpf": ("cpf", str),
+        "email": ("email", str),
+        "tipo": ("tipo", str),
+        "nome": ("nome", str),
+    },
+    ordenacao={
+        "nome": ("nome", str),
+    },
+)
+
+CAMPOS_CLIENTE = campos([
+    "id_cliente",
+    "cpf",
+    "nome",
+    "email",
+    "tipo",
+    "id_usuario_cadastrou",
+])
+
 @router.post("/clientes/", response_model=dict)
-async def create_cliente(cliente: ClienteCreate, current_user: dict = Depends(require_auth)):
+def create_cliente(cliente: ClienteCreate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute(
-            "INSERT INTO cliente (cpf, nome, email, tipo, id_usuario_cadastrou) VALUES (%s, %s, %s, %s, %s)",
-            (cliente.cpf, cliente.nome, cliente.email, cliente.tipo, cliente.id_usuario_cadastrou)
-        )
+        novo = inserir(cursor, "cliente", {
+            "cpf": cliente.cpf,
+            "nome": cliente.nome,
+            "email": cliente.email,
+            "tipo": cliente.tipo,
+            "id_usuario_cadastrou": cliente.id_usuario_cadastrou,
+        })
         conn.commit()
-        return {"message": "Cliente criado com sucesso"}
+        return {"message": "Cliente criado com sucesso", **novo}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar cliente: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/clientes/", response_model=List[dict])
-async def get_clientes(current_user: dict = Depends(require_auth)):
+def get_clientes(response: Response, pagina: dict = Depends(LISTAGEM_CLIENTE), colunas: str = Depends(CAMPOS_CLIENTE), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM cliente")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        return paginar(cursor, response, f"SELECT {colunas} FROM cliente", "id_cliente", pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/clientes/{id_cliente}", response_model=dict)
-async def get_cliente(id_cliente: int, current_user: dict = Depends(require_auth)):
+def get_cliente(id_cliente: int, colunas: str = Depends(CAMPOS_CLIENTE), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM cliente WHERE id_cliente = %s", (id_cliente,))
+        cursor.execute(f"SELECT {colunas} FROM cliente WHERE id_cliente = %s", (id_cliente,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Cliente não encontrado")
@@ -55,75 +81,38 @@ async def get_cliente(id_cliente: int, current_user: dict = Depends(require_auth
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.put("/clientes/{id_cliente}", response_model=dict)
-async def update_cliente(id_cliente: int, cliente: ClienteUpdate, current_user: dict = Depends(require_auth)):
+def update_cliente(id_cliente: int, cliente: ClienteUpdate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        updates = []
-        values = []
-        if cliente.cpf is not None:
-            updates.append("cpf = %s")
-            values.append(cliente.cpf)
-        if cliente.nome is not None:
-            updates.append("nome = %s")
-            values.append(cliente.nome)
-        if cliente.email is not None:
-            updates.append("email = %s")
-            values.append(cliente.email)
-        if cliente.tipo is not None:
-            updates.append("tipo = %s")
-            values.append(cliente.tipo)
-        
-        # id_usuario_cadastrou removido da atualização para manter o registro original
-        
-        if not updates:
-            raise HTTPException(status_code=400, detail="Nenhum campo fornecido para atualização")
-        
-        values.append(id_cliente)
-        query = f"UPDATE cliente SET {', '.join(updates)} WHERE id_cliente = %s"
-        cursor.execute(query, values)
-        
-        if cursor.rowcount == 0:
-            # Verifica se cliente existe
-            cursor.execute("SELECT 1 FROM cliente WHERE id_cliente = %s", (id_cliente,))
-            if not cursor.fetchone():
-               raise HTTPException(status_code=404, detail=f"Cliente com ID {id_cliente} não encontrado")
-
+        atualizado = atualizar(cursor, "cliente", "id_cliente", id_cliente, campos_informados(cliente, ["cpf", "nome", "email", "tipo"]))
         conn.commit()
-        return {"message": "Cliente atualizado com sucesso"}
+        return {"message": "Cliente atualizado com sucesso", **atualizado}
     except HTTPException:
         raise
-    except psycopg2.Error as e:
-        conn.rollback()
-        print(f"Erro PGSql ao atualizar cliente: {e}")
-        if e.pgcode == '23505':
-             if 'cpf' in e.pgerror:
-                raise HTTPException(status_code=400, detail="CPF já cadastrado.")
-             if 'email' in e.pgerror:
-                raise HTTPException(status_code=400, detail="Email já cadastrado.")
-        raise HTTPException(status_code=400, detail=f"Erro de banco de dados: {e}")
     except Exception as e:
         conn.rollback()
-        print(f"Erro inesperado ao atualizar cliente: {e}")
-        raise HTTPException(status_code=400, detail=f"Erro inesperado: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Erro ao atualizar cliente: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/clientes/{id_cliente}", response_model=dict)
-async def delete_cliente(id_cliente: int, current_user: dict = Depends(require_auth)):
+def delete_cliente(id_cliente: int, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM cliente WHERE id_cliente = %s", (id_cliente,))
+        removido = remover(cursor, "cliente", "id_cliente", id_cliente)
         conn.commit()
-        return {"message": "Cliente deletado com sucesso"}
+        return {"message": "Cliente deletado com sucesso", **removido}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Erro ao deletar cliente: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
@@ -1,56 +1,96 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+from fastapi import APIRouter, HTTPException, Depends, Response, Query
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import Compra, CompraCreate, CompraUpdate
 from typing import List
+from datetime import date
+from decimal import Decimal
 from auth import require_auth
+from listagem import listagem, campos, paginar, exportar
+from escrita import inserir, atualizar, remover, campos_informados
 
 router = APIRouter()
 
+LISTAGEM_COMPRA = listagem(
+    filtros={
+        "cpf_cliente": ("c.cpf_cliente", str),
+        "data": ("c.data", date),
+        "valor_total": ("c.valor_total", Decimal),
+        "id_usuario_cadastrou": ("c.id_usuario_cadastrou", int),
+    },
+    ordenacao={
+        "data": ("c.data", date),
+        "valor_total": ("c.valor_total", Decimal),
+    },
+)
+
+CAMPOS_COMPRA = campos(
+    {
+        "id_compra": "c.id_compra",
+        "data": "c.data",
+        "valor_total": "c.valor_total",
+        "cpf_cliente": "c.cpf_cliente",
+        "id_usuario_cadastrou": "c.id_usuario_cadastrou",
+        "cliente_nome": "cl.nome",
+        "usuario_nome": "u.nome",
+    },
+    padrao="c.*, cl.nome as cliente_nome, u.nome as usuario_nome",
+)
+
 @router.post("/compras/", response_model=dict)
-async def create_compra(compra: CompraCreate, current_user: dict = Depends(require_auth)):
+def create_compra(compra: CompraCreate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute(
-            """INSERT INTO compra (data, valor_total, cpf_cliente, id_usuario_cadastrou) 
-               VALUES (%s, %s, %s, %s)""",
-            (compra.data, compra.valor_total, compra.cpf_cliente, current_user['id_usuario'])
-        )
+        novo = inserir(cursor, "compra", {
+            "data": compra.data,
+            "valor_total": compra.valor_total,
+            "cpf_cliente": compra.cpf_cliente,
+            "id_usuario_cadastrou": current_user['id_usuario'],
+        })
         conn.commit()
-        return {"message": "Compra criada com sucesso"}
+        return {"message": "Compra criada com sucesso", **novo}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar compra: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/compras/", response_model=List[dict])
-async def get_compras(current_user: dict = Depends(require_auth)):
+def get_compras(response: Response, pagina: dict = Depends(LISTAGEM_COMPRA), colunas: str = Depends(CAMPOS_COMPRA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("""
-            SELECT c.*, cl.nome as cliente_nome, u.nome as usuario_nome
+        return paginar(cursor, response, f"""
+            SELECT {colunas}
             FROM compra c
             LEFT JOIN cliente cl ON c.cpf_cliente = cl.cpf
             LEFT JOIN usuario u ON c.id_usuario_cadastrou = u.id_usuario
-        """)
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        """, "c.id_compra", pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
+
+@router.get("/compras/export")
+def export_compras(formato: str = Query("ndjson", description="ndjson ou csv"), current_user: dict = Depends(require_auth)):
+    return exportar("""
+        SELECT c.*, cl.nome as cliente_nome, u.nome as usuario_nome
+        FROM compra c
+        LEFT JOIN cliente cl ON c.cpf_cliente = cl.cpf
+        LEFT JOIN usuario u ON c.id_usuario_cadastrou = u.id_usuario
+    """, "c.id_compra", formato, "compras")
 
 @router.get("/compras/{id_compra}", response_model=dict)
-async def get_compra(id_compra: int, current_user: dict = Depends(require_auth)):
+def get_compra(id_compra: int, colunas: str = Depends(CAMPOS_COMPRA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("""
-            SELECT c.*, cl.nome as cliente_nome, u.nome as usuario_nome
+        cursor.execute(f"""
+            SELECT {colunas}
             FROM compra c
             LEFT JOIN cliente cl ON c.cpf_cliente = cl.cpf
             LEFT JOIN usuario u ON c.id_usuario_cadastrou = u.id_usuario
@@ -66,64 +106,33 @@ async def get_compra(id_compra: int, current_user: dict = Depends(require_auth))
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.put("/compras/{id_compra}", response_model=dict)
-async def update_compra(id_compra: int, compra: CompraUpdate, current_user: dict = Depends(require_auth)):
+def update_compra(id_compra: int, compra: CompraUpdate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        updates = []
-        values = []
-        if compra.data is not None:
-            updates.append("data = %s")
-            values.append(compra.data)
-        if compra.valor_total is not None:
-            updates.append("valor_total = %s")
-            values.append(compra.valor_total)
-        if compra.cpf_cliente is not None:
-            updates.append("cpf_cliente = %s")
-            values.append(compra.cpf_cliente)
-        
-        # id_usuario_cadastrou removido pois nao consta no model CompraUpdate
-        
-        if not updates:
-            raise HTTPException(status_code=400, detail="Nenhum campo fornecido para atualização")
-        
-        values.append(id_compra)
-        query = f"UPDATE compra SET {', '.join(updates)} WHERE id_compra = %s"
-        cursor.execute(query, values)
-        
-        if cursor.rowcount == 0:
-            # Verifica se compra existe
-            cursor.execute("SELECT 1 FROM compra WHERE id_compra = %s", (id_compra,))
-            if not cursor.fetchone():
-               raise HTTPException(status_code=404, detail=f"Compra com ID {id_compra} não encontrada")
-        
+        atualizado = atualizar(cursor, "compra", "id_compra", id_compra, campos_informados(compra, ["data", "valor_total", "cpf_cliente"]))
         conn.commit()
-        return {"message": "Compra atualizada com sucesso"}
+        return {"message": "Compra atualizada com sucesso", **atualizado}
     except HTTPException:
         raise
     except Exception as e:
         conn.rollback()
-        print(f"Erro ao atualizar compra: {e}")
         raise HTTPException(status_code=400, detail=f"Erro ao atualizar compra: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/compras/{id_compra}", response_model=dict)
-async def delete_compra(id_compra: int, current_user: dict = Depends(require_auth)):
+def delete_compra(id_compra: int, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM compra WHERE id_compra = %s", (id_compra,))
+        removido = remover(cursor, "compra", "id_compra", id_compra)
         conn.commit()
-        
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Compra não encontrada")
-        
-        return {"message": "Compra deletada com sucesso"}
+        return {"message": "Compra deletada com sucesso", **removido}
     except HTTPException:
         raise
     except Exception as e:
@@ -131,4 +140,4 @@ async def delete_compra(id_compra: int, current_user: dict = Depends(require_aut
         raise HTTPException(status_code=400, detail=f"Erro ao deletar compra: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
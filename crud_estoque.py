@@ -1,49 +1,67 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+from fastapi import APIRouter, HTTPException, Depends, Response
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import Estoque, EstoqueCreate, EstoqueUpdate
 from typing import List
 from auth import require_auth
+from listagem import listagem, campos, paginar
+from escrita import inserir, atualizar, remover, campos_informados
 
 router = APIRouter()
 
+LISTAGEM_ESTOQUE = listagem(
+    filtros={
+        "id_produto": ("id_produto", int),
+        "quant_present": ("quant_present", int),
+    },
+    ordenacao={
+        "quant_present": ("quant_present", int),
+    },
+)
+
+CAMPOS_ESTOQUE = campos([
+    "id_estoque",
+    "id_produto",
+    "quant_present",
+])
+
 @router.post("/estoques/", response_model=dict)
-async def create_estoque(estoque: EstoqueCreate, current_user: dict = Depends(require_auth)):
+def create_estoque(estoque: EstoqueCreate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute(
-            "INSERT INTO estoque (id_produto, quant_present) VALUES (%s, %s)",
-            (estoque.id_produto, estoque.quant_present)
-        )
+        novo = inserir(cursor, "estoque", {
+            "id_produto": estoque.id_produto,
+            "quant_present": estoque.quant_present,
+        })
         conn.commit()
-        return {"message": "Estoque criado com sucesso"}
+        return {"message": "Estoque criado com sucesso", **novo}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar estoque: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/estoques/", response_model=List[dict])
-async def get_estoques(current_user: dict = Depends(require_auth)):
+def get_estoques(response: Response, pagina: dict = Depends(LISTAGEM_ESTOQUE), colunas: str = Depends(CAMPOS_ESTOQUE), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM estoque")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        return paginar(cursor, response, f"SELECT {colunas} FROM estoque", "id_estoque", pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/estoques/{id_estoque}", response_model=dict)
-async def get_estoque(id_estoque: int, current_user: dict = Depends(require_auth)):
+def get_estoque(id_estoque: int, colunas: str = Depends(CAMPOS_ESTOQUE), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM estoque WHERE id_estoque = %s", (id_estoque,))
+        cursor.execute(f"SELECT {colunas} FROM estoque WHERE id_estoque = %s", (id_estoque,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Estoque não encontrado")
@@ -52,49 +70,38 @@ async def get_estoque(id_estoque: int, current_user: dict = Depends(require_auth
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.put("/estoques/{id_estoque}", response_model=dict)
-async def update_estoque(id_estoque: int, estoque: EstoqueUpdate, current_user: dict = Depends(require_auth)):
+def update_estoque(id_estoque: int, estoque: EstoqueUpdate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        updates = []
-        values = []
-        if estoque.id_produto is not None:
-            updates.append("id_produto = %s")
-            values.append(estoque.id_produto)
-        if estoque.quant_present is not None:
-            updates.append("quant_present = %s")
-            values.append(estoque.quant_present)
-        
-        if not updates:
-            raise HTTPException(status_code=400, detail="Nenhum campo para atualizar")
-        
-        values.append(id_estoque)
-        query = f"UPDATE estoque SET {', '.join(updates)} WHERE id_estoque = %s"
-        cursor.execute(query, values)
+        atualizado = atualizar(cursor, "estoque", "id_estoque", id_estoque, campos_informados(estoque, ["id_produto", "quant_present"]))
         conn.commit()
-        return {"message": "Estoque atualizado com sucesso"}
+        return {"message": "Estoque atualizado com sucesso", **atualizado}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Erro ao atualizar estoque: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/estoques/{id_estoque}", response_model=dict)
-async def delete_estoque(id_estoque: int, current_user: dict = Depends(require_auth)):
+def delete_estoque(id_estoque: int, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM estoque WHERE id_estoque = %s", (id_estoque,))
+        removido = remover(cursor, "estoque", "id_estoque", id_estoque)
         conn.commit()
-        return {"message": "Estoque deletado com sucesso"}
+        return {"message": "Estoque deletado com sucesso", **removido}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Erro ao deletar estoque: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
-
+        release_db_connection(conn)
@@ -0,0 +1,128 @@
+import json
+import base64
+import asyncio
+import binascii
+from fastapi import APIRouter, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBasicCredentials, HTTPAuthorizationCredentials
+from auth import security, bearer, get_current_user, verify_token, verify_credentials
+from notificacoes import central, TABELAS_NOTIFICADAS
+
+router = APIRouter()
+
+# Comentário enviado periodicamente no SSE para manter proxies e conexões abertos
+KEEPALIVE_SEGUNDOS = 15
+
+def _tabelas(tabelas: str):
+    if not tabelas:
+        return None
+    escolhidas = {t.strip() for t in tabelas.split(",") if t.strip()}
+    invalidas = escolhidas - set(TABELAS_NOTIFICADAS)
+    if invalidas:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tabelas inválidas: {', '.join(sorted(invalidas))}. Use: {', '.join(TABELAS_NOTIFICADAS)}"
+        )
+    return escolhidas
+
+def _assinar(tabelas):
+    assinatura = central.assinar(tabelas)
+    if assinatura is None:
+        raise HTTPException(status_code=503, detail="Limite de assinantes em tempo real atingido")
+    return assinatura
+
+def usuario_eventos(
+    access_token: str = Query(None, description="Token Bearer, para clientes que não enviam headers (EventSource)"),
+    token: HTTPAuthorizationCredentials = Depends(bearer),
+    credentials: HTTPBasicCredentials = Depends(security),
+):
+    if access_token:
+        return verify_token(access_token)
+    return get_current_user(token, credentials)
+
+def _formatar_sse(evento):
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {json.dumps(evento, default=str)}\n\n"
+
+@router.get("/eventos")
+async def stream_eventos(
+    tabelas: str = Query(None, description="Filtro separado por vírgula: mesa, campo, comanda, reserva"),
+    current_user: dict = Depends(usuario_eventos),
+):
+    """Alterações em mesa, campo, comanda e reserva via Server-Sent Events.
+
+    Cada evento traz a tabela, a operação (insert/update/delete), a chave e a
+    linha alterada. O evento "sincronizar" indica que eventos podem ter sido
+    perdidos: o cliente deve recarregar as listagens.
+    """
+    filtro = _tabelas(tabelas)
+    assinatura = _assinar(filtro)
+
+    async def gerar():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    evento = await asyncio.wait_for(assinatura.fila.get(), KEEPALIVE_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _formatar_sse(evento)
+        finally:
+            central.cancelar(assinatura)
+
+    return StreamingResponse(
+        gerar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _autenticar_websocket(websocket: WebSocket):
+    """Token em ?access_token= (navegadores) ou header Authorization Bearer/Basic"""
+    access_token = websocket.query_params.get("access_token")
+    if access_token:
+        return verify_token(access_token)
+    esquema, _, valor = websocket.headers.get("authorization", "").partition(" ")
+    if esquema.lower() == "bearer" and valor:
+        return verify_token(valor)
+    if esquema.lower() == "basic" and valor:
+        try:
+            email, _, senha = base64.b64decode(valor).decode("utf-8").partition(":")
+        except (binascii.Error, UnicodeDecodeError):
+            raise HTTPException(status_code=401, detail="Credenciais inválidas")
+        return await run_in_threadpool(verify_credentials, HTTPBasicCredentials(username=email, password=senha))
+    raise HTTPException(status_code=401, detail="Credenciais ausentes")
+
+@router.websocket("/ws/eventos")
+async def websocket_eventos(websocket: WebSocket, tabelas: str = None):
+    """Mesmos eventos de GET /eventos, enviados como mensagens JSON"""
+    try:
+        await _autenticar_websocket(websocket)
+        assinatura = _assinar(_tabelas(tabelas))
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+
+    await websocket.accept()
+    receber = asyncio.ensure_future(websocket.receive())
+    obter = None
+    try:
+        while True:
+            obter = asyncio.ensure_future(assinatura.fila.get())
+            prontos, _ = await asyncio.wait({receber, obter}, return_when=asyncio.FIRST_COMPLETED)
+            if receber in prontos:
+                # Mensagens do cliente são ignoradas; só o fechamento interessa
+                if receber.result()["type"] == "websocket.disconnect":
+                    break
+                receber = asyncio.ensure_future(websocket.receive())
+            if obter in prontos:
+                await websocket.send_text(json.dumps(obter.result(), default=str))
+            else:
+                obter.cancel()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        central.cancelar(assinatura)
+        receber.cancel()
+        if obter is not None:
+            obter.cancel()
@@ -0,0 +1,294 @@
+import io
+import csv
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from db import get_db_connection, get_db_cursor, release_db_connection
+from auth import require_admin
+from cache import invalidar_cache
+
+router = APIRouter()
+
+# Quantos erros por linha são listados na resposta (o total vem sempre em "com_erro")
+IMPORTACAO_MAX_ERROS = 1000
+# Linhas do CSV enviadas por COPY de cada vez
+IMPORTACAO_BLOCO = 10000
+
+# Para cada importação: tabela de destino, colunas aceitas no CSV (com o tipo
+# SQL usado na validação), colunas obrigatórias, chave do upsert e validações
+# extras (condição SQL sobre a staging "s" -> mensagem). "por_id" substitui
+# chave, obrigatórias e validações quando o arquivo traz a coluna do id.
+IMPORTACOES = {
+    "produtos": {
+        "tabela": "produto",
+        "colunas": {
+            "id_produto": "integer",
+            "nome": "text",
+            "preco": "numeric(10, 2)",
+            "validade": "date",
+            "quant_min_estoque": "integer",
+        },
+        "obrigatorias": ["nome"],
+        "chave": "nome",
+        "usuario": True,
+        # nome não é único em produto: um nome repetido no cadastro não
+        # identifica qual produto atualizar
+        "validacoes": [
+            (
+                "(SELECT COUNT(*) FROM produto p WHERE p.nome = btrim(s.nome)) > 1",
+                "'nome corresponde a mais de um produto (informe id_produto): ' || s.nome",
+            ),
+        ],
+        # Com id_produto, cada linha atualiza exatamente um produto existente
+        "por_id": {
+            "chave": "id_produto",
+            "obrigatorias": ["id_produto"],
+            "validacoes": [
+                (
+                    "NOT EXISTS (SELECT 1 FROM produto p WHERE p.id_produto = NULLIF(btrim(s.id_produto), '')::integer)",
+                    "'produto não encontrado: ' || s.id_produto",
+                ),
+            ],
+        },
+    },
+    "clientes": {
+        "tabela": "cliente",
+        "colunas": {
+            "cpf": "text",
+            "nome": "text",
+            "email": "text",
+            "tipo": "text",
+        },
+        "obrigatorias": ["cpf"],
+        "chave": "cpf",
+        "usuario": True,
+        "validacoes": [
+            (r"btrim(s.cpf) !~ '^\d{11}$'", "'cpf deve ter 11 dígitos: ' || s.cpf"),
+        ],
+    },
+    "estoque": {
+        "tabela": "estoque",
+        "colunas": {
+            "id_produto": "integer",
+            "quant_present": "integer",
+        },
+        "obrigatorias": ["id_produto", "quant_present"],
+        "chave": "id_produto",
+        "usuario": False,
+        "validacoes": [
+            (
+                "NOT EXISTS (SELECT 1 FROM produto p WHERE p.id_produto = NULLIF(btrim(s.id_produto), '')::integer)",
+                "'produto não encontrado: ' || s.id_produto",
+            ),
+        ],
+    },
+}
+
+def _ler_cabecalho(arquivo):
+    """Lê a primeira linha do CSV e detecta o separador (vírgula ou ponto e vírgula)"""
+    primeira = arquivo.readline()
+    if primeira.startswith(b"\xef\xbb\xbf"):
+        primeira = primeira[3:]
+    try:
+        texto = primeira.decode("utf-8").strip()
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="O arquivo deve estar em UTF-8")
+    if not texto:
+        raise HTTPException(status_code=400, detail="Arquivo vazio")
+    separador = ";" if texto.count(";") > texto.count(",") else ","
+    colunas = [c.strip().lower() for c in next(csv.reader([texto], delimiter=separador))]
+    return colunas, separador
+
+def _validar_colunas(colunas, spec):
+    desconhecidas = [c for c in colunas if c not in spec["colunas"]]
+    if desconhecidas:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Colunas desconhecidas: {', '.join(desconhecidas)}. Colunas aceitas: {', '.join(spec['colunas'])}"
+        )
+    faltando = [c for c in spec["obrigatorias"] if c not in colunas]
+    if faltando:
+        raise HTTPException(status_code=400, detail=f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+    if len(set(colunas)) != len(colunas):
+        raise HTTPException(status_code=400, detail="Colunas repetidas no cabeçalho")
+
+def _copiar_linhas(cursor, arquivo, colunas, separador):
+    """Lê o CSV com o csv do Python e envia as linhas à staging por COPY, em blocos.
+
+    O número de cada linha é o da linha do arquivo onde o registro começa
+    (campos entre aspas podem ocupar várias linhas). Registros com outra
+    quantidade de colunas que o cabeçalho entram já com o erro preenchido.
+    """
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8", newline="")
+    leitor = csv.reader(texto, delimiter=separador)
+    destino = ", ".join(["linha", *colunas, "erro"])
+    bloco = io.StringIO()
+    escritor = csv.writer(bloco)
+    pendentes = 0
+    inicio = leitor.line_num + 2  # o cabeçalho é a linha 1
+    try:
+        for registro in leitor:
+            linha = inicio
+            inicio = leitor.line_num + 2
+            if not registro:
+                continue
+            erro = None
+            if len(registro) != len(colunas):
+                erro = f"esperadas {len(colunas)} colunas, encontradas {len(registro)}"
+                registro = (registro + [""] * len(colunas))[:len(colunas)]
+            escritor.writerow([linha, *registro, erro])
+            pendentes += 1
+            if pendentes >= IMPORTACAO_BLOCO:
+                bloco.seek(0)
+                cursor.copy_expert(f"COPY importacao_staging ({destino}) FROM STDIN WITH (FORMAT csv)", bloco)
+                bloco.seek(0)
+                bloco.truncate()
+                pendentes = 0
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="O arquivo deve estar em UTF-8")
+    finally:
+        texto.detach()
+    if pendentes:
+        bloco.seek(0)
+        cursor.copy_expert(f"COPY importacao_staging ({destino}) FROM STDIN WITH (FORMAT csv)", bloco)
+
+def _importar(tipo: str, arquivo: UploadFile, current_user: dict):
+    """Carrega o CSV numa tabela temporária via COPY e aplica o upsert com SQL em lote.
+
+    1. COPY FROM STDIN para importacao_staging (todas as colunas como texto,
+       com o número da linha do arquivo, contado pelo leitor de CSV);
+    2. um UPDATE marca em `erro` as linhas inválidas (obrigatórias, tipos e
+       validações extras); um segundo, entre as válidas, as chaves repetidas
+       no arquivo (vale a última);
+    3. as linhas válidas são convertidas uma vez e gravadas com um UPDATE
+       (registros existentes, pela chave) e um INSERT (novos).
+
+    Células vazias não sobrescrevem valores existentes. Tudo roda numa
+    transação: as linhas válidas são gravadas e as inválidas voltam no relatório.
+    """
+    spec = IMPORTACOES[tipo]
+    colunas, separador = _ler_cabecalho(arquivo.file)
+    if "por_id" in spec and spec["por_id"]["chave"] in colunas:
+        spec = {**spec, **spec["por_id"]}
+    _validar_colunas(colunas, spec)
+
+    tabela = spec["tabela"]
+    chave = spec["chave"]
+    tipos = spec["colunas"]
+
+    conn = get_db_connection()
+    cursor = get_db_cursor(conn)
+    try:
+        cursor.execute(f"""
+            CREATE TEMP TABLE importacao_staging (
+                linha INTEGER,
+                {", ".join(f"{c} TEXT" for c in tipos)},
+                erro TEXT
+            ) ON COMMIT DROP
+        """)
+        _copiar_linhas(cursor, arquivo.file, colunas, separador)
+
+        # Validação em lote: a primeira regra que falhar vira a mensagem de erro da linha
+        regras = []
+        for c in spec["obrigatorias"]:
+            regras.append((f"NULLIF(btrim(s.{c}), '') IS NULL", f"'campo {c} é obrigatório'"))
+        for c, tipo_sql in tipos.items():
+            if tipo_sql != "text":
+                regras.append((f"NOT importacao_valor_valido(s.{c}, '{tipo_sql}')", f"'valor inválido em {c}: ' || s.{c}"))
+        regras.extend(spec["validacoes"])
+        casos = "\n".join(f"WHEN {cond} THEN {msg}" for cond, msg in regras)
+        cursor.execute(f"""
+            UPDATE importacao_staging s
+            SET erro = CASE {casos} END
+            WHERE erro IS NULL
+        """)
+
+        # Chave repetida: vale a última linha válida do arquivo. Calculado só
+        # depois da validação, para que uma linha posterior inválida não
+        # descarte a anterior correta
+        cursor.execute(f"""
+            UPDATE importacao_staging s
+            SET erro = '{chave} repetido no arquivo (vale a linha ' || d.ultima || ')'
+            FROM (
+                SELECT linha, MAX(linha) OVER (PARTITION BY btrim({chave})) AS ultima
+                FROM importacao_staging
+                WHERE erro IS NULL
+            ) d
+            WHERE d.linha = s.linha AND s.linha < d.ultima
+        """)
+
+        convertidas = ", ".join(f"NULLIF(btrim({c}), '')::{tipos[c]} AS {c}" for c in colunas)
+        cursor.execute(f"""
+            CREATE TEMP TABLE importacao_dados ON COMMIT DROP AS
+            SELECT linha, {convertidas}
+            FROM importacao_staging
+            WHERE erro IS NULL
+        """)
+
+        # Trava escrita concorrente na tabela de destino entre o UPDATE e o INSERT
+        cursor.execute(f"LOCK TABLE {tabela} IN SHARE ROW EXCLUSIVE MODE")
+
+        atualizaveis = [c for c in colunas if c != chave]
+        atualizadas = 0
+        if atualizaveis:
+            cursor.execute(f"""
+                UPDATE {tabela} t
+                SET {", ".join(f"{c} = COALESCE(d.{c}, t.{c})" for c in atualizaveis)}
+                FROM importacao_dados d
+                WHERE t.{chave} = d.{chave}
+            """)
+            atualizadas = cursor.rowcount
+
+        destino = list(colunas)
+        valores = [f"d.{c}" for c in colunas]
+        params = []
+        if spec["usuario"]:
+            destino.append("id_usuario_cadastrou")
+            valores.append("%s")
+            params.append(current_user["id_usuario"])
+        cursor.execute(f"""
+            INSERT INTO {tabela} ({", ".join(destino)})
+            SELECT {", ".join(valores)}
+            FROM importacao_dados d
+            WHERE NOT EXISTS (SELECT 1 FROM {tabela} t WHERE t.{chave} = d.{chave})
+            ORDER BY d.linha
+        """, params)
+        inseridas = cursor.rowcount
+
+        cursor.execute("SELECT COUNT(*) AS total, COUNT(erro) AS com_erro FROM importacao_staging")
+        contagem = cursor.fetchone()
+        cursor.execute(
+            "SELECT linha, erro FROM importacao_staging WHERE erro IS NOT NULL ORDER BY linha LIMIT %s",
+            (IMPORTACAO_MAX_ERROS,)
+        )
+        erros = [dict(row) for row in cursor.fetchall()]
+
+        invalidar_cache(conn, tabela)
+        conn.commit()
+        return {
+            "message": f"Importação de {tipo} concluída",
+            "recebidas": contagem["total"],
+            "inseridas": inseridas,
+            "atualizadas": atualizadas,
+            "com_erro": contagem["com_erro"],
+            "erros": erros,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        print(f"Erro ao importar {tipo}: {e}")
+        raise HTTPException(status_code=400, detail=f"Erro ao importar {tipo}: {str(e)}")
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+@router.post("/importar/produtos", response_model=dict)
+def importar_produtos(arquivo: UploadFile = File(..., description="CSV com cabeçalho: [id_produto,] nome, preco, validade, quant_min_estoque"), current_user: dict = Depends(require_admin)):
+    return _importar("produtos", arquivo, current_user)
+
+@router.post("/importar/clientes", response_model=dict)
+def importar_clientes(arquivo: UploadFile = File(..., description="CSV com cabeçalho: cpf, nome, email, tipo"), current_user: dict = Depends(require_admin)):
+    return _importar("clientes", arquivo, current_user)
+
+@router.post("/importar/estoque", response_model=dict)
+def importar_estoque(arquivo: UploadFile = File(..., description="CSV com cabeçalho: id_produto, quant_present"), current_user: dict = Depends(require_admin)):
+    return _importar("estoque", arquivo, current_user)
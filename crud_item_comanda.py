@@ -1,33 +1,71 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+from fastapi import APIRouter, HTTPException, Depends, Response
+from psycopg2.extras import execute_values
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import ItemComanda, ItemComandaCreate, ItemComandaUpdate
 from typing import List
 from auth import require_auth
+from listagem import listagem, campos, paginacao, paginar
+from inventario import movimentar_itens
+from escrita import executar, remover
 
 router = APIRouter()
 
+LISTAGEM_ITEM_COMANDA = listagem(
+    filtros={
+        "id_comanda": ("id_comanda", int),
+        "id_produto": ("id_produto", int),
+    },
+)
+
+CAMPOS_ITEM_COMANDA = campos([
+    "id_item_comanda",
+    "id_comanda",
+    "id_produto",
+    "quantidade",
+    "preco_unitario",
+])
+
+# Máximo de itens aceitos por chamada de /item_comanda/lote
+LOTE_MAX_ITENS = 500
+
+def _ajustar_total(cursor, id_comanda, valor, quantidade):
+    """Soma `valor`/`quantidade` (podem ser negativos) aos totais da comanda.
+
+    Chamado na mesma transação da alteração do item; o UPDATE trava a linha
+    da comanda, então lançamentos concorrentes na mesma mesa não se perdem.
+    """
+    if id_comanda is None:
+        return
+    cursor.execute(
+        """UPDATE comanda
+           SET subtotal = subtotal + %s, quant_itens = quant_itens + %s, atualizado_em = NOW()
+           WHERE id_comanda = %s""",
+        (valor, quantidade, id_comanda)
+    )
+
+def _valor_item(item):
+    quantidade = item['quantidade'] or 0
+    return quantidade * (item['preco_unitario'] or 0), quantidade
+
 @router.post("/item_comanda/", response_model=dict)
-async def create_item_comanda(item: ItemComandaCreate, current_user: dict = Depends(require_auth)):
+def create_item_comanda(item: ItemComandaCreate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        # Verifica se comanda existe
-        cursor.execute("SELECT 1 FROM comanda WHERE id_comanda = %s", (item.id_comanda,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Comanda não encontrada")
-            
-        # Verifica se produto existe
-        cursor.execute("SELECT 1 FROM produto WHERE id_produto = %s", (item.id_produto,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Produto não encontrado")
-
-        cursor.execute(
-            """INSERT INTO item_comanda (id_comanda, id_produto, quantidade) 
-               VALUES (%s, %s, %s)""",
-            (item.id_comanda, item.id_produto, item.quantidade)
+        # Uma ida ao banco: sem preco_unitario, o item é lançado com o preço atual
+        # do produto; comanda ou produto inexistentes viram 404 pelas FKs
+        novo = executar(
+            cursor,
+            """INSERT INTO item_comanda (id_comanda, id_produto, quantidade, preco_unitario)
+               VALUES (%s, %s, %s, COALESCE(%s, (SELECT preco FROM produto WHERE id_produto = %s)))
+               RETURNING *""",
+            (item.id_comanda, item.id_produto, item.quantidade, item.preco_unitario, item.id_produto),
+            "item_comanda",
         )
+        _ajustar_total(cursor, item.id_comanda, *_valor_item(novo))
+        alertas = movimentar_itens(cursor, [(item.id_produto, item.quantidade)])
         conn.commit()
-        return {"message": "Item da comanda criado com sucesso"}
+        return {"message": "Item da comanda criado com sucesso", **dict(novo), "alertas_estoque": alertas}
     except HTTPException:
         raise
     except Exception as e:
@@ -36,28 +74,92 @@ async def create_item_comanda(item: ItemComandaCreate, current_user: dict = Depe
         raise HTTPException(status_code=400, detail=f"Erro ao criar item da comanda: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
+
+@router.post("/item_comanda/lote", response_model=dict)
+def create_itens_comanda_lote(itens: List[ItemComandaCreate], current_user: dict = Depends(require_auth)):
+    """Lança vários itens de uma vez: uma validação por tabela, um INSERT e um commit"""
+    if not itens:
+        raise HTTPException(status_code=400, detail="Nenhum item informado")
+    if len(itens) > LOTE_MAX_ITENS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {LOTE_MAX_ITENS} itens por lote")
+
+    conn = get_db_connection()
+    cursor = get_db_cursor(conn)
+    try:
+        ids_comanda = sorted({item.id_comanda for item in itens if item.id_comanda is not None})
+        cursor.execute("SELECT id_comanda FROM comanda WHERE id_comanda = ANY(%s)", (ids_comanda,))
+        encontradas = {row['id_comanda'] for row in cursor.fetchall()}
+        faltando = [i for i, item in enumerate(itens) if item.id_comanda not in encontradas]
+        if faltando:
+            raise HTTPException(status_code=404, detail=f"Comanda não encontrada nos itens (posição): {faltando}")
+
+        ids_produto = sorted({item.id_produto for item in itens if item.id_produto is not None})
+        cursor.execute("SELECT id_produto, preco FROM produto WHERE id_produto = ANY(%s)", (ids_produto,))
+        precos = {row['id_produto']: row['preco'] for row in cursor.fetchall()}
+        faltando = [i for i, item in enumerate(itens) if item.id_produto not in precos]
+        if faltando:
+            raise HTTPException(status_code=404, detail=f"Produto não encontrado nos itens (posição): {faltando}")
+
+        linhas = [
+            (item.id_comanda, item.id_produto, item.quantidade,
+             item.preco_unitario if item.preco_unitario is not None else precos[item.id_produto])
+            for item in itens
+        ]
+        criados = execute_values(
+            cursor,
+            """INSERT INTO item_comanda (id_comanda, id_produto, quantidade, preco_unitario)
+               VALUES %s
+               RETURNING id_item_comanda, id_comanda, quantidade, preco_unitario""",
+            linhas,
+            page_size=LOTE_MAX_ITENS,
+            fetch=True,
+        )
+
+        # Um ajuste de total por comanda, em ordem de id (mesma ordem de lock entre transações)
+        totais = {}
+        for row in criados:
+            valor, quantidade = _valor_item(row)
+            valor_total, quantidade_total = totais.get(row['id_comanda'], (0, 0))
+            totais[row['id_comanda']] = (valor_total + valor, quantidade_total + quantidade)
+        for id_comanda in sorted(totais):
+            _ajustar_total(cursor, id_comanda, *totais[id_comanda])
+
+        alertas = movimentar_itens(cursor, [(item.id_produto, item.quantidade) for item in itens])
+        conn.commit()
+        return {
+            "message": f"{len(criados)} itens da comanda criados com sucesso",
+            "ids": [row['id_item_comanda'] for row in criados],
+            "alertas_estoque": alertas,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        print(f"Erro ao criar itens da comanda em lote: {e}")
+        raise HTTPException(status_code=400, detail=f"Erro ao criar itens da comanda: {str(e)}")
+    finally:
+        cursor.close()
+        release_db_connection(conn)
 
 @router.get("/item_comanda/", response_model=List[dict])
-async def get_itens_comanda(current_user: dict = Depends(require_auth)):
+def get_itens_comanda(response: Response, pagina: dict = Depends(LISTAGEM_ITEM_COMANDA), colunas: str = Depends(CAMPOS_ITEM_COMANDA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM item_comanda")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        return paginar(cursor, response, f"SELECT {colunas} FROM item_comanda", "id_item_comanda", pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/item_comanda/{id_item_comanda}", response_model=dict)
-async def get_item_comanda(id_item_comanda: int, current_user: dict = Depends(require_auth)):
+def get_item_comanda(id_item_comanda: int, colunas: str = Depends(CAMPOS_ITEM_COMANDA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM item_comanda WHERE id_item_comanda = %s", (id_item_comanda,))
+        cursor.execute(f"SELECT {colunas} FROM item_comanda WHERE id_item_comanda = %s", (id_item_comanda,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Item da comanda não encontrado")
@@ -68,29 +170,26 @@ async def get_item_comanda(id_item_comanda: int, current_user: dict = Depends(re
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/item_comanda/comanda/{id_comanda}", response_model=List[dict])
-async def get_itens_by_comanda(id_comanda: int, current_user: dict = Depends(require_auth)):
+def get_itens_by_comanda(id_comanda: int, response: Response, pagina: dict = Depends(paginacao), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("""
+        return paginar(cursor, response, """
             SELECT ic.*, p.nome as produto_nome 
             FROM item_comanda ic
             LEFT JOIN produto p ON ic.id_produto = p.id_produto
-            WHERE ic.id_comanda = %s
-        """, (id_comanda,))
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        """, "ic.id_item_comanda", pagina, where=["ic.id_comanda = %s"], params=(id_comanda,))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.put("/item_comanda/{id_item_comanda}", response_model=dict)
-async def update_item_comanda(id_item_comanda: int, item: ItemComandaUpdate, current_user: dict = Depends(require_auth)):
+def update_item_comanda(id_item_comanda: int, item: ItemComandaUpdate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
@@ -105,24 +204,55 @@ async def update_item_comanda(id_item_comanda: int, item: ItemComandaUpdate, cur
         if item.quantidade is not None:
             updates.append("quantidade = %s")
             values.append(item.quantidade)
-        
-        # preco_unitario removido pois nao consta na tabela item_comanda
+        if item.preco_unitario is not None:
+            updates.append("preco_unitario = %s")
+            values.append(item.preco_unitario)
+        elif item.id_produto is not None:
+            # Troca de produto sem preço informado: usa o preço atual do novo produto
+            updates.append("preco_unitario = (SELECT preco FROM produto WHERE id_produto = %s)")
+            values.append(item.id_produto)
 
         if not updates:
             raise HTTPException(status_code=400, detail="Nenhum campo fornecido para atualização")
-        
+
+        # Valores antigos do item, para desfazer sua contribuição no total da comanda
+        cursor.execute(
+            "SELECT id_comanda, id_produto, quantidade, preco_unitario FROM item_comanda WHERE id_item_comanda = %s FOR UPDATE",
+            (id_item_comanda,)
+        )
+        antigo = cursor.fetchone()
+        if not antigo:
+            raise HTTPException(status_code=404, detail=f"Item da comanda com ID {id_item_comanda} não encontrado")
+
+        # Troca de comanda: trava as duas em ordem de id antes de ajustar os
+        # totais (como no lote), para que trocas simultâneas em sentidos
+        # opostos não entrem em deadlock
+        if item.id_comanda is not None and item.id_comanda != antigo['id_comanda']:
+            cursor.execute(
+                "SELECT id_comanda FROM comanda WHERE id_comanda = ANY(%s) ORDER BY id_comanda FOR NO KEY UPDATE",
+                ([c for c in (antigo['id_comanda'], item.id_comanda) if c is not None],)
+            )
+
         values.append(id_item_comanda)
-        query = f"UPDATE item_comanda SET {', '.join(updates)} WHERE id_item_comanda = %s"
-        cursor.execute(query, values)
-        
-        if cursor.rowcount == 0:
-            # Verifica se item existe
-            cursor.execute("SELECT 1 FROM item_comanda WHERE id_item_comanda = %s", (id_item_comanda,))
-            if not cursor.fetchone():
-               raise HTTPException(status_code=404, detail=f"Item da comanda com ID {id_item_comanda} não encontrado")
-        
+        query = f"UPDATE item_comanda SET {', '.join(updates)} WHERE id_item_comanda = %s RETURNING *"
+        novo = executar(cursor, query, values, "item_comanda")
+
+        valor_antigo, quantidade_antiga = _valor_item(antigo)
+        valor_novo, quantidade_nova = _valor_item(novo)
+        if antigo['id_comanda'] == novo['id_comanda']:
+            _ajustar_total(cursor, novo['id_comanda'], valor_novo - valor_antigo, quantidade_nova - quantidade_antiga)
+        else:
+            _ajustar_total(cursor, antigo['id_comanda'], -valor_antigo, -quantidade_antiga)
+            _ajustar_total(cursor, novo['id_comanda'], valor_novo, quantidade_nova)
+
+        # Devolve ao estoque o que estava lançado e baixa o novo lançamento
+        alertas = movimentar_itens(cursor, [
+            (antigo['id_produto'], -quantidade_antiga),
+            (novo['id_produto'], quantidade_nova),
+        ])
+
         conn.commit()
-        return {"message": "Item da comanda atualizado com sucesso"}
+        return {"message": "Item da comanda atualizado com sucesso", **dict(novo), "alertas_estoque": alertas}
     except HTTPException:
         raise
     except Exception as e:
@@ -131,20 +261,19 @@ async def update_item_comanda(id_item_comanda: int, item: ItemComandaUpdate, cur
         raise HTTPException(status_code=400, detail=f"Erro ao atualizar item da comanda: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/item_comanda/{id_item_comanda}", response_model=dict)
-async def delete_item_comanda(id_item_comanda: int, current_user: dict = Depends(require_auth)):
+def delete_item_comanda(id_item_comanda: int, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM item_comanda WHERE id_item_comanda = %s", (id_item_comanda,))
+        removido = remover(cursor, "item_comanda", "id_item_comanda", id_item_comanda)
+        valor, quantidade = _valor_item(removido)
+        _ajustar_total(cursor, removido['id_comanda'], -valor, -quantidade)
+        movimentar_itens(cursor, [(removido['id_produto'], -quantidade)])
         conn.commit()
-        
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Item da comanda não encontrado")
-        
-        return {"message": "Item da comanda deletado com sucesso"}
+        return {"message": "Item da comanda deletado com sucesso", **removido}
     except HTTPException:
         raise
     except Exception as e:
@@ -152,5 +281,5 @@ async def delete_item_comanda(id_item_comanda: int, current_user: dict = Depends
         raise HTTPException(status_code=400, detail=f"Erro ao deletar item da comanda: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
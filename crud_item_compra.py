@@ -1,33 +1,46 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+from fastapi import APIRouter, HTTPException, Depends, Response, Query
+from psycopg2.extras import execute_values
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import ItemCompra, ItemCompraCreate, ItemCompraUpdate
 from typing import List
 from auth import require_auth
+from listagem import listagem, campos, paginacao, paginar, exportar
+from inventario import movimentar_itens
+from escrita import inserir, executar, remover
 
 router = APIRouter()
 
+LISTAGEM_ITEM_COMPRA = listagem(
+    filtros={
+        "id_compra": ("id_compra", int),
+        "id_produto": ("id_produto", int),
+    },
+)
+
+CAMPOS_ITEM_COMPRA = campos([
+    "id_item_compra",
+    "id_compra",
+    "id_produto",
+    "quantidade",
+])
+
+# Máximo de itens aceitos por chamada de /item_compra/lote
+LOTE_MAX_ITENS = 500
+
 @router.post("/item_compra/", response_model=dict)
-async def create_item_compra(item: ItemCompraCreate, current_user: dict = Depends(require_auth)):
+def create_item_compra(item: ItemCompraCreate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        # Verifica se compra existe
-        cursor.execute("SELECT 1 FROM compra WHERE id_compra = %s", (item.id_compra,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Compra não encontrada")
-            
-        # Verifica se produto existe
-        cursor.execute("SELECT 1 FROM produto WHERE id_produto = %s", (item.id_produto,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Produto não encontrado")
-
-        cursor.execute(
-            """INSERT INTO item_compra (id_compra, id_produto, quantidade) 
-               VALUES (%s, %s, %s)""",
-            (item.id_compra, item.id_produto, item.quantidade)
-        )
+        # Compra ou produto inexistentes viram 404 pelas FKs
+        novo = inserir(cursor, "item_compra", {
+            "id_compra": item.id_compra,
+            "id_produto": item.id_produto,
+            "quantidade": item.quantidade,
+        })
+        alertas = movimentar_itens(cursor, [(item.id_produto, item.quantidade)])
         conn.commit()
-        return {"message": "Item da compra criado com sucesso"}
+        return {"message": "Item da compra criado com sucesso", **novo, "alertas_estoque": alertas}
     except HTTPException:
         raise
     except Exception as e:
@@ -36,28 +49,81 @@ async def create_item_compra(item: ItemCompraCreate, current_user: dict = Depend
         raise HTTPException(status_code=400, detail=f"Erro ao criar item da compra: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
+
+@router.post("/item_compra/lote", response_model=dict)
+def create_itens_compra_lote(itens: List[ItemCompraCreate], current_user: dict = Depends(require_auth)):
+    """Lança vários itens de uma vez: uma validação por tabela, um INSERT e um commit"""
+    if not itens:
+        raise HTTPException(status_code=400, detail="Nenhum item informado")
+    if len(itens) > LOTE_MAX_ITENS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {LOTE_MAX_ITENS} itens por lote")
+
+    conn = get_db_connection()
+    cursor = get_db_cursor(conn)
+    try:
+        ids_compra = sorted({item.id_compra for item in itens if item.id_compra is not None})
+        cursor.execute("SELECT id_compra FROM compra WHERE id_compra = ANY(%s)", (ids_compra,))
+        encontradas = {row['id_compra'] for row in cursor.fetchall()}
+        faltando = [i for i, item in enumerate(itens) if item.id_compra not in encontradas]
+        if faltando:
+            raise HTTPException(status_code=404, detail=f"Compra não encontrada nos itens (posição): {faltando}")
+
+        ids_produto = sorted({item.id_produto for item in itens if item.id_produto is not None})
+        cursor.execute("SELECT id_produto FROM produto WHERE id_produto = ANY(%s)", (ids_produto,))
+        encontrados = {row['id_produto'] for row in cursor.fetchall()}
+        faltando = [i for i, item in enumerate(itens) if item.id_produto not in encontrados]
+        if faltando:
+            raise HTTPException(status_code=404, detail=f"Produto não encontrado nos itens (posição): {faltando}")
+
+        criados = execute_values(
+            cursor,
+            """INSERT INTO item_compra (id_compra, id_produto, quantidade)
+               VALUES %s
+               RETURNING id_item_compra""",
+            [(item.id_compra, item.id_produto, item.quantidade) for item in itens],
+            page_size=LOTE_MAX_ITENS,
+            fetch=True,
+        )
+        alertas = movimentar_itens(cursor, [(item.id_produto, item.quantidade) for item in itens])
+        conn.commit()
+        return {
+            "message": f"{len(criados)} itens da compra criados com sucesso",
+            "ids": [row['id_item_compra'] for row in criados],
+            "alertas_estoque": alertas,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        print(f"Erro ao criar itens da compra em lote: {e}")
+        raise HTTPException(status_code=400, detail=f"Erro ao criar itens da compra: {str(e)}")
+    finally:
+        cursor.close()
+        release_db_connection(conn)
 
 @router.get("/item_compra/", response_model=List[dict])
-async def get_itens_compra(current_user: dict = Depends(require_auth)):
+def get_itens_compra(response: Response, pagina: dict = Depends(LISTAGEM_ITEM_COMPRA), colunas: str = Depends(CAMPOS_ITEM_COMPRA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM item_compra")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        return paginar(cursor, response, f"SELECT {colunas} FROM item_compra", "id_item_compra", pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
+
+@router.get("/item_compra/export")
+def export_itens_compra(formato: str = Query("ndjson", description="ndjson ou csv"), current_user: dict = Depends(require_auth)):
+    return exportar("SELECT * FROM item_compra", "id_item_compra", formato, "itens_compra")
 
 @router.get("/item_compra/{id_item_compra}", response_model=dict)
-async def get_item_compra(id_item_compra: int, current_user: dict = Depends(require_auth)):
+def get_item_compra(id_item_compra: int, colunas: str = Depends(CAMPOS_ITEM_COMPRA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM item_compra WHERE id_item_compra = %s", (id_item_compra,))
+        cursor.execute(f"SELECT {colunas} FROM item_compra WHERE id_item_compra = %s", (id_item_compra,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Item da compra não encontrado")
@@ -68,29 +134,26 @@ async def get_item_compra(id_item_compra: int, current_user: dict = Depends(requ
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/item_compra/compra/{id_compra}", response_model=List[dict])
-async def get_itens_by_compra(id_compra: int, current_user: dict = Depends(require_auth)):
+def get_itens_by_compra(id_compra: int, response: Response, pagina: dict = Depends(paginacao), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("""
+        return paginar(cursor, response, """
             SELECT ic.*, p.nome as produto_nome 
             FROM item_compra ic
             LEFT JOIN produto p ON ic.id_produto = p.id_produto
-            WHERE ic.id_compra = %s
-        """, (id_compra,))
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        """, "ic.id_item_compra", pagina, where=["ic.id_compra = %s"], params=(id_compra,))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.put("/item_compra/{id_item_compra}", response_model=dict)
-async def update_item_compra(id_item_compra: int, item: ItemCompraUpdate, current_user: dict = Depends(require_auth)):
+def update_item_compra(id_item_compra: int, item: ItemCompraUpdate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
@@ -111,18 +174,25 @@ async def update_item_compra(id_item_compra: int, item: ItemCompraUpdate, curren
         if not updates:
             raise HTTPException(status_code=400, detail="Nenhum campo fornecido para atualização")
         
+        # Valores antigos do item, para devolver ao estoque o que estava lançado
+        cursor.execute(
+            "SELECT id_produto, quantidade FROM item_compra WHERE id_item_compra = %s FOR UPDATE",
+            (id_item_compra,)
+        )
+        antigo = cursor.fetchone()
+        if not antigo:
+            raise HTTPException(status_code=404, detail=f"Item da compra com ID {id_item_compra} não encontrado")
+
         values.append(id_item_compra)
-        query = f"UPDATE item_compra SET {', '.join(updates)} WHERE id_item_compra = %s"
-        cursor.execute(query, values)
+        query = f"UPDATE item_compra SET {', '.join(updates)} WHERE id_item_compra = %s RETURNING *"
+        novo = executar(cursor, query, values, "item_compra")
+
+        alertas = movimentar_itens(cursor, [
+            (antigo['id_produto'], -(antigo['quantidade'] or 0)),
+            (novo['id_produto'], novo['quantidade'] or 0),
+        ])
         conn.commit()
-        
-        if cursor.rowcount == 0:
-            # Verifica se item existe
-            cursor.execute("SELECT 1 FROM item_compra WHERE id_item_compra = %s", (id_item_compra,))
-            if not cursor.fetchone():
-               raise HTTPException(status_code=404, detail=f"Item da compra com ID {id_item_compra} não encontrado")
-        
-        return {"message": "Item da compra atualizado com sucesso"}
+        return {"message": "Item da compra atualizado com sucesso", **dict(novo), "alertas_estoque": alertas}
     except HTTPException:
         raise
     except Exception as e:
@@ -131,20 +201,17 @@ async def update_item_compra(id_item_compra: int, item: ItemCompraUpdate, curren
         raise HTTPException(status_code=400, detail=f"Erro ao atualizar item da compra: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/item_compra/{id_item_compra}", response_model=dict)
-async def delete_item_compra(id_item_compra: int, current_user: dict = Depends(require_auth)):
+def delete_item_compra(id_item_compra: int, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM item_compra WHERE id_item_compra = %s", (id_item_compra,))
+        removido = remover(cursor, "item_compra", "id_item_compra", id_item_compra)
+        movimentar_itens(cursor, [(removido['id_produto'], -(removido['quantidade'] or 0))])
         conn.commit()
-        
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Item da compra não encontrado")
-        
-        return {"message": "Item da compra deletado com sucesso"}
+        return {"message": "Item da compra deletado com sucesso", **removido}
     except HTTPException:
         raise
     except Exception as e:
@@ -152,5 +219,5 @@ async def delete_item_compra(id_item_compra: int, current_user: dict = Depends(r
         raise HTTPException(status_code=400, detail=f"Erro ao deletar item da compra: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
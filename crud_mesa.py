@@ -1,49 +1,70 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import Mesa, MesaCreate, MesaUpdate
 from typing import List
 from auth import require_auth
+from listagem import listagem, campos, paginar
+from cache import em_cache, com_etag
+from escrita import inserir, atualizar, remover, campos_informados
 
 router = APIRouter()
 
+LISTAGEM_MESA = listagem(
+    filtros={
+        "status": ("status", str),
+        "numero": ("numero", int),
+    },
+    ordenacao={
+        "numero": ("numero", int),
+    },
+)
+
+CAMPOS_MESA = campos([
+    "id_mesa",
+    "numero",
+    "status",
+])
+
 @router.post("/mesas/", response_model=dict)
-async def create_mesa(mesa: MesaCreate, current_user: dict = Depends(require_auth)):
+def create_mesa(mesa: MesaCreate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute(
-            "INSERT INTO mesa (numero, status) VALUES (%s, %s)",
-            (mesa.numero, mesa.status)
-        )
+        novo = inserir(cursor, "mesa", {
+            "numero": mesa.numero,
+            "status": mesa.status,
+        })
         conn.commit()
-        return {"message": "Mesa criada com sucesso"}
+        return {"message": "Mesa criada com sucesso", **novo}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar mesa: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/mesas/", response_model=List[dict])
-async def get_mesas(current_user: dict = Depends(require_auth)):
+@com_etag("mesa")
+@em_cache("mesa")
+def get_mesas(request: Request, response: Response, pagina: dict = Depends(LISTAGEM_MESA), colunas: str = Depends(CAMPOS_MESA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM mesa")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        return paginar(cursor, response, f"SELECT {colunas} FROM mesa", "id_mesa", pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/mesas/{id_mesa}", response_model=dict)
-async def get_mesa(id_mesa: int, current_user: dict = Depends(require_auth)):
+def get_mesa(id_mesa: int, colunas: str = Depends(CAMPOS_MESA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM mesa WHERE id_mesa = %s", (id_mesa,))
+        cursor.execute(f"SELECT {colunas} FROM mesa WHERE id_mesa = %s", (id_mesa,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Mesa não encontrada")
@@ -54,49 +75,38 @@ async def get_mesa(id_mesa: int, current_user: dict = Depends(require_auth)):
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.put("/mesas/{id_mesa}", response_model=dict)
-async def update_mesa(id_mesa: int, mesa: MesaUpdate, current_user: dict = Depends(require_auth)):
+def update_mesa(id_mesa: int, mesa: MesaUpdate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        updates = []
-        values = []
-        if mesa.numero is not None:
-            updates.append("numero = %s")
-            values.append(mesa.numero)
-        if mesa.status is not None:
-            updates.append("status = %s")
-            values.append(mesa.status)
-        
-        if not updates:
-            raise HTTPException(status_code=400, detail="Nenhum campo para atualizar")
-        
-        values.append(id_mesa)
-        query = f"UPDATE mesa SET {', '.join(updates)} WHERE id_mesa = %s"
-        cursor.execute(query, values)
+        atualizado = atualizar(cursor, "mesa", "id_mesa", id_mesa, campos_informados(mesa, ["numero", "status"]))
         conn.commit()
-        return {"message": "Mesa atualizada com sucesso"}
+        return {"message": "Mesa atualizada com sucesso", **atualizado}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Erro ao atualizar mesa: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/mesas/{id_mesa}", response_model=dict)
-async def delete_mesa(id_mesa: int, current_user: dict = Depends(require_auth)):
+def delete_mesa(id_mesa: int, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM mesa WHERE id_mesa = %s", (id_mesa,))
+        removido = remover(cursor, "mesa", "id_mesa", id_mesa)
         conn.commit()
-        return {"message": "Mesa deletada com sucesso"}
+        return {"message": "Mesa deletada com sucesso", **removido}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Erro ao deletar mesa: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
-
+        release_db_connection(conn)
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from db import get_pool_stats
+from metricas import exportar_metricas
+from auth import require_admin
+from cache import estatisticas_cache
+from notificacoes import central
+
+router = APIRouter()
+
+# Estatísticas do pool expostas junto com as métricas HTTP: (chave, nome, tipo, ajuda)
+METRICAS_POOL = [
+    ("size", "db_pool_connections", "gauge", "Conexões abertas no pool"),
+    ("idle", "db_pool_idle_connections", "gauge", "Conexões ociosas no pool"),
+    ("in_use", "db_pool_in_use_connections", "gauge", "Conexões emprestadas aos handlers"),
+    ("maxconn", "db_pool_max_connections", "gauge", "Limite de conexões do pool"),
+    ("checkouts", "db_pool_checkouts_total", "counter", "Conexões entregues pelo pool"),
+    ("waits", "db_pool_waits_total", "counter", "Pedidos de conexão que esperaram o pool esvaziado"),
+    ("timeouts", "db_pool_timeouts_total", "counter", "Pedidos de conexão que expiraram esperando"),
+]
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(current_user: dict = Depends(require_admin)):
+    """Métricas no formato texto do Prometheus (requisições, latência, banco, pool, autenticação)"""
+    stats = get_pool_stats()
+    extras = []
+    for chave, nome, tipo, ajuda in METRICAS_POOL:
+        extras.extend([f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}", f"{nome} {stats.get(chave, 0)}"])
+    extras.extend([
+        "# HELP response_cache_entries Respostas guardadas no cache",
+        "# TYPE response_cache_entries gauge",
+        f"response_cache_entries {estatisticas_cache()['entradas']}",
+    ])
+    tempo_real = central.estatisticas()
+    extras.extend([
+        "# HELP realtime_listener_up Conexão LISTEN do feed de alterações ativa (1) ou não (0)",
+        "# TYPE realtime_listener_up gauge",
+        f"realtime_listener_up {int(tempo_real['conectado'])}",
+        "# HELP realtime_subscribers Clientes conectados ao feed (SSE e WebSocket)",
+        "# TYPE realtime_subscribers gauge",
+        f"realtime_subscribers {tempo_real['assinantes']}",
+        "# HELP realtime_notifications_total Notificações recebidas do PostgreSQL",
+        "# TYPE realtime_notifications_total counter",
+        f"realtime_notifications_total {tempo_real['eventos']}",
+    ])
+    return PlainTextResponse(exportar_metricas(extras), media_type="text/plain; version=0.0.4; charset=utf-8")
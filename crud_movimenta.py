@@ -1,49 +1,77 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+from fastapi import APIRouter, HTTPException, Depends, Response, Query
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import Movimenta, MovimentaCreate, MovimentaUpdate
 from typing import List
+from datetime import date
 from auth import require_auth
+from listagem import listagem, campos, paginar, exportar
+from escrita import inserir, atualizar, remover, campos_informados
 
 router = APIRouter()
 
+LISTAGEM_MOVIMENTA = listagem(
+    filtros={
+        "id_estoque": ("id_estoque", int),
+        "tipo": ("tipo", str),
+        "data": ("data", date),
+    },
+    ordenacao={
+        "data": ("data", date),
+    },
+)
+
+CAMPOS_MOVIMENTA = campos([
+    "id_movimenta",
+    "id_estoque",
+    "tipo",
+    "quantidade",
+    "data",
+])
+
 @router.post("/movimentas/", response_model=dict)
-async def create_movimenta(movimenta: MovimentaCreate, current_user: dict = Depends(require_auth)):
+def create_movimenta(movimenta: MovimentaCreate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute(
-            "INSERT INTO movimenta (id_estoque, tipo, quantidade, data) VALUES (%s, %s, %s, %s)",
-            (movimenta.id_estoque, movimenta.tipo, movimenta.quantidade, movimenta.data)
-        )
+        novo = inserir(cursor, "movimenta", {
+            "id_estoque": movimenta.id_estoque,
+            "tipo": movimenta.tipo,
+            "quantidade": movimenta.quantidade,
+            "data": movimenta.data,
+        })
         conn.commit()
-        return {"message": "Movimentação criada com sucesso"}
+        return {"message": "Movimentação criada com sucesso", **novo}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar movimentação: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/movimentas/", response_model=List[dict])
-async def get_movimentas(current_user: dict = Depends(require_auth)):
+def get_movimentas(response: Response, pagina: dict = Depends(LISTAGEM_MOVIMENTA), colunas: str = Depends(CAMPOS_MOVIMENTA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM movimenta")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        return paginar(cursor, response, f"SELECT {colunas} FROM movimenta", "id_movimenta", pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
+
+@router.get("/movimentas/export")
+def export_movimentas(formato: str = Query("ndjson", description="ndjson ou csv"), current_user: dict = Depends(require_auth)):
+    return exportar("SELECT * FROM movimenta", "id_movimenta", formato, "movimentas")
 
 @router.get("/movimentas/{id_movimenta}", response_model=dict)
-async def get_movimenta(id_movimenta: int, current_user: dict = Depends(require_auth)):
+def get_movimenta(id_movimenta: int, colunas: str = Depends(CAMPOS_MOVIMENTA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM movimenta WHERE id_movimenta = %s", (id_movimenta,))
+        cursor.execute(f"SELECT {colunas} FROM movimenta WHERE id_movimenta = %s", (id_movimenta,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Movimentação não encontrada")
@@ -54,64 +82,38 @@ async def get_movimenta(id_movimenta: int, current_user: dict = Depends(require_
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.put("/movimentas/{id_movimenta}", response_model=dict)
-async def update_movimenta(id_movimenta: int, movimenta: MovimentaUpdate, current_user: dict = Depends(require_auth)):
+def update_movimenta(id_movimenta: int, movimenta: MovimentaUpdate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        updates = []
-        values = []
-        if movimenta.id_estoque is not None:
-            updates.append("id_estoque = %s")
-            values.append(movimenta.id_estoque)
-        if movimenta.tipo is not None:
-            updates.append("tipo = %s")
-            values.append(movimenta.tipo)
-        if movimenta.quantidade is not None:
-            updates.append("quantidade = %s")
-            values.append(movimenta.quantidade)
-        if movimenta.data is not None:
-            updates.append("data = %s")
-            values.append(movimenta.data)
-        
-        if not updates:
-            raise HTTPException(status_code=400, detail="Nenhum campo para atualizar")
-        
-        values.append(id_movimenta)
-        query = f"UPDATE movimenta SET {', '.join(updates)} WHERE id_movimenta = %s"
-        cursor.execute(query, values)
-        
-        if cursor.rowcount == 0:
-            # Verifica se movimenta existe
-            cursor.execute("SELECT 1 FROM movimenta WHERE id_movimenta = %s", (id_movimenta,))
-            if not cursor.fetchone():
-               raise HTTPException(status_code=404, detail=f"Movimentação com ID {id_movimenta} não encontrada")
-
+        atualizado = atualizar(cursor, "movimenta", "id_movimenta", id_movimenta, campos_informados(movimenta, ["id_estoque", "tipo", "quantidade", "data"]))
         conn.commit()
-        return {"message": "Movimentação atualizada com sucesso"}
+        return {"message": "Movimentação atualizada com sucesso", **atualizado}
     except HTTPException:
         raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Erro ao atualizar movimentação: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/movimentas/{id_movimenta}", response_model=dict)
-async def delete_movimenta(id_movimenta: int, current_user: dict = Depends(require_auth)):
+def delete_movimenta(id_movimenta: int, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM movimenta WHERE id_movimenta = %s", (id_movimenta,))
+        removido = remover(cursor, "movimenta", "id_movimenta", id_movimenta)
         conn.commit()
-        return {"message": "Movimentação deletada com sucesso"}
+        return {"message": "Movimentação deletada com sucesso", **removido}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Erro ao deletar movimentação: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
-
+        release_db_connection(conn)
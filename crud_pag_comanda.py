@@ -1,31 +1,45 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+from fastapi import APIRouter, HTTPException, Depends, Response
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import PagComanda, PagComandaCreate, PagComandaUpdate
 from typing import List
 from auth import require_auth
+from listagem import listagem, campos, paginacao, paginar
+from escrita import inserir, remover
 
 router = APIRouter()
 
+LISTAGEM_PAG_COMANDA = listagem(
+    filtros={
+        "id_pagamento": ("pc.id_pagamento", int),
+        "id_comanda": ("pc.id_comanda", int),
+    },
+)
+
+CAMPOS_PAG_COMANDA = campos(
+    {
+        "id_pag_comanda": "pc.id_pag_comanda",
+        "id_pagamento": "pc.id_pagamento",
+        "id_comanda": "pc.id_comanda",
+        "valor": "p.valor",
+        "forma": "p.forma",
+        "tipo_pagamento": "p.tipo_pagamento",
+        "numero_mesa": "c.numero_mesa",
+        "cpf_cliente": "c.cpf_cliente",
+    },
+    padrao="pc.*, p.valor, p.forma, p.tipo_pagamento, c.numero_mesa, c.cpf_cliente",
+)
+
 @router.post("/pag_comanda/", response_model=dict)
-async def create_pag_comanda(pag: PagComandaCreate, current_user: dict = Depends(require_auth)):
+def create_pag_comanda(pag: PagComandaCreate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT id_pagamento FROM pagamento WHERE id_pagamento = %s", (pag.id_pagamento,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Pagamento não encontrado")
-        
-        cursor.execute("SELECT id_comanda FROM comanda WHERE id_comanda = %s", (pag.id_comanda,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Comanda não encontrada")
-        
-        cursor.execute(
-            """INSERT INTO pag_comanda (id_pagamento, id_comanda) 
-               VALUES (%s, %s)""",
-            (pag.id_pagamento, pag.id_comanda)
-        )
+        novo = inserir(cursor, "pag_comanda", {
+            "id_pagamento": pag.id_pagamento,
+            "id_comanda": pag.id_comanda,
+        })
         conn.commit()
-        return {"message": "Pagamento de comanda criado com sucesso"}
+        return {"message": "Pagamento de comanda criado com sucesso", **novo}
     except HTTPException:
         raise
     except Exception as e:
@@ -33,34 +47,32 @@ async def create_pag_comanda(pag: PagComandaCreate, current_user: dict = Depends
         raise HTTPException(status_code=400, detail=f"Erro ao criar pagamento de comanda: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/pag_comanda/", response_model=List[dict])
-async def get_pag_comandas(current_user: dict = Depends(require_auth)):
+def get_pag_comandas(response: Response, pagina: dict = Depends(LISTAGEM_PAG_COMANDA), colunas: str = Depends(CAMPOS_PAG_COMANDA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("""
-            SELECT pc.*, p.valor, p.forma, p.tipo_pagamento, c.numero_mesa, c.cpf_cliente
+        return paginar(cursor, response, f"""
+            SELECT {colunas}
             FROM pag_comanda pc
             LEFT JOIN pagamento p ON pc.id_pagamento = p.id_pagamento
             LEFT JOIN comanda c ON pc.id_comanda = c.id_comanda
-        """)
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        """, "pc.id_pag_comanda", pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/pag_comanda/{id_pag_comanda}", response_model=dict)
-async def get_pag_comanda(id_pag_comanda: int, current_user: dict = Depends(require_auth)):
+def get_pag_comanda(id_pag_comanda: int, colunas: str = Depends(CAMPOS_PAG_COMANDA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("""
-            SELECT pc.*, p.valor, p.forma, p.tipo_pagamento, c.numero_mesa, c.cpf_cliente
+        cursor.execute(f"""
+            SELECT {colunas}
             FROM pag_comanda pc
             LEFT JOIN pagamento p ON pc.id_pagamento = p.id_pagamento
             LEFT JOIN comanda c ON pc.id_comanda = c.id_comanda
@@ -76,39 +88,32 @@ async def get_pag_comanda(id_pag_comanda: int, current_user: dict = Depends(requ
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/pag_comanda/comanda/{id_comanda}", response_model=List[dict])
-async def get_pag_by_comanda(id_comanda: int, current_user: dict = Depends(require_auth)):
+def get_pag_by_comanda(id_comanda: int, response: Response, pagina: dict = Depends(paginacao), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("""
+        return paginar(cursor, response, """
             SELECT pc.*, p.valor, p.forma, p.tipo_pagamento
             FROM pag_comanda pc
             LEFT JOIN pagamento p ON pc.id_pagamento = p.id_pagamento
-            WHERE pc.id_comanda = %s
-        """, (id_comanda,))
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        """, "pc.id_pag_comanda", pagina, where=["pc.id_comanda = %s"], params=(id_comanda,))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/pag_comanda/{id_pag_comanda}", response_model=dict)
-async def delete_pag_comanda(id_pag_comanda: int, current_user: dict = Depends(require_auth)):
+def delete_pag_comanda(id_pag_comanda: int, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM pag_comanda WHERE id_pag_comanda = %s", (id_pag_comanda,))
+        removido = remover(cursor, "pag_comanda", "id_pag_comanda", id_pag_comanda)
         conn.commit()
-        
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Pagamento de comanda não encontrado")
-        
-        return {"message": "Pagamento de comanda deletado com sucesso"}
+        return {"message": "Pagamento de comanda deletado com sucesso", **removido}
     except HTTPException:
         raise
     except Exception as e:
@@ -116,5 +121,4 @@ async def delete_pag_comanda(id_pag_comanda: int, current_user: dict = Depends(r
         raise HTTPException(status_code=400, detail=f"Erro ao deletar pagamento de comanda: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
-
+        release_db_connection(conn)
@@ -1,31 +1,45 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+from fastapi import APIRouter, HTTPException, Depends, Response
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import PagCompra, PagCompraCreate, PagCompraUpdate
 from typing import List
 from auth import require_auth
+from listagem import listagem, campos, paginacao, paginar
+from escrita import inserir, remover
 
 router = APIRouter()
 
+LISTAGEM_PAG_COMPRA = listagem(
+    filtros={
+        "id_pagamento": ("pc.id_pagamento", int),
+        "id_compra": ("pc.id_compra", int),
+    },
+)
+
+CAMPOS_PAG_COMPRA = campos(
+    {
+        "id_pag_compra": "pc.id_pag_compra",
+        "id_pagamento": "pc.id_pagamento",
+        "id_compra": "pc.id_compra",
+        "valor": "p.valor",
+        "forma": "p.forma",
+        "tipo_pagamento": "p.tipo_pagamento",
+        "cpf_cliente": "c.cpf_cliente",
+        "valor_total": "c.valor_total",
+    },
+    padrao="pc.*, p.valor, p.forma, p.tipo_pagamento, c.cpf_cliente, c.valor_total",
+)
+
 @router.post("/pag_compra/", response_model=dict)
-async def create_pag_compra(pag: PagCompraCreate, current_user: dict = Depends(require_auth)):
+def create_pag_compra(pag: PagCompraCreate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT id_pagamento FROM pagamento WHERE id_pagamento = %s", (pag.id_pagamento,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Pagamento não encontrado")
-        
-        cursor.execute("SELECT id_compra FROM compra WHERE id_compra = %s", (pag.id_compra,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Compra não encontrada")
-        
-        cursor.execute(
-            """INSERT INTO pag_compra (id_pagamento, id_compra) 
-               VALUES (%s, %s)""",
-            (pag.id_pagamento, pag.id_compra)
-        )
+        novo = inserir(cursor, "pag_compra", {
+            "id_pagamento": pag.id_pagamento,
+            "id_compra": pag.id_compra,
+        })
         conn.commit()
-        return {"message": "Pagamento de compra criado com sucesso"}
+        return {"message": "Pagamento de compra criado com sucesso", **novo}
     except HTTPException:
         raise
     except Exception as e:
@@ -33,34 +47,32 @@ async def create_pag_compra(pag: PagCompraCreate, current_user: dict = Depends(r
         raise HTTPException(status_code=400, detail=f"Erro ao criar pagamento de compra: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/pag_compra/", response_model=List[dict])
-async def get_pag_compras(current_user: dict = Depends(require_auth)):
+def get_pag_compras(response: Response, pagina: dict = Depends(LISTAGEM_PAG_COMPRA), colunas: str = Depends(CAMPOS_PAG_COMPRA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("""
-            SELECT pc.*, p.valor, p.forma, p.tipo_pagamento, c.cpf_cliente, c.valor_total
+        return paginar(cursor, response, f"""
+            SELECT {colunas}
             FROM pag_compra pc
             LEFT JOIN pagamento p ON pc.id_pagamento = p.id_pagamento
             LEFT JOIN compra c ON pc.id_compra = c.id_compra
-        """)
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        """, "pc.id_pag_compra", pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/pag_compra/{id_pag_compra}", response_model=dict)
-async def get_pag_compra(id_pag_compra: int, current_user: dict = Depends(require_auth)):
+def get_pag_compra(id_pag_compra: int, colunas: str = Depends(CAMPOS_PAG_COMPRA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("""
-            SELECT pc.*, p.valor, p.forma, p.tipo_pagamento, c.cpf_cliente, c.valor_total
+        cursor.execute(f"""
+            SELECT {colunas}
             FROM pag_compra pc
             LEFT JOIN pagamento p ON pc.id_pagamento = p.id_pagamento
             LEFT JOIN compra c ON pc.id_compra = c.id_compra
@@ -76,39 +88,32 @@ async def get_pag_compra(id_pag_compra: int, current_user: dict = Depends(requir
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/pag_compra/compra/{id_compra}", response_model=List[dict])
-async def get_pag_by_compra(id_compra: int, current_user: dict = Depends(require_auth)):
+def get_pag_by_compra(id_compra: int, response: Response, pagina: dict = Depends(paginacao), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("""
+        return paginar(cursor, response, """
             SELECT pc.*, p.valor, p.forma, p.tipo_pagamento
             FROM pag_compra pc
             LEFT JOIN pagamento p ON pc.id_pagamento = p.id_pagamento
-            WHERE pc.id_compra = %s
-        """, (id_compra,))
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        """, "pc.id_pag_compra", pagina, where=["pc.id_compra = %s"], params=(id_compra,))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/pag_compra/{id_pag_compra}", response_model=dict)
-async def delete_pag_compra(id_pag_compra: int, current_user: dict = Depends(require_auth)):
+def delete_pag_compra(id_pag_compra: int, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM pag_compra WHERE id_pag_compra = %s", (id_pag_compra,))
+        removido = remover(cursor, "pag_compra", "id_pag_compra", id_pag_compra)
         conn.commit()
-        
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Pagamento de compra não encontrado")
-        
-        return {"message": "Pagamento de compra deletado com sucesso"}
+        return {"message": "Pagamento de compra deletado com sucesso", **removido}
     except HTTPException:
         raise
     except Exception as e:
@@ -116,5 +121,4 @@ async def delete_pag_compra(id_pag_compra: int, current_user: dict = Depends(req
         raise HTTPException(status_code=400, detail=f"Erro ao deletar pagamento de compra: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
-
+        release_db_connection(conn)
@@ -1,49 +1,78 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+from fastapi import APIRouter, HTTPException, Depends, Response, Query
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import Pagamento, PagamentoCreate, PagamentoUpdate
 from typing import List
+from decimal import Decimal
 from auth import require_admin, require_auth
+from listagem import listagem, campos, paginar, exportar
+from escrita import inserir, atualizar, remover, campos_informados
 
 router = APIRouter()
 
+LISTAGEM_PAGAMENTO = listagem(
+    filtros={
+        "forma": ("forma", str),
+        "tipo_pagamento": ("tipo_pagamento", str),
+        "valor": ("valor", Decimal),
+        "id_usuario_cadastrou": ("id_usuario_cadastrou", int),
+    },
+    ordenacao={
+        "valor": ("valor", Decimal),
+    },
+)
+
+CAMPOS_PAGAMENTO = campos([
+    "id_pagamento",
+    "valor",
+    "forma",
+    "tipo_pagamento",
+    "id_usuario_cadastrou",
+])
+
 @router.post("/pagamentos/", response_model=dict)
-async def create_pagamento(pagamento: PagamentoCreate, current_user: dict = Depends(require_admin)):
+def create_pagamento(pagamento: PagamentoCreate, current_user: dict = Depends(require_admin)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute(
-            "INSERT INTO pagamento (valor, forma, tipo_pagamento, id_usuario_cadastrou) VALUES (%s, %s, %s, %s)",
-            (pagamento.valor, pagamento.forma, pagamento.tipo_pagamento, current_user['id_usuario'])
-        )
+        novo = inserir(cursor, "pagamento", {
+            "valor": pagamento.valor,
+            "forma": pagamento.forma,
+            "tipo_pagamento": pagamento.tipo_pagamento,
+            "id_usuario_cadastrou": current_user['id_usuario'],
+        })
         conn.commit()
-        return {"message": "Pagamento criado com sucesso"}
+        return {"message": "Pagamento criado com sucesso", **novo}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar pagamento: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/pagamentos/", response_model=List[dict])
-async def get_pagamentos(current_user: dict = Depends(require_auth)):
+def get_pagamentos(response: Response, pagina: dict = Depends(LISTAGEM_PAGAMENTO), colunas: str = Depends(CAMPOS_PAGAMENTO), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM pagamento")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        return paginar(cursor, response, f"SELECT {colunas} FROM pagamento", "id_pagamento", pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
+
+@router.get("/pagamentos/export")
+def export_pagamentos(formato: str = Query("ndjson", description="ndjson ou csv"), current_user: dict = Depends(require_auth)):
+    return exportar("SELECT * FROM pagamento", "id_pagamento", formato, "pagamentos")
 
 @router.get("/pagamentos/{id_pagamento}", response_model=dict)
-async def get_pagamento(id_pagamento: int, current_user: dict = Depends(require_auth)):
+def get_pagamento(id_pagamento: int, colunas: str = Depends(CAMPOS_PAGAMENTO), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM pagamento WHERE id_pagamento = %s", (id_pagamento,))
+        cursor.execute(f"SELECT {colunas} FROM pagamento WHERE id_pagamento = %s", (id_pagamento,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Pagamento não encontrado")
@@ -54,63 +83,38 @@ async def get_pagamento(id_pagamento: int, current_user: dict = Depends(require_
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.put("/pagamentos/{id_pagamento}", response_model=dict)
-async def update_pagamento(id_pagamento: int, pagamento: PagamentoUpdate, current_user: dict = Depends(require_admin)):
+def update_pagamento(id_pagamento: int, pagamento: PagamentoUpdate, current_user: dict = Depends(require_admin)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        updates = []
-        values = []
-        if pagamento.valor is not None:
-            updates.append("valor = %s")
-            values.append(pagamento.valor)
-        if pagamento.forma is not None:
-            updates.append("forma = %s")
-            values.append(pagamento.forma)
-        if pagamento.tipo_pagamento is not None:
-            updates.append("tipo_pagamento = %s")
-            values.append(pagamento.tipo_pagamento)
-        
-        # id_usuario_cadastrou removido pois nao consta no model PagamentoUpdate
-        
-        if not updates:
-            raise HTTPException(status_code=400, detail="Nenhum campo fornecido para atualização")
-        
-        values.append(id_pagamento)
-        query = f"UPDATE pagamento SET {', '.join(updates)} WHERE id_pagamento = %s"
-        cursor.execute(query, values)
-        
-        if cursor.rowcount == 0:
-            # Verifica se pagamento existe
-            cursor.execute("SELECT 1 FROM pagamento WHERE id_pagamento = %s", (id_pagamento,))
-            if not cursor.fetchone():
-               raise HTTPException(status_code=404, detail=f"Pagamento com ID {id_pagamento} não encontrado")
-        
+        atualizado = atualizar(cursor, "pagamento", "id_pagamento", id_pagamento, campos_informados(pagamento, ["valor", "forma", "tipo_pagamento"]))
         conn.commit()
-        return {"message": "Pagamento atualizado com sucesso"}
+        return {"message": "Pagamento atualizado com sucesso", **atualizado}
     except HTTPException:
         raise
     except Exception as e:
         conn.rollback()
-        print(f"Erro ao atualizar pagamento: {e}")
         raise HTTPException(status_code=400, detail=f"Erro ao atualizar pagamento: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/pagamentos/{id_pagamento}", response_model=dict)
-async def delete_pagamento(id_pagamento: int, current_user: dict = Depends(require_admin)):
+def delete_pagamento(id_pagamento: int, current_user: dict = Depends(require_admin)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM pagamento WHERE id_pagamento = %s", (id_pagamento,))
+        removido = remover(cursor, "pagamento", "id_pagamento", id_pagamento)
         conn.commit()
-        return {"message": "Pagamento deletado com sucesso"}
+        return {"message": "Pagamento deletado com sucesso", **removido}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Erro ao deletar pagamento: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
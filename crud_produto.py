@@ -1,49 +1,82 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import Produto, ProdutoCreate, ProdutoUpdate
 from typing import List
+from datetime import date
+from decimal import Decimal
 from auth import require_auth
+from listagem import listagem, campos, paginar
+from cache import em_cache, com_etag
+from escrita import inserir, atualizar, remover, campos_informados
 
 router = APIRouter()
 
+LISTAGEM_PRODUTO = listagem(
+    filtros={
+        "nome": ("nome", str),
+        "preco": ("preco", Decimal),
+        "validade": ("validade", date),
+        "id_usuario_cadastrou": ("id_usuario_cadastrou", int),
+    },
+    ordenacao={
+        "nome": ("nome", str),
+        "preco": ("preco", Decimal),
+        "validade": ("validade", date),
+    },
+)
+
+CAMPOS_PRODUTO = campos([
+    "id_produto",
+    "nome",
+    "preco",
+    "validade",
+    "quant_min_estoque",
+    "id_usuario_cadastrou",
+])
+
 @router.post("/produtos/", response_model=dict)
-async def create_produto(produto: ProdutoCreate, current_user: dict = Depends(require_auth)):
+def create_produto(produto: ProdutoCreate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute(
-            "INSERT INTO produto (nome, preco, validade, quant_min_estoque, id_usuario_cadastrou) VALUES (%s, %s, %s, %s, %s)",
-            (produto.nome, produto.preco, produto.validade, produto.quant_min_estoque, current_user['id_usuario'])
-        )
+        novo = inserir(cursor, "produto", {
+            "nome": produto.nome,
+            "preco": produto.preco,
+            "validade": produto.validade,
+            "quant_min_estoque": produto.quant_min_estoque,
+            "id_usuario_cadastrou": current_user['id_usuario'],
+        })
         conn.commit()
-        return {"message": "Produto criado com sucesso"}
+        return {"message": "Produto criado com sucesso", **novo}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar produto: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/produtos/", response_model=List[dict])
-async def get_produtos(current_user: dict = Depends(require_auth)):
+@com_etag("produto")
+@em_cache("produto")
+def get_produtos(request: Request, response: Response, pagina: dict = Depends(LISTAGEM_PRODUTO), colunas: str = Depends(CAMPOS_PRODUTO), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM produto")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        return paginar(cursor, response, f"SELECT {colunas} FROM produto", "id_produto", pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/produtos/{id_produto}", response_model=dict)
-async def get_produto(id_produto: int, current_user: dict = Depends(require_auth)):
+def get_produto(id_produto: int, colunas: str = Depends(CAMPOS_PRODUTO), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM produto WHERE id_produto = %s", (id_produto,))
+        cursor.execute(f"SELECT {colunas} FROM produto WHERE id_produto = %s", (id_produto,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Produto não encontrado")
@@ -54,66 +87,38 @@ async def get_produto(id_produto: int, current_user: dict = Depends(require_auth
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.put("/produtos/{id_produto}", response_model=dict)
-async def update_produto(id_produto: int, produto: ProdutoUpdate, current_user: dict = Depends(require_auth)):
+def update_produto(id_produto: int, produto: ProdutoUpdate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        updates = []
-        values = []
-        if produto.nome is not None:
-            updates.append("nome = %s")
-            values.append(produto.nome)
-        if produto.preco is not None:
-            updates.append("preco = %s")
-            values.append(produto.preco)
-        if produto.validade is not None:
-            updates.append("validade = %s")
-            values.append(produto.validade)
-        if produto.quant_min_estoque is not None:
-            updates.append("quant_min_estoque = %s")
-            values.append(produto.quant_min_estoque)
-        
-        # id_usuario_cadastrou removido pois não consta no model ProdutoUpdate e não deve ser alterado
-        
-        if not updates:
-            raise HTTPException(status_code=400, detail="Nenhum campo fornecido para atualização")
-        
-        values.append(id_produto)
-        query = f"UPDATE produto SET {', '.join(updates)} WHERE id_produto = %s"
-        cursor.execute(query, values)
-        
-        if cursor.rowcount == 0:
-             # Verifica se o produto existe
-            cursor.execute("SELECT 1 FROM produto WHERE id_produto = %s", (id_produto,))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=404, detail=f"Produto com ID {id_produto} não encontrado")
-
+        atualizado = atualizar(cursor, "produto", "id_produto", id_produto, campos_informados(produto, ["nome", "preco", "validade", "quant_min_estoque"]))
         conn.commit()
-        return {"message": "Produto atualizado com sucesso"}
+        return {"message": "Produto atualizado com sucesso", **atualizado}
     except HTTPException:
         raise
     except Exception as e:
         conn.rollback()
-        print(f"Erro ao atualizar produto: {e}")
         raise HTTPException(status_code=400, detail=f"Erro ao atualizar produto: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/produtos/{id_produto}", response_model=dict)
-async def delete_produto(id_produto: int, current_user: dict = Depends(require_auth)):
+def delete_produto(id_produto: int, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM produto WHERE id_produto = %s", (id_produto,))
+        removido = remover(cursor, "produto", "id_produto", id_produto)
         conn.commit()
-        return {"message": "Produto deletado com sucesso"}
+        return {"message": "Produto deletado com sucesso", **removido}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Erro ao deletar produto: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
@@ -0,0 +1,159 @@
+from datetime import date, timedelta
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query
+from db import get_db_connection, get_db_cursor, release_db_connection
+from auth import require_admin
+from relatorios import atualizar_relatorios, agendar_todos_os_dias, situacao_relatorios
+
+router = APIRouter()
+
+# agrupar -> unidade do date_trunc
+AGRUPAMENTOS = {"dia": "day", "semana": "week", "mes": "month", "ano": "year"}
+PERIODO_PADRAO_DIAS = 30
+
+def periodo_relatorio(
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    agrupar: str = Query("dia", description="dia, semana, mes ou ano"),
+):
+    """Intervalo (inclusive) e agrupamento; padrão: últimos 30 dias, por dia"""
+    if agrupar not in AGRUPAMENTOS:
+        raise HTTPException(status_code=400, detail=f"Agrupamento inválido. Use: {', '.join(AGRUPAMENTOS)}")
+    data_fim = data_fim or date.today()
+    data_inicio = data_inicio or data_fim - timedelta(days=PERIODO_PADRAO_DIAS - 1)
+    if data_fim < data_inicio:
+        raise HTTPException(status_code=400, detail="data_fim deve ser maior ou igual a data_inicio")
+    return {"inicio": data_inicio, "fim": data_fim, "unidade": AGRUPAMENTOS[agrupar]}
+
+def _consultar(query: str, params: dict):
+    conn = get_db_connection()
+    cursor = get_db_cursor(conn)
+    try:
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+@router.get("/reports/vendas", response_model=List[dict])
+def get_relatorio_vendas(periodo: dict = Depends(periodo_relatorio), current_user: dict = Depends(require_admin)):
+    """Comandas, compras, reservas e pagamentos recebidos por período"""
+    return _consultar("""
+        SELECT periodo,
+               SUM(comandas) AS comandas, SUM(itens) AS itens, SUM(valor_comandas) AS valor_comandas,
+               SUM(compras) AS compras, SUM(valor_compras) AS valor_compras,
+               SUM(reservas) AS reservas, SUM(horas_reservadas) AS horas_reservadas,
+               SUM(valor_pago) AS valor_pago
+        FROM (
+            SELECT date_trunc(%(unidade)s, dia)::date AS periodo, comandas, itens, valor_comandas,
+                   compras, valor_compras, reservas, horas_reservadas, 0.00 AS valor_pago
+            FROM relatorio_vendas_dia
+            WHERE dia BETWEEN %(inicio)s AND %(fim)s
+            UNION ALL
+            SELECT date_trunc(%(unidade)s, dia)::date, 0, 0, 0, 0, 0, 0, 0, valor
+            FROM relatorio_pagamentos_dia
+            WHERE dia BETWEEN %(inicio)s AND %(fim)s
+        ) t
+        GROUP BY periodo
+        ORDER BY periodo
+    """, periodo)
+
+@router.get("/reports/pagamentos", response_model=List[dict])
+def get_relatorio_pagamentos(
+    forma: Optional[str] = None,
+    periodo: dict = Depends(periodo_relatorio),
+    current_user: dict = Depends(require_admin),
+):
+    """Quantidade e valor dos pagamentos por período e forma de pagamento"""
+    return _consultar("""
+        SELECT date_trunc(%(unidade)s, dia)::date AS periodo, NULLIF(forma, '') AS forma,
+               SUM(quantidade) AS quantidade, SUM(valor) AS valor
+        FROM relatorio_pagamentos_dia
+        WHERE dia BETWEEN %(inicio)s AND %(fim)s
+          AND (%(forma)s::text IS NULL OR forma = %(forma)s)
+        GROUP BY 1, 2
+        ORDER BY 1, 4 DESC
+    """, dict(periodo, forma=forma))
+
+@router.get("/reports/campos", response_model=List[dict])
+def get_relatorio_campos(
+    id_campo: Optional[int] = None,
+    periodo: dict = Depends(periodo_relatorio),
+    current_user: dict = Depends(require_admin),
+):
+    """Reservas, horas ocupadas, cancelamentos e valor pago por período e campo"""
+    return _consultar("""
+        SELECT date_trunc(%(unidade)s, r.dia)::date AS periodo, r.id_campo, c.numero AS campo_numero,
+               SUM(r.reservas) AS reservas, SUM(r.canceladas) AS canceladas,
+               SUM(r.horas) AS horas, SUM(r.valor_pago) AS valor_pago
+        FROM relatorio_campos_dia r
+        LEFT JOIN campo c ON c.id_campo = r.id_campo
+        WHERE r.dia BETWEEN %(inicio)s AND %(fim)s
+          AND (%(id_campo)s::int IS NULL OR r.id_campo = %(id_campo)s)
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 3
+    """, dict(periodo, id_campo=id_campo))
+
+@router.get("/reports/produtos", response_model=List[dict])
+def get_relatorio_produtos(
+    id_produto: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Apenas os N produtos de maior valor em cada período"),
+    periodo: dict = Depends(periodo_relatorio),
+    current_user: dict = Depends(require_admin),
+):
+    """Quantidade vendida (comandas), valor e quantidade em compras por período e produto"""
+    return _consultar("""
+        SELECT periodo, id_produto, nome, quantidade, valor, quant_compras
+        FROM (
+            SELECT date_trunc(%(unidade)s, r.dia)::date AS periodo, r.id_produto, p.nome,
+                   SUM(r.quantidade) AS quantidade, SUM(r.valor) AS valor, SUM(r.quant_compras) AS quant_compras,
+                   row_number() OVER (
+                       PARTITION BY date_trunc(%(unidade)s, r.dia) ORDER BY SUM(r.valor) DESC, r.id_produto
+                   ) AS posicao
+            FROM relatorio_produtos_dia r
+            LEFT JOIN produto p ON p.id_produto = r.id_produto
+            WHERE r.dia BETWEEN %(inicio)s AND %(fim)s
+              AND (%(id_produto)s::int IS NULL OR r.id_produto = %(id_produto)s)
+            GROUP BY 1, 2, 3, date_trunc(%(unidade)s, r.dia)
+        ) t
+        WHERE %(limit)s::int IS NULL OR posicao <= %(limit)s
+        ORDER BY periodo, valor DESC, id_produto
+    """, dict(periodo, id_produto=id_produto, limit=limit))
+
+@router.get("/reports/status", response_model=dict)
+def get_relatorio_status(current_user: dict = Depends(require_admin)):
+    """Dias já consolidados e dias aguardando o job de atualização"""
+    conn = get_db_connection()
+    cursor = get_db_cursor(conn)
+    try:
+        return situacao_relatorios(cursor)
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+@router.post("/reports/atualizar", response_model=dict)
+def post_relatorio_atualizar(
+    reconstruir: bool = Query(False, description="Recalcula todo o histórico, não só os dias alterados"),
+    current_user: dict = Depends(require_admin),
+):
+    """Roda o job de atualização agora (opcionalmente reconstruindo tudo)"""
+    conn = get_db_connection()
+    cursor = get_db_cursor(conn)
+    try:
+        if reconstruir:
+            agendar_todos_os_dias(cursor)
+            conn.commit()
+        dias = atualizar_relatorios(cursor)
+        if dias is None:
+            raise HTTPException(status_code=409, detail="Atualização dos relatórios já em andamento")
+        return {"message": "Relatórios atualizados", "dias": len(dias)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail=f"Erro ao atualizar relatórios: {str(e)}")
+    finally:
+        cursor.close()
+        release_db_connection(conn)
@@ -1,49 +1,179 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+import os
+from fastapi import APIRouter, HTTPException, Depends, Response
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import Reserva, ReservaCreate, ReservaUpdate
-from typing import List
+from typing import List, Optional
+from datetime import date, datetime, time, timedelta
 from auth import require_auth
+from listagem import listagem, campos, paginar
+from escrita import inserir, atualizar, remover, campos_informados
 
 router = APIRouter()
 
+LISTAGEM_RESERVA = listagem(
+    filtros={
+        "status": ("status", str),
+        "id_campo": ("id_campo", int),
+        "cpf_cliente": ("cpf_cliente", str),
+        "data": ("data", date),
+        "id_usuario_cadastrou": ("id_usuario_cadastrou", int),
+    },
+    ordenacao={
+        "data": ("data", date),
+        "status": ("status", str),
+        "id_campo": ("id_campo", int),
+    },
+)
+
+# periodo (tsrange gerado) fica de fora: serve à restrição e às consultas de disponibilidade
+COLUNAS_RESERVA = "id_reserva, data, hora_inicio, quant_horas, status, cpf_cliente, id_campo, id_usuario_cadastrou"
+
+CAMPOS_RESERVA = campos([
+    "id_reserva",
+    "data",
+    "hora_inicio",
+    "quant_horas",
+    "status",
+    "cpf_cliente",
+    "id_campo",
+    "id_usuario_cadastrou",
+], padrao=COLUNAS_RESERVA)
+
+# Horário de funcionamento usado no cálculo de disponibilidade
+HORARIO_ABERTURA = time.fromisoformat(os.environ.get('HORARIO_ABERTURA', '08:00'))
+HORARIO_FECHAMENTO = time.fromisoformat(os.environ.get('HORARIO_FECHAMENTO', '23:00'))
+DISPONIBILIDADE_MAX_DIAS = 31
+
 @router.post("/reservas/", response_model=dict)
-async def create_reserva(reserva: ReservaCreate, current_user: dict = Depends(require_auth)):
+def create_reserva(reserva: ReservaCreate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute(
-            "INSERT INTO reserva (data, quant_horas, status, cpf_cliente, id_campo, id_usuario_cadastrou) VALUES (%s, %s, %s, %s, %s, %s)",
-            (reserva.data, reserva.quant_horas, reserva.status, reserva.cpf_cliente, reserva.id_campo, current_user['id_usuario'])
-        )
+        # A restrição reserva_sem_conflito (GiST) valida o horário no próprio INSERT (409)
+        novo = inserir(cursor, "reserva", {
+            "data": reserva.data,
+            "hora_inicio": reserva.hora_inicio,
+            "quant_horas": reserva.quant_horas,
+            "status": reserva.status,
+            "cpf_cliente": reserva.cpf_cliente,
+            "id_campo": reserva.id_campo,
+            "id_usuario_cadastrou": current_user['id_usuario'],
+        }, retorno=COLUNAS_RESERVA)
         conn.commit()
-        return {"message": "Reserva criada com sucesso"}
+        return {"message": "Reserva criada com sucesso", **novo}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar reserva: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/reservas/", response_model=List[dict])
-async def get_reservas(current_user: dict = Depends(require_auth)):
+def get_reservas(response: Response, pagina: dict = Depends(LISTAGEM_RESERVA), colunas: str = Depends(CAMPOS_RESERVA), current_user: dict = Depends(require_auth)):
+    conn = get_db_connection()
+    cursor = get_db_cursor(conn)
+    try:
+        return paginar(cursor, response, f"SELECT {colunas} FROM reserva", "id_reserva", pagina)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+def _horarios_livres(dia: date, ocupados: list):
+    """Intervalos livres de `dia` dentro do horário de funcionamento"""
+    inicio = datetime.combine(dia, HORARIO_ABERTURA)
+    fim = datetime.combine(dia, HORARIO_FECHAMENTO)
+    livres = []
+    cursor_hora = inicio
+    for ocupado_inicio, ocupado_fim in ocupados:
+        if ocupado_fim <= cursor_hora or ocupado_inicio >= fim:
+            continue
+        if ocupado_inicio > cursor_hora:
+            livres.append({"inicio": cursor_hora.time().isoformat("minutes"), "fim": ocupado_inicio.time().isoformat("minutes")})
+        cursor_hora = max(cursor_hora, ocupado_fim)
+    if cursor_hora < fim:
+        livres.append({"inicio": cursor_hora.time().isoformat("minutes"), "fim": fim.time().isoformat("minutes")})
+    return livres
+
+@router.get("/reservas/disponibilidade", response_model=List[dict])
+def get_disponibilidade(
+    data_inicio: date,
+    data_fim: Optional[date] = None,
+    id_campo: Optional[int] = None,
+    current_user: dict = Depends(require_auth),
+):
+    """Horários livres por campo e por dia entre data_inicio e data_fim (inclusive)"""
+    data_fim = data_fim or data_inicio
+    if data_fim < data_inicio:
+        raise HTTPException(status_code=400, detail="data_fim deve ser maior ou igual a data_inicio")
+    if (data_fim - data_inicio).days >= DISPONIBILIDADE_MAX_DIAS:
+        raise HTTPException(status_code=400, detail=f"Intervalo máximo de {DISPONIBILIDADE_MAX_DIAS} dias")
+
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM reserva")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        if id_campo is None:
+            cursor.execute("SELECT id_campo, numero, status FROM campo ORDER BY numero")
+            filtro_campo, params = "", []
+        else:
+            cursor.execute("SELECT id_campo, numero, status FROM campo WHERE id_campo = %s", (id_campo,))
+            # Mesma expressão da restrição, para o filtro também usar o índice GiST
+            filtro_campo = "AND int4range(id_campo, id_campo, '[]') && int4range(%s, %s, '[]')"
+            params = [id_campo, id_campo]
+        lista_campos = cursor.fetchall()
+        if id_campo is not None and not lista_campos:
+            raise HTTPException(status_code=404, detail="Campo não encontrado")
+
+        # Uma única consulta pelo índice GiST da restrição reserva_sem_conflito;
+        # reservas sem hora_inicio não ocupam horário conhecido e ficam de fora
+        cursor.execute(
+            f"""
+            SELECT id_campo, lower(periodo) AS inicio, upper(periodo) AS fim
+            FROM reserva
+            WHERE periodo && tsrange(%s, %s)
+              AND hora_inicio IS NOT NULL
+              AND status IS DISTINCT FROM 'cancelada'
+              {filtro_campo}
+            ORDER BY id_campo, lower(periodo)
+            """,
+            [datetime.combine(data_inicio, time.min), datetime.combine(data_fim + timedelta(days=1), time.min)] + params
+        )
+        ocupados = {}
+        for row in cursor.fetchall():
+            ocupados.setdefault(row['id_campo'], []).append((row['inicio'], row['fim']))
+
+        resultado = []
+        for campo in lista_campos:
+            # Campo fora de uso (manutenção, ocupado...) não tem horário livre
+            disponivel = campo['status'] == 'disponivel'
+            dia = data_inicio
+            while dia <= data_fim:
+                resultado.append({
+                    "id_campo": campo['id_campo'],
+                    "numero": campo['numero'],
+                    "status": campo['status'],
+                    "data": dia,
+                    "livres": _horarios_livres(dia, ocupados.get(campo['id_campo'], [])) if disponivel else [],
+                })
+                dia += timedelta(days=1)
+        return resultado
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/reservas/{id_reserva}", response_model=dict)
-async def get_reserva(id_reserva: int, current_user: dict = Depends(require_auth)):
+def get_reserva(id_reserva: int, colunas: str = Depends(CAMPOS_RESERVA), current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM reserva WHERE id_reserva = %s", (id_reserva,))
+        cursor.execute(f"SELECT {colunas} FROM reserva WHERE id_reserva = %s", (id_reserva,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Reserva não encontrada")
@@ -54,48 +184,18 @@ async def get_reserva(id_reserva: int, current_user: dict = Depends(require_auth
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.put("/reservas/{id_reserva}", response_model=dict)
-async def update_reserva(id_reserva: int, reserva: ReservaUpdate, current_user: dict = Depends(require_auth)):
+def update_reserva(id_reserva: int, reserva: ReservaUpdate, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        updates = []
-        values = []
-        if reserva.data is not None:
-            updates.append("data = %s")
-            values.append(reserva.data)
-        if reserva.quant_horas is not None:
-            updates.append("quant_horas = %s")
-            values.append(reserva.quant_horas)
-        if reserva.status is not None:
-            updates.append("status = %s")
-            values.append(reserva.status)
-        if reserva.cpf_cliente is not None:
-            updates.append("cpf_cliente = %s")
-            values.append(reserva.cpf_cliente)
-        if reserva.id_campo is not None:
-            updates.append("id_campo = %s")
-            values.append(reserva.id_campo)
-        
-        # id_usuario_cadastrou removido pois não consta no model ReservaUpdate
-        
-        if not updates:
-            raise HTTPException(status_code=400, detail="Nenhum campo fornecido para atualização")
-        
-        values.append(id_reserva)
-        query = f"UPDATE reserva SET {', '.join(updates)} WHERE id_reserva = %s"
-        cursor.execute(query, values)
-        
-        if cursor.rowcount == 0:
-            # Verifica se reserva existe
-            cursor.execute("SELECT 1 FROM reserva WHERE id_reserva = %s", (id_reserva,))
-            if not cursor.fetchone():
-               raise HTTPException(status_code=404, detail=f"Reserva com ID {id_reserva} não encontrada")
-        
+        # id_usuario_cadastrou não consta no model ReservaUpdate
+        dados = campos_informados(reserva, ["data", "hora_inicio", "quant_horas", "status", "cpf_cliente", "id_campo"])
+        atualizado = atualizar(cursor, "reserva", "id_reserva", id_reserva, dados, retorno=COLUNAS_RESERVA)
         conn.commit()
-        return {"message": "Reserva atualizada com sucesso"}
+        return {"message": "Reserva atualizada com sucesso", **atualizado}
     except HTTPException:
         raise
     except Exception as e:
@@ -104,26 +204,21 @@ async def update_reserva(id_reserva: int, reserva: ReservaUpdate, current_user:
         raise HTTPException(status_code=400, detail=f"Erro ao atualizar reserva: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/reservas/{id_reserva}", response_model=dict)
-async def delete_reserva(id_reserva: int, current_user: dict = Depends(require_auth)):
+def delete_reserva(id_reserva: int, current_user: dict = Depends(require_auth)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM reserva WHERE id_reserva = %s", (id_reserva,))
+        removido = remover(cursor, "reserva", "id_reserva", id_reserva, retorno=COLUNAS_RESERVA)
         conn.commit()
-        
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Reserva não encontrada")
-        
-        return {"message": "Reserva deletada com sucesso"}
+        return {"message": "Reserva deletada com sucesso", **removido}
     except HTTPException:
         raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Erro ao deletar reserva: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
-        conn.close()
+        release_db_connection(conn)
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.security import HTTPBasicCredentials, HTTPAuthorizationCredentials
+from models import LoginRequest
+from auth import verify_credentials, create_token, revoke_token, bearer
+
+router = APIRouter()
+
+@router.post("/auth/login", response_model=dict)
+def login(dados: LoginRequest):
+    user = verify_credentials(HTTPBasicCredentials(username=dados.email, password=dados.senha))
+    token = create_token(user)
+    token["usuario"] = user
+    return token
+
+@router.post("/auth/logout", response_model=dict)
+def logout(token: HTTPAuthorizationCredentials = Depends(bearer)):
+    if token is None:
+        raise HTTPException(status_code=401, detail="Token ausente", headers={"WWW-Authenticate": "Bearer"})
+    revoke_token(token.credentials)
+    return {"message": "Sessão encerrada com sucesso"}
@@ -1,49 +1,74 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+from fastapi import APIRouter, HTTPException, Depends, Response
+from db import get_db_connection, get_db_cursor, release_db_connection
 from models import Usuario, UsuarioCreate, UsuarioUpdate
 from typing import List
-from auth import require_admin
+from auth import require_admin, revoke_user_tokens
+from listagem import listagem, campos, paginar
+from escrita import inserir, atualizar, remover, campos_informados
+from senhas import hash_password
 
 router = APIRouter()
 
+LISTAGEM_USUARIO = listagem(
+    filtros={
+        "tipo_usuario": ("tipo_usuario", str),
+        "email": ("email", str),
+    },
+    ordenacao={
+        "nome": ("nome", str),
+    },
+)
+
+# Colunas devolvidas pela API: o hash da senha nunca sai do banco
+COLUNAS_USUARIO = "id_usuario, nome, tipo_usuario, email"
+
+CAMPOS_USUARIO = campos([
+    "id_usuario",
+    "nome",
+    "tipo_usuario",
+    "email",
+], padrao=COLUNAS_USUARIO)
+
 @router.post("/usuarios/", response_model=dict)
-async def create_usuario(usuario: UsuarioCreate, current_user: dict = Depends(require_admin)):
+def create_usuario(usuario: UsuarioCreate, current_user: dict = Depends(require_admin)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute(
-            "INSERT INTO usuario (nome, senha, tipo_usuario, email) VALUES (%s, %s, %s, %s)",
-            (usuario.nome, usuario.senha, usuario.tipo_usuario, usuario.email)
-        )
+        novo = inserir(cursor, "usuario", {
+            "nome": usuario.nome,
+            "senha": hash_password(usuario.senha),
+            "tipo_usuario": usuario.tipo_usuario,
+            "email": usuario.email,
+        }, retorno=COLUNAS_USUARIO)
         conn.commit()
-        return {"message": "Usuário criado com sucesso"}
+        return {"message": "Usuário criado com sucesso", **novo}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar usuário: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/usuarios/", response_model=List[dict])
-async def get_usuarios(current_user: dict = Depends(require_admin)):
+def get_usuarios(response: Response, pagina: dict = Depends(LISTAGEM_USUARIO), colunas: str = Depends(CAMPOS_USUARIO), current_user: dict = Depends(require_admin)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM usuario")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
+        return paginar(cursor, response, f"SELECT {colunas} FROM usuario", "id_usuario", pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.get("/usuarios/{id_usuario}", response_model=dict)
-async def get_usuario(id_usuario: int, current_user: dict = Depends(require_admin)):
+def get_usuario(id_usuario: int, colunas: str = Depends(CAMPOS_USUARIO), current_user: dict = Depends(require_admin)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("SELECT * FROM usuario WHERE id_usuario = %s", (id_usuario,))
+        cursor.execute(f"SELECT {colunas} FROM usuario WHERE id_usuario = %s", (id_usuario,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
@@ -54,43 +79,20 @@ async def get_usuario(id_usuario: int, current_user: dict = Depends(require_admi
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.put("/usuarios/{id_usuario}", response_model=dict)
-async def update_usuario(id_usuario: int, usuario: UsuarioUpdate, current_user: dict = Depends(require_admin)):
+def update_usuario(id_usuario: int, usuario: UsuarioUpdate, current_user: dict = Depends(require_admin)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        updates = []
-        values = []
-        if usuario.nome is not None:
-            updates.append("nome = %s")
-            values.append(usuario.nome)
-        if usuario.senha is not None:
-            updates.append("senha = %s")
-            values.append(usuario.senha)
-        if usuario.tipo_usuario is not None:
-            updates.append("tipo_usuario = %s")
-            values.append(usuario.tipo_usuario)
-        if usuario.email is not None:
-            updates.append("email = %s")
-            values.append(usuario.email)
-        
-        if not updates:
-            raise HTTPException(status_code=400, detail="Nenhum campo fornecido para atualização. Verifique os nomes dos campos.")
-        
-        values.append(id_usuario)
-        query = f"UPDATE usuario SET {', '.join(updates)} WHERE id_usuario = %s"
-        cursor.execute(query, values)
-        
-        if cursor.rowcount == 0:
-            # Verifica se usuário existe
-            cursor.execute("SELECT 1 FROM usuario WHERE id_usuario = %s", (id_usuario,))
-            if not cursor.fetchone():
-               raise HTTPException(status_code=404, detail=f"Usuário com ID {id_usuario} não encontrado")
-        
+        dados = campos_informados(usuario, ["nome", "senha", "tipo_usuario", "email"])
+        if "senha" in dados:
+            dados["senha"] = hash_password(dados["senha"])
+        atualizado = atualizar(cursor, "usuario", "id_usuario", id_usuario, dados, retorno=COLUNAS_USUARIO)
+        revoke_user_tokens(cursor, id_usuario)
         conn.commit()
-        return {"message": "Usuário atualizado com sucesso"}
+        return {"message": "Usuário atualizado com sucesso", **atualizado}
     except HTTPException:
         raise
     except Exception as e:
@@ -99,19 +101,22 @@ async def update_usuario(id_usuario: int, usuario: UsuarioUpdate, current_user:
         raise HTTPException(status_code=400, detail=f"Erro ao atualizar dados: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 @router.delete("/usuarios/{id_usuario}", response_model=dict)
-async def delete_usuario(id_usuario: int, current_user: dict = Depends(require_admin)):
+def delete_usuario(id_usuario: int, current_user: dict = Depends(require_admin)):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     try:
-        cursor.execute("DELETE FROM usuario WHERE id_usuario = %s", (id_usuario,))
+        removido = remover(cursor, "usuario", "id_usuario", id_usuario, retorno=COLUNAS_USUARIO)
+        revoke_user_tokens(cursor, id_usuario)
         conn.commit()
-        return {"message": "Usuário deletado com sucesso"}
+        return {"message": "Usuário deletado com sucesso", **removido}
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=f"Erro ao deletar usuário: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
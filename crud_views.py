@@ -1,60 +1,162 @@
-from fastapi import APIRouter, HTTPException, Depends
-from db import get_db_connection, get_db_cursor
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from typing import List
+from datetime import date
+from decimal import Decimal
+from db import get_db_connection, get_db_cursor, release_db_connection
 from auth import require_auth
+from listagem import listagem, campos, paginar
+from cache import em_cache, com_etag
 
 router = APIRouter()
 
-@router.get("/views/produtos-estoque")
-async def get_produtos_estoque(current_user: dict = Depends(require_auth)):
-    conn = get_db_connection()
-    cursor = get_db_cursor(conn)
-    
-    try:
-        cursor.execute(
-            """
-            SELECT id_produto, nome, preco, quant_present
-            FROM vw_produtos_estoque 
-            ORDER BY nome
-            """
-        )
-        
-        items = cursor.fetchall()
-        return [dict(item) for item in items]
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cursor.close()
-        conn.close()
+# Cada rota lê uma view de sql/create_database_complete.sql, com os filtros
+# e a ordenação de listagem.py e paginação por chave (header X-Next-Cursor)
+
+LISTAGEM_ITEM_COMANDA = listagem(
+    filtros={
+        "id_comanda": ("id_comanda", int),
+        "id_produto": ("id_produto", int),
+    },
+)
+
+CAMPOS_ITEM_COMANDA = campos([
+    "id_item_comanda",
+    "id_comanda",
+    "id_produto",
+    "produto_nome",
+    "quantidade",
+    "preco_unitario",
+    "subtotal",
+])
+
+LISTAGEM_ITEM_COMPRA = listagem(
+    filtros={
+        "id_compra": ("id_compra", int),
+        "id_produto": ("id_produto", int),
+    },
+)
+
+CAMPOS_ITEM_COMPRA = campos([
+    "id_item_compra",
+    "id_compra",
+    "id_produto",
+    "produto_nome",
+    "quantidade",
+    "preco_unitario",
+    "subtotal",
+])
+
+LISTAGEM_PRODUTOS_ESTOQUE = listagem(
+    filtros={
+        "nome": ("nome", str),
+        "preco": ("preco", Decimal),
+        "quant_present": ("quant_present", int),
+    },
+    ordenacao={
+        "nome": ("nome", str),
+        "preco": ("preco", Decimal),
+        "quant_present": ("quant_present", int),
+    },
+    ordem_padrao="nome",
+)
 
-@router.get("/views/reservas-detalhe")
-async def get_reservas_detalhe(status: str = None, current_user: dict = Depends(require_auth)):
+CAMPOS_PRODUTOS_ESTOQUE = campos([
+    "id_produto",
+    "nome",
+    "preco",
+    "quant_present",
+], padrao="id_produto, nome, preco, quant_present")
+
+LISTAGEM_RESERVAS_DETALHE = listagem(
+    filtros={
+        "status": ("status", str),
+        "data": ("data", date),
+        "cpf_cliente": ("cpf_cliente", str),
+        "id_campo": ("id_campo", int),
+    },
+    ordenacao={
+        "data": ("data", date),
+    },
+    ordem_padrao="-data",
+)
+
+CAMPOS_RESERVAS_DETALHE = campos([
+    "id_reserva",
+    "data",
+    "quant_horas",
+    "status",
+    "cpf_cliente",
+    "cliente_nome",
+    "cliente_email",
+    "id_campo",
+    "campo_numero",
+    "campo_status",
+    "id_usuario_cadastrou",
+    "usuario_cadastrou",
+], padrao="id_reserva, data, quant_horas, status, cpf_cliente, id_campo")
+
+LISTAGEM_CLIENTES_PUBLICOS = listagem(
+    filtros={
+        "cpf": ("cpf", str),
+        "email": ("email", str),
+        "tipo": ("tipo", str),
+        "nome": ("nome", str),
+    },
+    ordenacao={
+        "nome": ("nome", str),
+    },
+)
+
+CAMPOS_CLIENTES_PUBLICOS = campos([
+    "id_cliente",
+    "nome",
+    "email",
+    "tipo",
+    "cpf",
+])
+
+def _listar_view(response: Response, view: str, pk: str, pagina: dict, colunas: str):
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
-    
     try:
-        if status:
-            cursor.execute(
-                """
-                SELECT id_reserva, data, quant_horas, status, cpf_cliente, id_campo
-                FROM vw_reservas_detalhe 
-                WHERE status = %s
-                ORDER BY data DESC
-                """,
-                (status,)
-            )
-        else:
-            cursor.execute(
-                """
-                SELECT id_reserva, data, quant_horas, status, cpf_cliente, id_campo
-                FROM vw_reservas_detalhe 
-                ORDER BY data DESC
-                """
-            )
-        
-        items = cursor.fetchall()
-        return [dict(item) for item in items]
+        return paginar(cursor, response, f"SELECT {colunas} FROM {view}", pk, pagina)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
+
+@router.get("/views/itens-comanda", response_model=List[dict])
+def get_itens_comanda_completo(response: Response, pagina: dict = Depends(LISTAGEM_ITEM_COMANDA), colunas: str = Depends(CAMPOS_ITEM_COMANDA), current_user: dict = Depends(require_auth)):
+    """Itens com nome do produto, preço do lançamento e subtotal.
+
+    Com ?id_comanda=, é uma única busca em idx_item_comanda_comanda_item.
+    """
+    return _listar_view(response, "vw_item_comanda_completo", "id_item_comanda", pagina, colunas)
+
+@router.get("/views/itens-compra", response_model=List[dict])
+def get_itens_compra_completo(response: Response, pagina: dict = Depends(LISTAGEM_ITEM_COMPRA), colunas: str = Depends(CAMPOS_ITEM_COMPRA), current_user: dict = Depends(require_auth)):
+    """Itens com nome do produto, preço atual e subtotal"""
+    return _listar_view(response, "vw_item_compra_completo", "id_item_compra", pagina, colunas)
+
+@router.get("/views/produtos-estoque", response_model=List[dict])
+@com_etag("produto", "estoque")
+@em_cache("produto", "estoque")
+def get_produtos_estoque(request: Request, response: Response, pagina: dict = Depends(LISTAGEM_PRODUTOS_ESTOQUE), colunas: str = Depends(CAMPOS_PRODUTOS_ESTOQUE), current_user: dict = Depends(require_auth)):
+    """Produtos e quantidade em estoque, por nome (?quant_present__lte= para estoque baixo)"""
+    return _listar_view(response, "vw_produtos_estoque", "id_produto", pagina, colunas)
+
+@router.get("/views/reservas-detalhe", response_model=List[dict])
+@com_etag("mv_reservas_detalhe")
+def get_reservas_detalhe(request: Request, response: Response, pagina: dict = Depends(LISTAGEM_RESERVAS_DETALHE), colunas: str = Depends(CAMPOS_RESERVAS_DETALHE), current_user: dict = Depends(require_auth)):
+    """Reservas com cliente, campo e usuário, da mais recente para a mais antiga.
+
+    Lê mv_reservas_detalhe (visoes.py), atualizada a cada
+    MATVIEW_REFRESH_INTERVALO segundos.
+    """
+    return _listar_view(response, "mv_reservas_detalhe", "id_reserva", pagina, colunas)
+
+@router.get("/views/clientes-publicos", response_model=List[dict])
+def get_clientes_publicos(response: Response, pagina: dict = Depends(LISTAGEM_CLIENTES_PUBLICOS), colunas: str = Depends(CAMPOS_CLIENTES_PUBLICOS), current_user: dict = Depends(require_auth)):
+    """Nome, contato e tipo dos clientes"""
+    return _listar_view(response, "vw_clientes_publicos", "id_cliente", pagina, colunas)
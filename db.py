@@ -1,7 +1,16 @@
 import os
 import sys
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
 import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, connection
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import PoolError
+from psycopg2.sql import Composable
+from metricas import ESPERA_CONEXAO, registrar_tempo_banco, medir
+from consultas import registrar_consulta, consulta_lenta, explicavel, analisavel
 
 os.environ["LC_MESSAGES"] = "C"
 os.environ["LANG"] = "C"
@@ -15,10 +24,49 @@ DB_CONFIG = {
     'client_encoding': 'utf-8'
 }
 
-def get_db_connection():
-    """Retorna uma conexão com o banco de dados"""
+# Pool de conexões (pode ser ajustado por variáveis de ambiente)
+POOL_CONFIG = {
+    'minconn': int(os.environ.get('DB_POOL_MIN', 2)),
+    'maxconn': int(os.environ.get('DB_POOL_MAX', 20)),
+    'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+    'health_check_idle': float(os.environ.get('DB_POOL_HEALTH_CHECK_IDLE', 30)),
+    'checkout_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+}
+
+class PoolConnection(connection):
+    """Conexão do pool que executa os callbacks de ao_confirmar() logo após o COMMIT"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ao_confirmar = []
+
+    def commit(self):
+        super().commit()
+        callbacks, self._ao_confirmar = self._ao_confirmar, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        self._ao_confirmar = []
+        super().rollback()
+
+def ao_confirmar(conn, callback):
+    """Agenda `callback` para depois do commit da transação atual de `conn`.
+
+    Se a transação for desfeita, o callback é descartado. Numa transação
+    compartilhada (shared_transaction) só roda no commit final.
+    """
+    if isinstance(conn, SharedConnection):
+        conn = conn._conn
+    if isinstance(conn, PoolConnection):
+        conn._ao_confirmar.append(callback)
+    else:
+        callback()
+
+def _create_connection():
+    """Abre uma nova conexão física com o banco de dados"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = psycopg2.connect(**DB_CONFIG, connection_factory=PoolConnection)
         return conn
     except UnicodeDecodeError:
         print("Aviso: Falha de decodificação Unicode ao conectar. Tentando conexão simplificada...")
@@ -26,8 +74,8 @@ def get_db_connection():
             config_simple = DB_CONFIG.copy()
             if 'client_encoding' in config_simple:
                 del config_simple['client_encoding']
-                
-            conn = psycopg2.connect(**config_simple)
+
+            conn = psycopg2.connect(**config_simple, connection_factory=PoolConnection)
             conn.set_client_encoding('utf8')
             return conn
         except UnicodeDecodeError:
@@ -47,6 +95,328 @@ def get_db_connection():
             print("Erro ao conectar ao banco de dados (mensagem ilegível)")
         raise
 
+class ConnectionPool:
+    """Pool de conexões compartilhado pelo processo.
+
+    Conexões ociosas são verificadas com SELECT 1 quando ficam paradas por mais
+    de `health_check_idle` segundos e são recicladas ao ultrapassar `max_lifetime`.
+    Quando todas as `maxconn` conexões estão em uso, a requisição espera até
+    `checkout_timeout` segundos antes de falhar com PoolError.
+    """
+
+    def __init__(self, minconn, maxconn, max_lifetime, health_check_idle, checkout_timeout):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_lifetime = max_lifetime
+        self.health_check_idle = health_check_idle
+        self.checkout_timeout = checkout_timeout
+        self._cond = threading.Condition()
+        self._idle = []        # [(conn, ultimo_uso)]
+        self._created_at = {}  # id(conn) -> instante de criação
+        self._in_use = set()   # id(conn) das conexões emprestadas
+        self._opening = 0      # conexões sendo abertas fora do lock
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'unhealthy': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+        }
+        for _ in range(minconn):
+            conn = self._open()
+            self._idle.append((conn, time.monotonic()))
+
+    def _open(self):
+        conn = _create_connection()
+        with self._cond:
+            self._created_at[id(conn)] = time.monotonic()
+            self._stats['created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, conn, now):
+        created = self._created_at.get(id(conn), now)
+        return self.max_lifetime > 0 and now - created > self.max_lifetime
+
+    def _healthy(self, conn, last_used, now):
+        if conn.closed:
+            return False
+        if now - last_used < self.health_check_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _total(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def getconn(self):
+        deadline = None
+        waited_since = None
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolError("Pool de conexões encerrado")
+                now = time.monotonic()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    self._in_use.add(id(conn))
+                elif self._total() < self.maxconn:
+                    conn, last_used = None, None
+                    self._opening += 1
+                else:
+                    # Pool esgotado: espera uma conexão ser devolvida
+                    if deadline is None:
+                        self._stats['waits'] += 1
+                        waited_since = now
+                        deadline = now + self.checkout_timeout
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        print(f"Pool de conexões esgotado ({self.maxconn} conexões em uso)")
+                        raise PoolError("Pool de conexões esgotado")
+                    self._cond.wait(remaining)
+                    continue
+
+            # Conexão e health check acontecem fora do lock
+            if conn is None:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._opening -= 1
+                    self._in_use.add(id(conn))
+            else:
+                now = time.monotonic()
+                problem = None
+                if self._expired(conn, now):
+                    problem = 'recycled'
+                elif not self._healthy(conn, last_used, now):
+                    problem = 'unhealthy'
+                if problem:
+                    with self._cond:
+                        self._stats[problem] += 1
+                        self._in_use.discard(id(conn))
+                        self._discard(conn)
+                        self._cond.notify()
+                    continue
+
+            with self._cond:
+                if waited_since is not None:
+                    self._stats['wait_time_total'] += time.monotonic() - waited_since
+                self._stats['checkouts'] += 1
+            return conn
+
+    def putconn(self, conn):
+        with self._cond:
+            if id(conn) not in self._in_use:
+                # Devolução repetida: a conexão já voltou ao pool
+                return
+        broken = False
+        try:
+            if not conn.closed and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except Exception:
+            broken = True
+        with self._cond:
+            self._in_use.discard(id(conn))
+            now = time.monotonic()
+            if broken or self._closed or conn.closed:
+                self._discard(conn)
+            elif self._expired(conn, now):
+                self._stats['recycled'] += 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, now))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                self._discard(conn)
+            self._idle = []
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data.update({
+                'minconn': self.minconn,
+                'maxconn': self.maxconn,
+                'size': self._total(),
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+            })
+            return data
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_db_pool():
+    """Retorna o pool de conexões do processo, criando-o no primeiro uso"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(**POOL_CONFIG)
+    return _pool
+
+def close_db_pool():
+    """Fecha todas as conexões do pool (usado no encerramento da API)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+class SharedConnection:
+    """Conexão de uma transação compartilhada, entregue aos handlers no lugar da do pool.
+
+    commit/rollback dos handlers não têm efeito: quem abriu a transação
+    (ex.: /api/batch) confirma ou desfaz tudo de uma vez no final.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+_shared_connection = contextvars.ContextVar("shared_connection", default=None)
+
+@contextmanager
+def shared_transaction():
+    """Faz get_db_connection() devolver a mesma conexão até o fim do bloco.
+
+    Todas as escritas feitas dentro do bloco (na mesma thread) entram numa
+    única transação, confirmada na saída ou desfeita se houver exceção.
+    """
+    conn = get_db_pool().getconn()
+    token = _shared_connection.set(SharedConnection(conn))
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _shared_connection.reset(token)
+        release_db_connection(conn)
+
+def get_db_connection():
+    """Retorna uma conexão do pool com o banco de dados"""
+    shared = _shared_connection.get()
+    if shared is not None:
+        return shared
+    with medir(ESPERA_CONEXAO):
+        return get_db_pool().getconn()
+
+def release_db_connection(conn):
+    """Devolve a conexão ao pool (substitui conn.close())"""
+    if isinstance(conn, SharedConnection):
+        return
+    if _pool is not None:
+        _pool.putconn(conn)
+    else:
+        conn.close()
+
+def get_pool_stats():
+    """Retorna métricas do pool de conexões"""
+    if _pool is None:
+        return {'size': 0, 'idle': 0, 'in_use': 0, **POOL_CONFIG}
+    return _pool.stats()
+
+class TimedCursor(RealDictCursor):
+    """RealDictCursor instrumentado.
+
+    Cada comando soma seu tempo ao tempo de banco da requisição (/metrics) e
+    é agregado pelo SQL normalizado (/api/admin/query-stats). Comandos acima
+    de SLOW_QUERY_MS são logados, com o plano de execução se QUERY_EXPLAIN=1.
+    """
+
+    def _texto(self, query):
+        if isinstance(query, bytes):
+            return query.decode("utf-8", "replace")
+        if isinstance(query, Composable):
+            return query.as_string(self.connection)
+        return query
+
+    def _medir(self, executar, query, vars=None):
+        inicio = time.perf_counter()
+        ok = False
+        try:
+            resultado = executar()
+            ok = True
+            return resultado
+        finally:
+            duracao = time.perf_counter() - inicio
+            registrar_tempo_banco(duracao)
+            texto = self._texto(query)
+            plano = None
+            if ok and consulta_lenta(duracao):
+                plano = self._explicar(texto, vars)
+                print(f"Consulta lenta ({duracao * 1000:.1f} ms, {self.rowcount} linhas): {' '.join(texto.split())}")
+                if plano:
+                    print("\n".join(plano))
+            registrar_consulta(texto, duracao, self.rowcount, plano)
+
+    def _explicar(self, texto, vars):
+        """EXPLAIN (ANALYZE, BUFFERS) numa savepoint, sem afetar a transação nem o resultado do cursor.
+
+        SELECTs com efeitos colaterais (FOR UPDATE, pg_notify, nextval...)
+        recebem só o EXPLAIN simples, que não executa a consulta.
+        """
+        if not explicavel(texto):
+            return None
+        explain = "EXPLAIN (ANALYZE, BUFFERS) " if analisavel(texto) else "EXPLAIN "
+        try:
+            with self.connection.cursor() as cur:
+                cur.execute("SAVEPOINT explicar_consulta")
+                try:
+                    cur.execute(explain + texto, vars)
+                    return [row[0] for row in cur.fetchall()]
+                finally:
+                    cur.execute("ROLLBACK TO SAVEPOINT explicar_consulta")
+        except Exception as e:
+            print(f"Falha ao capturar EXPLAIN: {e}")
+            return None
+
+    def execute(self, query, vars=None):
+        return self._medir(lambda: super(TimedCursor, self).execute(query, vars), query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._medir(lambda: super(TimedCursor, self).executemany(query, vars_list), query)
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._medir(lambda: super(TimedCursor, self).copy_expert(sql, file, size), sql)
+
 def get_db_cursor(conn):
     """Retorna um cursor para executar queries"""
-    return conn.cursor(cursor_factory=RealDictCursor)
+    return conn.cursor(cursor_factory=TimedCursor)
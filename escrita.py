@@ -0,0 +1,141 @@
+import re
+from fastapi import HTTPException
+from psycopg2 import errors
+from cache import invalidar_cache
+
+# Mensagem de 404 quando uma chave estrangeira aponta para um registro inexistente
+NAO_ENCONTRADO = {
+    "usuario": "Usuário não encontrado",
+    "cliente": "Cliente não encontrado",
+    "produto": "Produto não encontrado",
+    "estoque": "Estoque não encontrado",
+    "movimenta": "Movimentação não encontrada",
+    "mesa": "Mesa não encontrada",
+    "comanda": "Comanda não encontrada",
+    "item_comanda": "Item da comanda não encontrado",
+    "campo": "Campo não encontrado",
+    "reserva": "Reserva não encontrada",
+    "compra": "Compra não encontrada",
+    "item_compra": "Item da compra não encontrado",
+    "pagamento": "Pagamento não encontrado",
+    "pag_comanda": "Pagamento de comanda não encontrado",
+    "pag_compra": "Pagamento de compra não encontrado",
+    "pag_reserva": "Pagamento de reserva não encontrado",
+}
+
+# Mensagens específicas por nome de restrição (409)
+MENSAGENS_RESTRICAO = {
+    "reserva_sem_conflito": "Campo já reservado em um horário que se sobrepõe a este",
+}
+
+# Chaves estrangeiras do schema: restrição -> (tabela, coluna, tabela referenciada).
+# O erro é identificado pelo nome da restrição e pelo SQLSTATE, não pelo texto
+# da mensagem, que segue o lc_messages do servidor (ex.: pt_BR)
+CHAVES_ESTRANGEIRAS = {
+    "cliente_id_usuario_cadastrou_fkey": ("cliente", "id_usuario_cadastrou", "usuario"),
+    "produto_id_usuario_cadastrou_fkey": ("produto", "id_usuario_cadastrou", "usuario"),
+    "estoque_id_produto_fkey": ("estoque", "id_produto", "produto"),
+    "movimenta_id_estoque_fkey": ("movimenta", "id_estoque", "estoque"),
+    "comanda_cpf_cliente_fkey": ("comanda", "cpf_cliente", "cliente"),
+    "comanda_id_usuario_responsavel_fkey": ("comanda", "id_usuario_responsavel", "usuario"),
+    "comanda_numero_mesa_fkey": ("comanda", "numero_mesa", "mesa"),
+    "item_comanda_id_comanda_fkey": ("item_comanda", "id_comanda", "comanda"),
+    "item_comanda_id_produto_fkey": ("item_comanda", "id_produto", "produto"),
+    "reserva_cpf_cliente_fkey": ("reserva", "cpf_cliente", "cliente"),
+    "reserva_id_campo_fkey": ("reserva", "id_campo", "campo"),
+    "reserva_id_usuario_cadastrou_fkey": ("reserva", "id_usuario_cadastrou", "usuario"),
+    "compra_cpf_cliente_fkey": ("compra", "cpf_cliente", "cliente"),
+    "compra_id_usuario_cadastrou_fkey": ("compra", "id_usuario_cadastrou", "usuario"),
+    "item_compra_id_compra_fkey": ("item_compra", "id_compra", "compra"),
+    "item_compra_id_produto_fkey": ("item_compra", "id_produto", "produto"),
+    "pagamento_id_usuario_cadastrou_fkey": ("pagamento", "id_usuario_cadastrou", "usuario"),
+    "pag_comanda_id_comanda_fkey": ("pag_comanda", "id_comanda", "comanda"),
+    "pag_comanda_id_pagamento_fkey": ("pag_comanda", "id_pagamento", "pagamento"),
+    "pag_compra_id_compra_fkey": ("pag_compra", "id_compra", "compra"),
+    "pag_compra_id_pagamento_fkey": ("pag_compra", "id_pagamento", "pagamento"),
+    "pag_reserva_id_pagamento_fkey": ("pag_reserva", "id_pagamento", "pagamento"),
+    "pag_reserva_id_reserva_fkey": ("pag_reserva", "id_reserva", "reserva"),
+}
+
+# "(colunas)=(valores)" do detalhe não é traduzido, ao contrário do resto da frase
+_CHAVE_VALOR = re.compile(r"\((.+?)\)=\((.*?)\)")
+
+def erro_de_escrita(e: errors.IntegrityError, tabela: str = None) -> HTTPException:
+    """Converte violações de restrição do PostgreSQL em respostas HTTP (404/409/400).
+
+    `tabela` é a tabela alterada pelo comando: numa chave estrangeira, se for a
+    tabela que referencia, o registro apontado não existe (404); se for a
+    referenciada, o registro removido ainda está em uso (409).
+    """
+    restricao = e.diag.constraint_name
+    m = _CHAVE_VALOR.search(e.diag.message_detail or "")
+    if restricao in MENSAGENS_RESTRICAO:
+        return HTTPException(status_code=409, detail=MENSAGENS_RESTRICAO[restricao])
+    if isinstance(e, errors.ForeignKeyViolation) and restricao in CHAVES_ESTRANGEIRAS:
+        origem, coluna, referenciada = CHAVES_ESTRANGEIRAS[restricao]
+        if tabela is None or tabela == origem:
+            mensagem = NAO_ENCONTRADO.get(referenciada, f"Registro não encontrado em {referenciada}")
+            valor = f" = {m.group(2)}" if m else ""
+            return HTTPException(status_code=404, detail=f"{mensagem} ({coluna}{valor})")
+        return HTTPException(status_code=409, detail=f"Registro ainda referenciado em {origem}")
+    if isinstance(e, errors.UniqueViolation):
+        if m:
+            return HTTPException(status_code=409, detail=f"Já existe um registro com {m.group(1)} = {m.group(2)}")
+        return HTTPException(status_code=409, detail="Registro duplicado")
+    if isinstance(e, errors.ExclusionViolation):
+        return HTTPException(status_code=409, detail="Registro em conflito com outro existente")
+    if isinstance(e, errors.NotNullViolation):
+        return HTTPException(status_code=400, detail=f"Campo obrigatório: {e.diag.column_name}")
+    return HTTPException(status_code=400, detail=str(e).strip())
+
+def executar(cursor, query: str, valores, tabela: str = None):
+    """Executa uma escrita com RETURNING, convertendo violações de restrição em HTTPException"""
+    try:
+        cursor.execute(query, valores)
+    except errors.IntegrityError as e:
+        raise erro_de_escrita(e, tabela) from e
+    return cursor.fetchone()
+
+def campos_informados(modelo, colunas) -> dict:
+    """Campos do modelo preenchidos (não None), restritos às colunas da tabela"""
+    return {c: getattr(modelo, c) for c in colunas if getattr(modelo, c, None) is not None}
+
+# inserir/atualizar/remover também invalidam, após o commit, as respostas em
+# cache que dependem da tabela (cache.py)
+
+def inserir(cursor, tabela: str, dados: dict, retorno: str = "*") -> dict:
+    """INSERT ... RETURNING numa única ida ao banco; FKs inexistentes viram 404"""
+    colunas = ", ".join(dados)
+    marcadores = ", ".join(["%s"] * len(dados))
+    row = executar(
+        cursor,
+        f"INSERT INTO {tabela} ({colunas}) VALUES ({marcadores}) RETURNING {retorno}",
+        list(dados.values()),
+        tabela,
+    )
+    invalidar_cache(cursor.connection, tabela)
+    return dict(row)
+
+def atualizar(cursor, tabela: str, pk: str, valor_pk, dados: dict, retorno: str = "*") -> dict:
+    """UPDATE ... RETURNING; 400 sem campos, 404 se o registro não existir"""
+    if not dados:
+        raise HTTPException(status_code=400, detail="Nenhum campo fornecido para atualização")
+    atribuicoes = ", ".join(f"{c} = %s" for c in dados)
+    row = executar(
+        cursor,
+        f"UPDATE {tabela} SET {atribuicoes} WHERE {pk} = %s RETURNING {retorno}",
+        list(dados.values()) + [valor_pk],
+        tabela,
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail=NAO_ENCONTRADO.get(tabela, "Registro não encontrado"))
+    invalidar_cache(cursor.connection, tabela)
+    return dict(row)
+
+def remover(cursor, tabela: str, pk: str, valor_pk, retorno: str = "*") -> dict:
+    """DELETE ... RETURNING; 404 se o registro não existir"""
+    row = executar(cursor, f"DELETE FROM {tabela} WHERE {pk} = %s RETURNING {retorno}", [valor_pk], tabela)
+    if row is None:
+        raise HTTPException(status_code=404, detail=NAO_ENCONTRADO.get(tabela, "Registro não encontrado"))
+    invalidar_cache(cursor.connection, tabela)
+    return dict(row)
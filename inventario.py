@@ -0,0 +1,100 @@
+import os
+from fastapi import HTTPException
+from cache import invalidar_cache
+
+# Por padrão a venda é sempre registrada, mesmo que o saldo fique negativo (o
+# estoque do sistema pode divergir do físico); o produto entra nos alertas.
+# Com ESTOQUE_BLOQUEAR_NEGATIVO=1, a venda sem saldo é recusada com 409.
+ESTOQUE_BLOQUEAR_NEGATIVO = os.environ.get('ESTOQUE_BLOQUEAR_NEGATIVO', '0').lower() in ('1', 'true', 'sim')
+
+# Tipos gravados em movimenta pelas vendas (itens de comanda/compra)
+MOVIMENTO_SAIDA = "saida"
+MOVIMENTO_ENTRADA = "entrada"
+
+# Uma ida ao banco por produto: baixa o estoque (com o bloqueio ligado, só se
+# houver saldo), grava a
+# movimentação e devolve o saldo novo junto com o mínimo do produto.
+_MOVIMENTAR_SQL = """
+    WITH atual AS (
+        SELECT e.id_estoque, e.quant_present, p.nome, p.quant_min_estoque
+        FROM estoque e
+        JOIN produto p ON p.id_produto = e.id_produto
+        WHERE e.id_produto = %(id_produto)s
+    ),
+    atualizado AS (
+        UPDATE estoque
+        SET quant_present = COALESCE(quant_present, 0) - %(quantidade)s
+        WHERE id_produto = %(id_produto)s
+          AND (NOT %(bloquear)s OR %(quantidade)s <= 0 OR COALESCE(quant_present, 0) >= %(quantidade)s)
+        RETURNING id_estoque, quant_present
+    ),
+    movimento AS (
+        INSERT INTO movimenta (id_estoque, tipo, quantidade, data)
+        SELECT id_estoque, %(tipo)s, %(absoluta)s, CURRENT_DATE FROM atualizado
+        RETURNING id_movimenta
+    )
+    SELECT a.id_estoque, a.nome, a.quant_min_estoque,
+           a.quant_present AS quant_anterior,
+           u.quant_present,
+           (SELECT id_movimenta FROM movimento) AS id_movimenta
+    FROM atual a
+    LEFT JOIN atualizado u ON u.id_estoque = a.id_estoque
+"""
+
+def movimentar_estoque(cursor, id_produto, quantidade):
+    """Baixa `quantidade` do estoque do produto (negativa para devolver) e registra em movimenta.
+
+    Roda na transação do chamador, que decide o commit. Produtos sem linha
+    em estoque não são controlados e retornam None. A baixa é um UPDATE
+    relativo, então vendas concorrentes não perdem atualizações; o saldo pode
+    ficar negativo. Com ESTOQUE_BLOQUEAR_NEGATIVO, uma saída maior que o saldo
+    levanta 409 e nada é gravado (o UPDATE condicional é reavaliado após o
+    lock da linha).
+    """
+    if id_produto is None or not quantidade:
+        return None
+    cursor.execute(_MOVIMENTAR_SQL, {
+        "id_produto": id_produto,
+        "quantidade": quantidade,
+        "tipo": MOVIMENTO_SAIDA if quantidade > 0 else MOVIMENTO_ENTRADA,
+        "absoluta": abs(quantidade),
+        "bloquear": ESTOQUE_BLOQUEAR_NEGATIVO,
+    })
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    if row["quant_present"] is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Estoque insuficiente para {row['nome']}: disponível {row['quant_anterior'] or 0}, solicitado {quantidade}"
+        )
+    invalidar_cache(cursor.connection, "estoque")
+    return {
+        "id_produto": id_produto,
+        "nome": row["nome"],
+        "id_estoque": row["id_estoque"],
+        "id_movimenta": row["id_movimenta"],
+        "quant_present": row["quant_present"],
+        "quant_min_estoque": row["quant_min_estoque"],
+        "abaixo_minimo": row["quant_min_estoque"] is not None and row["quant_present"] < row["quant_min_estoque"],
+        "saldo_negativo": row["quant_present"] < 0,
+    }
+
+def movimentar_itens(cursor, alteracoes):
+    """Aplica várias variações [(id_produto, quantidade), ...] de uma vez.
+
+    Variações do mesmo produto são somadas e os produtos são processados em
+    ordem de id, para que transações concorrentes travem as linhas de
+    estoque sempre na mesma ordem. Retorna os alertas: produtos abaixo do
+    estoque mínimo ou com saldo negativo.
+    """
+    total = {}
+    for id_produto, quantidade in alteracoes:
+        if id_produto is not None and quantidade:
+            total[id_produto] = total.get(id_produto, 0) + quantidade
+    alertas = []
+    for id_produto in sorted(total):
+        resultado = movimentar_estoque(cursor, id_produto, total[id_produto])
+        if resultado and (resultado["abaixo_minimo"] or resultado["saldo_negativo"]):
+            alertas.append(resultado)
+    return alertas
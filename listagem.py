@@ -0,0 +1,305 @@
+import io
+import os
+import csv
+import json
+import uuid
+import base64
+import threading
+from datetime import date, datetime, time
+from decimal import Decimal
+from fastapi import HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from psycopg2.extras import RealDictCursor
+from typing import Optional
+from db import get_db_connection, release_db_connection
+
+LIST_MAX_LIMIT = 1000
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+FILTER_OPERATORS = {
+    "eq": "=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+}
+
+# Parâmetros de query tratados pela própria listagem (não são filtros)
+RESERVED_PARAMS = {"limit", "after", "order_by", "fields"}
+
+# Parâmetros que não são filtros da listagem (ex.: ?access_token=, ?debug=1)
+# são ignorados, como sempre foram; com LIST_STRICT_PARAMS=1 retornam 400
+LIST_STRICT_PARAMS = os.environ.get('LIST_STRICT_PARAMS', '0') == '1'
+
+def _converter(tipo, valor: str):
+    if tipo is date:
+        return date.fromisoformat(valor)
+    return tipo(valor)
+
+def _encode_cursor(valores) -> str:
+    raw = json.dumps(valores, default=_json_default, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+def _decode_cursor(cursor: str):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    return json.loads(raw)
+
+def listagem(filtros: dict = None, ordenacao: dict = None, ordem_padrao: str = None):
+    """Cria a dependência de listagem com filtros e ordenação permitidos.
+
+    `filtros` e `ordenacao` mapeiam o nome do parâmetro para (expressão SQL, tipo),
+    por exemplo {"status": ("c.status", str), "data": ("c.data", date)}. Na query:
+
+        ?status=aberta                      igualdade
+        ?status__in=aberta,fechada          lista (= ANY)
+        ?data__gte=2024-01-01&data__lt=...  faixas (gt, gte, lt, lte)
+        ?order_by=-data                     ordenação ("-" para decrescente)
+
+    Tudo vira SQL parametrizado sobre colunas da lista permitida, então as
+    condições usam os índices existentes (ex.: idx_comanda_status).
+    `ordem_padrao` (ex.: "-data") é usada quando não há `order_by`; sem ela,
+    a ordem é a da chave.
+    """
+    filtros = filtros or {}
+    ordenacao = ordenacao or {}
+
+    def dependencia(
+        request: Request,
+        limit: Optional[int] = Query(None, ge=1, le=LIST_MAX_LIMIT, description="Tamanho da página; sem limit, retorna todos os registros"),
+        after: Optional[str] = Query(None, description="Cursor retornado no header X-Next-Cursor da página anterior"),
+        order_by: Optional[str] = Query(None, description="Campo de ordenação; prefixo '-' para decrescente"),
+    ):
+        where = []
+        params = []
+        for nome, valor in request.query_params.multi_items():
+            # Parâmetros com "_" (ex.: ?_=1700000000, cache-buster do jQuery) são ignorados
+            if nome in RESERVED_PARAMS or nome in request.path_params or nome.startswith("_"):
+                continue
+            campo, _, operador = nome.partition("__")
+            operador = operador or "eq"
+            if campo not in filtros and not LIST_STRICT_PARAMS:
+                continue
+            if campo not in filtros or (operador not in FILTER_OPERATORS and operador != "in"):
+                permitidos = ", ".join(sorted(filtros)) or "nenhum"
+                raise HTTPException(status_code=400, detail=f"Filtro inválido: {nome}. Campos permitidos: {permitidos}")
+            expr, tipo = filtros[campo]
+            try:
+                if operador == "in":
+                    where.append(f"{expr} = ANY(%s)")
+                    params.append([_converter(tipo, v) for v in valor.split(",") if v != ""])
+                else:
+                    where.append(f"{expr} {FILTER_OPERATORS[operador]} %s")
+                    params.append(_converter(tipo, valor))
+            except (ValueError, ArithmeticError):
+                raise HTTPException(status_code=400, detail=f"Valor inválido para o filtro {nome}: {valor}")
+
+        order = None
+        order_by = order_by or ordem_padrao
+        if order_by:
+            desc = order_by.startswith("-")
+            campo = order_by.lstrip("-")
+            if campo not in ordenacao:
+                permitidos = ", ".join(sorted(ordenacao)) or "nenhum"
+                raise HTTPException(status_code=400, detail=f"Ordenação inválida: {campo}. Campos permitidos: {permitidos}")
+            expr, tipo = ordenacao[campo]
+            order = (expr, tipo, desc)
+
+        if after is not None:
+            try:
+                if order is None:
+                    after = int(after)
+                else:
+                    valor, ultimo_pk = _decode_cursor(after)
+                    after = (None if valor is None else _converter(order[1], valor), int(ultimo_pk))
+            except (ValueError, TypeError, ArithmeticError):
+                raise HTTPException(status_code=400, detail="Cursor inválido")
+
+        return {"limit": limit, "after": after, "where": where, "params": params, "order": order}
+
+    return dependencia
+
+# Listagem simples, sem filtros: apenas limit/after
+paginacao = listagem()
+
+def campos(colunas, padrao: str = "*"):
+    """Cria a dependência do parâmetro `fields` (projeção de colunas).
+
+    `colunas` lista os campos que podem ser pedidos; em consultas com JOIN
+    use um dict campo -> expressão SQL. Sem `fields`, retorna `padrao`.
+    O resultado entra direto no SELECT, então só nomes da lista são aceitos.
+    """
+    if not isinstance(colunas, dict):
+        colunas = {nome: nome for nome in colunas}
+
+    def dependencia(fields: Optional[str] = Query(None, description="Campos a retornar, separados por vírgula")):
+        if not fields:
+            return padrao
+        nomes = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        invalidos = [n for n in nomes if n not in colunas]
+        if invalidos or not nomes:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Campos inválidos: {', '.join(invalidos) or fields}. Campos permitidos: {', '.join(colunas)}"
+            )
+        return ", ".join(colunas[n] if colunas[n] == n else f"{colunas[n]} AS {n}" for n in nomes)
+
+    return dependencia
+
+def paginar(cursor, response: Response, select_sql: str, pk: str, pagina: dict, where=None, params=()):
+    """Executa `select_sql` paginado por chave (keyset).
+
+    Em vez de OFFSET, filtra a partir da última chave vista e ordena pela chave
+    (ou pelo campo de `order_by` seguido da PK), então cada página é uma busca
+    em índice, independente do tamanho da tabela. Se houver mais registros, o
+    cursor da próxima página vai no header X-Next-Cursor. Sem `limit`, retorna
+    todos os registros (comportamento anterior à paginação).
+    """
+    conditions = list(where or []) + pagina.get("where", [])
+    values = list(params) + pagina.get("params", [])
+    after = pagina["after"]
+    order = pagina.get("order")
+
+    if order is None:
+        if after is not None:
+            conditions.append(f"{pk} > %s")
+            values.append(after)
+        order_sql = pk
+    else:
+        expr, _, desc = order
+        if after is not None:
+            valor, ultimo_pk = after
+            # NULLs ficam no fim em ASC e no início em DESC (padrão do PostgreSQL)
+            if not desc and valor is None:
+                conditions.append(f"({expr} IS NULL AND {pk} > %s)")
+                values.append(ultimo_pk)
+            elif not desc:
+                conditions.append(f"({expr} > %s OR ({expr} = %s AND {pk} > %s) OR {expr} IS NULL)")
+                values.extend([valor, valor, ultimo_pk])
+            elif valor is None:
+                conditions.append(f"(({expr} IS NULL AND {pk} < %s) OR {expr} IS NOT NULL)")
+                values.append(ultimo_pk)
+            else:
+                conditions.append(f"({expr} < %s OR ({expr} = %s AND {pk} < %s))")
+                values.extend([valor, valor, ultimo_pk])
+        direction = "DESC" if desc else "ASC"
+        order_sql = f"{expr} {direction}, {pk} {direction}"
+
+    # PK e campo de ordenação vão em colunas auxiliares para montar o cursor
+    # mesmo quando `fields` não os inclui
+    select_sql = select_sql.strip()
+    extras = f"{pk} AS _cursor_pk"
+    if order is not None:
+        extras += f", {order[0]} AS _cursor_valor"
+    query = f"SELECT {extras}, {select_sql[len('SELECT'):].strip()}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {order_sql}"
+    if pagina["limit"] is not None:
+        query += " LIMIT %s"
+        values.append(pagina["limit"] + 1)
+
+    cursor.execute(query, values)
+    rows = cursor.fetchall()
+    if pagina["limit"] is not None and len(rows) > pagina["limit"]:
+        rows = rows[:pagina["limit"]]
+        last = rows[-1]
+        if order is None:
+            response.headers["X-Next-Cursor"] = str(last["_cursor_pk"])
+        else:
+            response.headers["X-Next-Cursor"] = _encode_cursor([last["_cursor_valor"], last["_cursor_pk"]])
+    result = []
+    for row in rows:
+        item = dict(row)
+        item.pop("_cursor_pk", None)
+        item.pop("_cursor_valor", None)
+        result.append(item)
+    return result
+
+def _json_default(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        # Mesmo formato das rotas JSON (texto), sem perder precisão
+        return str(value)
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+def _ndjson_chunk(rows):
+    return "".join(json.dumps(row, default=_json_default, ensure_ascii=False) + "\n" for row in rows)
+
+def _csv_chunk(rows, header=None):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    writer.writerows([list(row.values()) for row in rows])
+    return buffer.getvalue()
+
+def exportar(select_sql: str, pk: str, formato: str, nome_arquivo: str, params=()):
+    """Exporta o resultado de `select_sql` em streaming (NDJSON ou CSV).
+
+    Usa um cursor nomeado (server-side): o PostgreSQL entrega os registros em
+    blocos de EXPORT_CHUNK_SIZE e cada bloco é enviado ao cliente assim que
+    lido, então a memória usada não depende do tamanho da tabela.
+    """
+    if formato not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido. Use: {', '.join(EXPORT_FORMATS)}")
+
+    conn = get_db_connection()
+    cursor = conn.cursor(name=f"export_{uuid.uuid4().hex}", cursor_factory=RealDictCursor)
+    trava = threading.Lock()
+    liberada = False
+
+    def fechar():
+        """Fecha o cursor e devolve a conexão ao pool uma única vez.
+
+        Chamada no fim do gerador e pela tarefa de fundo da resposta: se o
+        cliente desconecta no meio do download, o gerador pode nunca ser
+        retomado nem finalizado, e a conexão ficaria presa fora do pool.
+        """
+        nonlocal liberada
+        with trava:
+            if liberada:
+                return
+            liberada = True
+        try:
+            cursor.close()
+        except Exception as e:
+            print(f"Aviso: falha ao fechar cursor de exportação: {e}")
+        finally:
+            release_db_connection(conn)
+
+    try:
+        cursor.execute(f"{select_sql} ORDER BY {pk}", params)
+        first = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+    except Exception as e:
+        fechar()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def gerar():
+        try:
+            rows = first
+            if formato == "csv":
+                header = [col.name for col in cursor.description]
+                yield _csv_chunk(rows, header)
+            else:
+                yield _ndjson_chunk(rows)
+            while rows:
+                rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+                if rows:
+                    yield _csv_chunk(rows) if formato == "csv" else _ndjson_chunk(rows)
+        finally:
+            fechar()
+
+    extensao = "csv" if formato == "csv" else "ndjson"
+    return StreamingResponse(
+        gerar(),
+        media_type=EXPORT_FORMATS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}.{extensao}"'},
+        background=BackgroundTask(fechar),
+    )
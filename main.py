@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import anyio.to_thread
 from crud_usuario import router as usuario_router
 from crud_cliente import router as cliente_router
 from crud_produto import router as produto_router
@@ -18,9 +19,35 @@ from crud_compra import router as compra_router
 from crud_item_comanda import router as item_comanda_router
 from crud_item_compra import router as item_compra_router
 from crud_views import router as views_router
+from crud_sessao import router as sessao_router
+from crud_importacao import router as importacao_router
+from crud_batch import router as batch_router
+from crud_metricas import router as metricas_router
+from crud_admin import router as admin_router
+from crud_eventos import router as eventos_router
+from crud_relatorios import router as relatorios_router
+from metricas import MetricasMiddleware
+from db import get_db_pool, close_db_pool, POOL_CONFIG
+from notificacoes import iniciar_notificacoes, parar_notificacoes
+from relatorios import iniciar_atualizacao_relatorios, parar_atualizacao_relatorios
+from visoes import iniciar_atualizacao_visoes, parar_atualizacao_visoes
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Os handlers são síncronos (psycopg2) e rodam no threadpool do AnyIO;
+    # garante threads suficientes para ocupar todas as conexões do pool
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(limiter.total_tokens, POOL_CONFIG['maxconn'])
+    try:
+        await anyio.to_thread.run_sync(get_db_pool)
+    except Exception as e:
+        print(f"Aviso: pool de conexões não inicializado ({e}). Nova tentativa na primeira requisição.")
+    # Listener LISTEN/NOTIFY que alimenta /api/eventos e /api/ws/eventos
+    iniciar_notificacoes()
+    # Job que consolida os dias alterados nas tabelas de relatório
+    iniciar_atualizacao_relatorios()
+    # Job que faz o REFRESH CONCURRENTLY das views materializadas alteradas
+    iniciar_atualizacao_visoes()
     print("\n" + "="*60)
     print("🚀 Pinheiro API iniciada com sucesso!")
     print("="*60)
@@ -28,6 +55,10 @@ async def lifespan(app: FastAPI):
     print("📚 Documentação: http://127.0.0.1:5000/docs")
     print("="*60 + "\n")
     yield
+    parar_atualizacao_visoes()
+    parar_atualizacao_relatorios()
+    parar_notificacoes()
+    close_db_pool()
     print("\n" + "="*60)
     print("🛑 Pinheiro API encerrada")
     print("="*60 + "\n")
@@ -44,8 +75,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
+app.add_middleware(MetricasMiddleware)
 
+app.include_router(sessao_router, prefix="/api", tags=["Sessão"])
 app.include_router(usuario_router, prefix="/api", tags=["Usuario"])
 app.include_router(cliente_router, prefix="/api", tags=["Cliente"])
 app.include_router(produto_router, prefix="/api", tags=["Produto"])
@@ -63,6 +97,12 @@ app.include_router(compra_router, prefix="/api", tags=["Compra"])
 app.include_router(item_comanda_router, prefix="/api", tags=["Item Comanda"])
 app.include_router(item_compra_router, prefix="/api", tags=["Item Compra"])
 app.include_router(views_router, prefix="/api", tags=["Views (Visões Complexas)"])
+app.include_router(importacao_router, prefix="/api", tags=["Importação"])
+app.include_router(batch_router, prefix="/api", tags=["Batch"])
+app.include_router(metricas_router, tags=["Métricas"])
+app.include_router(admin_router, prefix="/api", tags=["Admin"])
+app.include_router(eventos_router, prefix="/api", tags=["Tempo Real"])
+app.include_router(relatorios_router, prefix="/api", tags=["Relatórios"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,181 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Limites (em segundos) dos histogramas de latência
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Rótulo usado para requisições que não casaram com nenhuma rota (evita um
+# rótulo por URL inválida)
+ROTA_DESCONHECIDA = "<nao_encontrada>"
+
+class Contador:
+    """Contador monotônico por combinação de rótulos"""
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores_rotulos, valor=1):
+        with self._lock:
+            self._valores[valores_rotulos] = self._valores.get(valores_rotulos, 0) + valor
+
+    def valores(self):
+        with self._lock:
+            return dict(self._valores)
+
+    def exportar(self):
+        with self._lock:
+            valores = sorted(self._valores.items())
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        for chave, valor in valores:
+            linhas.append(f"{self.nome}{_rotulos(self.rotulos, chave)} {_numero(valor)}")
+        return linhas
+
+class Histograma:
+    """Histograma cumulativo por combinação de rótulos (formato Prometheus)"""
+
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS_LATENCIA):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self.buckets = tuple(buckets)
+        self._series = {}  # rótulos -> [contagens por bucket, soma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores_rotulos):
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                serie = self._series[valores_rotulos] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self):
+        with self._lock:
+            series = sorted((chave, (list(c), s, t)) for chave, (c, s, t) in self._series.items())
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        for chave, (contagens, soma, total) in series:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, contagens):
+                acumulado += contagem
+                rotulos = _rotulos(self.rotulos + ("le",), chave + (_numero(limite),))
+                linhas.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+            rotulos = _rotulos(self.rotulos + ("le",), chave + ("+Inf",))
+            linhas.append(f"{self.nome}_bucket{rotulos} {total}")
+            linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, chave)} {_numero(soma)}")
+            linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, chave)} {total}")
+        return linhas
+
+def _numero(valor):
+    if isinstance(valor, float):
+        return repr(valor)
+    return str(valor)
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _rotulos(nomes, valores):
+    if not nomes:
+        return ""
+    return "{" + ",".join(f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)) + "}"
+
+REQUISICOES = Contador(
+    "http_requests_total", "Requisições HTTP atendidas", ("method", "route", "status"))
+DURACAO = Histograma(
+    "http_request_duration_seconds", "Duração das requisições HTTP", ("method", "route"))
+TEMPO_BANCO = Histograma(
+    "http_request_db_seconds", "Tempo gasto em comandos SQL por requisição", ("method", "route"))
+ESPERA_CONEXAO = Histograma(
+    "db_connection_acquire_seconds", "Tempo para obter uma conexão do pool")
+TEMPO_AUTENTICACAO = Histograma(
+    "auth_verify_seconds", "Tempo de verify_credentials (HTTP Basic, com ou sem cache)")
+CACHE_RESPOSTAS = Contador(
+    "response_cache_requests_total", "Consultas ao cache de respostas (hit/miss)", ("endpoint", "result"))
+
+METRICAS = [REQUISICOES, DURACAO, TEMPO_BANCO, ESPERA_CONEXAO, TEMPO_AUTENTICACAO, CACHE_RESPOSTAS]
+
+# Tempos acumulados da requisição atual. O dicionário é compartilhado com as
+# threads do threadpool (que recebem uma cópia do contexto), então os
+# handlers síncronos somam nele diretamente.
+_requisicao_atual = contextvars.ContextVar("metricas_requisicao", default=None)
+
+def registrar_tempo_banco(segundos: float):
+    """Soma `segundos` ao tempo de banco da requisição em andamento (se houver)"""
+    atual = _requisicao_atual.get()
+    if atual is not None:
+        atual["banco"] += segundos
+
+@contextmanager
+def medir(histograma: Histograma, *valores_rotulos):
+    """Observa no histograma o tempo gasto dentro do bloco"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        histograma.observar(time.perf_counter() - inicio, *valores_rotulos)
+
+def _caminho_rota(scope):
+    """Caminho declarado da rota que atendeu a requisição, com o prefixo do include_router"""
+    rota = scope.get("route")
+    if rota is None:
+        return ROTA_DESCONHECIDA
+    # No FastAPI fixado no README, a rota de um router incluído guarda só o
+    # caminho relativo; o caminho completo fica no contexto efetivo da rota.
+    # Nas versões anteriores, rota.path_format já inclui o prefixo.
+    efetiva = scope.get("fastapi", {}).get("effective_route_context")
+    caminho = getattr(efetiva, "path_format", None) or getattr(rota, "path_format", None)
+    # Rota sem caminho declarado: a URL recebida é o melhor rótulo disponível
+    return caminho or scope["path"]
+
+class MetricasMiddleware:
+    """Middleware ASGI que registra contagem, status e latência por rota.
+
+    O rótulo `route` é o caminho declarado da rota (ex.: /api/comandas/{id_comanda}),
+    não a URL recebida, para manter o número de séries limitado.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estado = {"status": 500}
+        tempos = {"banco": 0.0}
+        token = _requisicao_atual.set(tempos)
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                estado["status"] = mensagem["status"]
+            await send(mensagem)
+
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            _requisicao_atual.reset(token)
+            caminho = _caminho_rota(scope)
+            metodo = scope["method"]
+            REQUISICOES.inc(metodo, caminho, str(estado["status"]))
+            DURACAO.observar(duracao, metodo, caminho)
+            TEMPO_BANCO.observar(tempos["banco"], metodo, caminho)
+
+def exportar_metricas(extras=()):
+    """Texto no formato de exposição do Prometheus (version 0.0.4)"""
+    linhas = []
+    for metrica in METRICAS:
+        linhas.extend(metrica.exportar())
+    linhas.extend(extras)
+    return "\n".join(linhas) + "\n"
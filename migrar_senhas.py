@@ -0,0 +1,33 @@
+"""Migra as senhas em texto puro da tabela usuario para hashes scrypt.
+
+Uso: python migrar_senhas.py
+Pode ser executado mais de uma vez: linhas já migradas são ignoradas.
+"""
+from db import get_db_connection, get_db_cursor, release_db_connection
+from senhas import hash_password, is_hashed
+
+def migrar_senhas():
+    conn = get_db_connection()
+    cursor = get_db_cursor(conn)
+    try:
+        cursor.execute("SELECT id_usuario, senha FROM usuario WHERE senha NOT LIKE 'scrypt$%%' FOR UPDATE")
+        rows = cursor.fetchall()
+        for row in rows:
+            if is_hashed(row['senha']):
+                continue
+            cursor.execute(
+                "UPDATE usuario SET senha = %s WHERE id_usuario = %s",
+                (hash_password(row['senha']), row['id_usuario'])
+            )
+        conn.commit()
+        return len(rows)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+if __name__ == "__main__":
+    total = migrar_senhas()
+    print(f"{total} senha(s) migrada(s) para scrypt")
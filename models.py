@@ -1,6 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional
-from datetime import date
+from typing import Any, Optional
+from datetime import date, datetime, time
 from decimal import Decimal
 
 class Usuario(BaseModel):
@@ -90,6 +90,9 @@ class Comanda(BaseModel):
     numero_mesa: Optional[int] = None
     cpf_cliente: Optional[str] = None
     id_usuario_responsavel: Optional[int] = None
+    subtotal: Optional[Decimal] = None
+    quant_itens: Optional[int] = None
+    atualizado_em: Optional[datetime] = None
 
 class ComandaCreate(BaseModel):
     data: Optional[date] = None
@@ -138,6 +141,7 @@ class PagamentoUpdate(BaseModel):
 class Reserva(BaseModel):
     id_reserva: int
     data: Optional[date] = None
+    hora_inicio: Optional[time] = None
     quant_horas: Optional[int] = None
     status: Optional[str] = None
     cpf_cliente: Optional[str] = None
@@ -146,6 +150,7 @@ class Reserva(BaseModel):
 
 class ReservaCreate(BaseModel):
     data: Optional[date] = None
+    hora_inicio: Optional[time] = None
     quant_horas: Optional[int] = None
     status: Optional[str] = None
     cpf_cliente: Optional[str] = None
@@ -153,6 +158,7 @@ class ReservaCreate(BaseModel):
 
 class ReservaUpdate(BaseModel):
     data: Optional[date] = None
+    hora_inicio: Optional[time] = None
     quant_horas: Optional[int] = None
     status: Optional[str] = None
     cpf_cliente: Optional[str] = None
@@ -280,3 +286,13 @@ class MovimentaUpdate(BaseModel):
     tipo: Optional[str] = None
     quantidade: Optional[int] = None
     data: Optional[date] = None
+
+class LoginRequest(BaseModel):
+    email: str
+    senha: str
+
+class OperacaoBatch(BaseModel):
+    id: Optional[str] = None
+    method: str
+    path: str
+    body: Optional[Any] = None
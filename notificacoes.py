@@ -0,0 +1,177 @@
+import os
+import json
+import select
+import asyncio
+import itertools
+import threading
+import psycopg2
+from db import DB_CONFIG
+from cache import invalidar_tabelas, limpar_cache
+from auth import apply_revocation_notice, load_revocations
+
+# Canal usado pelos triggers notificar_alteracao() (sql/create_database_complete.sql)
+CANAL = "alteracoes"
+TABELAS_NOTIFICADAS = ("mesa", "campo", "comanda", "reserva")
+
+# Eventos pendentes por assinante; um cliente lento que estoura a fila perde
+# os eventos acumulados e recebe "sincronizar" (deve recarregar via GET)
+REALTIME_FILA_MAX = int(os.environ.get('REALTIME_FILA_MAX', 256))
+REALTIME_MAX_ASSINANTES = int(os.environ.get('REALTIME_MAX_ASSINANTES', 500))
+
+# Espera máxima entre tentativas de reconexão do listener (segundos)
+_ESPERA_MAXIMA = 30
+
+class Assinatura:
+    """Fila de eventos de um cliente (SSE ou WebSocket), consumida no event loop dele"""
+
+    def __init__(self, loop, tabelas):
+        self.loop = loop
+        self.tabelas = tabelas
+        self.fila = asyncio.Queue(maxsize=REALTIME_FILA_MAX)
+        self.descartes = 0
+
+    def interessa(self, evento):
+        return self.tabelas is None or evento["tipo"] == "sincronizar" or evento["tipo"] in self.tabelas
+
+    def entregar(self, evento):
+        """Roda no event loop do cliente (via call_soon_threadsafe)"""
+        if self.fila.full():
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.descartes += 1
+            evento = dict(evento, tipo="sincronizar", tabela=None, operacao=None, id_registro=None, dados=None)
+        self.fila.put_nowait(evento)
+
+class CentralEventos:
+    """Uma única conexão em LISTEN que distribui as notificações aos assinantes.
+
+    O listener roda numa thread própria (select() na conexão psycopg2); cada
+    notificação vira um evento entregue nas filas asyncio dos assinantes.
+    Quando a conexão cai, reconecta com espera exponencial e envia
+    "sincronizar" a todos, já que notificações podem ter sido perdidas.
+    """
+
+    def __init__(self):
+        self._assinaturas = set()
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._sequencia = itertools.count(1)
+        self._conectado = False
+        self._eventos = 0
+
+    def iniciar(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="listener-notificacoes", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def assinar(self, tabelas=None):
+        """Registra um assinante no event loop atual; None = todas as tabelas"""
+        with self._lock:
+            if len(self._assinaturas) >= REALTIME_MAX_ASSINANTES:
+                return None
+            assinatura = Assinatura(asyncio.get_running_loop(), tabelas)
+            self._assinaturas.add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+    def estatisticas(self):
+        with self._lock:
+            assinantes = len(self._assinaturas)
+            descartes = sum(a.descartes for a in self._assinaturas)
+        return {
+            "conectado": self._conectado,
+            "assinantes": assinantes,
+            "eventos": self._eventos,
+            "descartes": descartes,
+        }
+
+    def _publicar(self, tipo, tabela=None, operacao=None, id_registro=None, dados=None):
+        evento = {
+            "id": next(self._sequencia),
+            "tipo": tipo,
+            "tabela": tabela,
+            "operacao": operacao,
+            "id_registro": id_registro,
+            "dados": dados,
+        }
+        with self._lock:
+            assinaturas = [a for a in self._assinaturas if a.interessa(evento)]
+        for assinatura in assinaturas:
+            try:
+                assinatura.loop.call_soon_threadsafe(assinatura.entregar, evento)
+            except RuntimeError:
+                # Event loop do cliente já encerrado
+                self.cancelar(assinatura)
+
+    def _notificacao(self, payload):
+        try:
+            mensagem = json.loads(payload)
+            tabela = mensagem["tabela"]
+        except (ValueError, KeyError, TypeError):
+            print(f"Aviso: notificação inválida no canal {CANAL}: {payload[:200]}")
+            return
+        self._eventos += 1
+        # Revogações de tokens (auth.py) não vão para o feed nem para o cache
+        if tabela == "token_revogado":
+            apply_revocation_notice(mensagem["dados"])
+            return
+        # Escritas feitas por outros processos também invalidam o cache local
+        invalidar_tabelas(tabela)
+        # Outras notificações do canal (produto, estoque, refresh de view
+        # materializada) só invalidam o cache
+        if tabela in TABELAS_NOTIFICADAS:
+            self._publicar(tabela, tabela, mensagem.get("operacao"), mensagem.get("id"), mensagem.get("dados"))
+
+    def _executar(self):
+        espera = 1
+        while not self._parar.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**DB_CONFIG)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CANAL}")
+                self._conectado = True
+                espera = 1
+                # Invalidações de outros processos podem ter se perdido enquanto
+                # o listener estava desconectado
+                limpar_cache()
+                load_revocations()
+                self._publicar("sincronizar")
+                while not self._parar.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._notificacao(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"Aviso: listener de notificações desconectado ({e}). Nova tentativa em {espera} s.")
+                self._parar.wait(espera)
+                espera = min(espera * 2, _ESPERA_MAXIMA)
+            finally:
+                self._conectado = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+central = CentralEventos()
+
+def iniciar_notificacoes():
+    central.iniciar()
+
+def parar_notificacoes():
+    central.parar()
@@ -0,0 +1,144 @@
+import os
+from tarefas import TarefaPeriodica
+
+# Intervalo (segundos) do job que recalcula os dias pendentes dos relatórios
+RELATORIOS_INTERVALO = float(os.environ.get('RELATORIOS_INTERVALO', 60))
+
+# Chave do advisory lock: com vários processos, só um recalcula por vez
+_LOCK_RELATORIOS = 7210023
+
+TABELAS_RELATORIO = ("relatorio_vendas_dia", "relatorio_pagamentos_dia", "relatorio_campos_dia", "relatorio_produtos_dia")
+
+# Cada comando recalcula os dias em %(dias)s (date[]); comandas e reservas
+# canceladas ficam fora dos totais de venda e ocupação
+RECALCULO = [
+    ("relatorio_vendas_dia", """
+        INSERT INTO relatorio_vendas_dia
+            (dia, comandas, itens, valor_comandas, compras, valor_compras, reservas, horas_reservadas)
+        SELECT dia, SUM(comandas), SUM(itens), SUM(valor_comandas),
+               SUM(compras), SUM(valor_compras), SUM(reservas), SUM(horas_reservadas)
+        FROM (
+            SELECT data AS dia, COUNT(*) AS comandas, SUM(quant_itens) AS itens, SUM(subtotal) AS valor_comandas,
+                   0 AS compras, 0 AS valor_compras, 0 AS reservas, 0 AS horas_reservadas
+            FROM comanda
+            WHERE data = ANY(%(dias)s) AND status IS DISTINCT FROM 'cancelada'
+            GROUP BY data
+            UNION ALL
+            SELECT data, 0, 0, 0, COUNT(*), COALESCE(SUM(valor_total), 0), 0, 0
+            FROM compra
+            WHERE data = ANY(%(dias)s)
+            GROUP BY data
+            UNION ALL
+            SELECT data, 0, 0, 0, 0, 0, COUNT(*), COALESCE(SUM(quant_horas), 0)
+            FROM reserva
+            WHERE data = ANY(%(dias)s) AND status IS DISTINCT FROM 'cancelada'
+            GROUP BY data
+        ) t
+        GROUP BY dia
+    """),
+    # Candidatos: pagamentos com algum vínculo nos dias; a data de cada um é
+    # o vínculo mais antigo, que pode cair fora dos dias recalculados
+    ("relatorio_pagamentos_dia", """
+        INSERT INTO relatorio_pagamentos_dia (dia, forma, quantidade, valor)
+        SELECT d.dia, COALESCE(p.forma, ''), COUNT(*), COALESCE(SUM(p.valor), 0)
+        FROM (
+            SELECT id_pagamento, MIN(dia) AS dia
+            FROM vw_pagamento_vinculos
+            WHERE id_pagamento IN (SELECT id_pagamento FROM vw_pagamento_vinculos WHERE dia = ANY(%(dias)s))
+            GROUP BY id_pagamento
+        ) d
+        JOIN pagamento p ON p.id_pagamento = d.id_pagamento
+        WHERE d.dia = ANY(%(dias)s)
+        GROUP BY d.dia, COALESCE(p.forma, '')
+    """),
+    # valor_pago: parte do pagamento atribuída à reserva (porcentagem, padrão 100%)
+    ("relatorio_campos_dia", """
+        INSERT INTO relatorio_campos_dia (dia, id_campo, reservas, canceladas, horas, valor_pago)
+        SELECT r.data, r.id_campo,
+               COUNT(*) FILTER (WHERE r.status IS DISTINCT FROM 'cancelada'),
+               COUNT(*) FILTER (WHERE r.status = 'cancelada'),
+               COALESCE(SUM(r.quant_horas) FILTER (WHERE r.status IS DISTINCT FROM 'cancelada'), 0),
+               COALESCE(SUM(pg.valor_pago), 0)
+        FROM reserva r
+        LEFT JOIN (
+            SELECT pr.id_reserva, SUM(p.valor * COALESCE(pr.porcentagem, 100) / 100) AS valor_pago
+            FROM pag_reserva pr
+            JOIN pagamento p ON p.id_pagamento = pr.id_pagamento
+            JOIN reserva rr ON rr.id_reserva = pr.id_reserva
+            WHERE rr.data = ANY(%(dias)s)
+            GROUP BY pr.id_reserva
+        ) pg ON pg.id_reserva = r.id_reserva
+        WHERE r.data = ANY(%(dias)s) AND r.id_campo IS NOT NULL
+        GROUP BY r.data, r.id_campo
+    """),
+    ("relatorio_produtos_dia", """
+        INSERT INTO relatorio_produtos_dia (dia, id_produto, quantidade, valor, quant_compras)
+        SELECT dia, id_produto, SUM(quantidade), SUM(valor), SUM(quant_compras)
+        FROM (
+            SELECT c.data AS dia, ic.id_produto, ic.quantidade, ic.quantidade * ic.preco_unitario AS valor,
+                   0 AS quant_compras
+            FROM item_comanda ic
+            JOIN comanda c ON c.id_comanda = ic.id_comanda
+            WHERE c.data = ANY(%(dias)s) AND c.status IS DISTINCT FROM 'cancelada'
+            UNION ALL
+            SELECT co.data, it.id_produto, 0, 0, it.quantidade
+            FROM item_compra it
+            JOIN compra co ON co.id_compra = it.id_compra
+            WHERE co.data = ANY(%(dias)s)
+        ) t
+        WHERE id_produto IS NOT NULL
+        GROUP BY dia, id_produto
+    """),
+]
+
+def atualizar_relatorios(cursor):
+    """Recalcula os dias pendentes e confirma; retorna os dias recalculados.
+
+    Retorna None se outro processo já estiver recalculando.
+    """
+    conn = cursor.connection
+    cursor.execute("SELECT pg_try_advisory_xact_lock(%s) AS obtido", (_LOCK_RELATORIOS,))
+    if not cursor.fetchone()["obtido"]:
+        conn.rollback()
+        return None
+    cursor.execute("DELETE FROM relatorio_dia_pendente RETURNING dia")
+    dias = sorted({row["dia"] for row in cursor.fetchall()})
+    if dias:
+        for tabela, comando in RECALCULO:
+            cursor.execute(f"DELETE FROM {tabela} WHERE dia = ANY(%(dias)s)", {"dias": dias})
+            cursor.execute(comando, {"dias": dias})
+    conn.commit()
+    return dias
+
+def agendar_todos_os_dias(cursor):
+    """Marca como pendentes todos os dias com movimento (reconstrução completa)"""
+    cursor.execute("""
+        INSERT INTO relatorio_dia_pendente (dia)
+        SELECT dia FROM (
+            SELECT data AS dia FROM comanda
+            UNION SELECT data FROM compra
+            UNION SELECT data FROM reserva
+            UNION SELECT dia FROM relatorio_vendas_dia
+        ) d
+        WHERE dia IS NOT NULL
+    """)
+    return cursor.rowcount
+
+def situacao_relatorios(cursor):
+    cursor.execute("SELECT COUNT(DISTINCT dia) AS dias, MIN(dia) AS primeiro, MAX(dia) AS ultimo FROM relatorio_dia_pendente")
+    pendentes = dict(cursor.fetchone())
+    cursor.execute("SELECT MIN(dia) AS primeiro, MAX(dia) AS ultimo, COUNT(*) AS dias FROM relatorio_vendas_dia")
+    return {"pendentes": pendentes, "consolidados": dict(cursor.fetchone())}
+
+def _atualizar_em_segundo_plano(cursor):
+    dias = atualizar_relatorios(cursor)
+    if dias:
+        print(f"Relatórios: {len(dias)} dia(s) recalculado(s)")
+
+atualizador = TarefaPeriodica("atualizador-relatorios", RELATORIOS_INTERVALO, _atualizar_em_segundo_plano)
+
+def iniciar_atualizacao_relatorios():
+    atualizador.iniciar()
+
+def parar_atualizacao_relatorios():
+    atualizador.parar()
@@ -0,0 +1,99 @@
+import os
+import hmac
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Parâmetros do scrypt (dezenas de ms por verificação em hardware comum)
+SCRYPT_N = int(os.environ.get('SCRYPT_N', 2 ** 14))
+SCRYPT_R = int(os.environ.get('SCRYPT_R', 8))
+SCRYPT_P = int(os.environ.get('SCRYPT_P', 1))
+SCRYPT_DKLEN = 64
+SALT_BYTES = 16
+PREFIX = "scrypt"
+
+# Cache LRU de verificações bem-sucedidas: só a primeira requisição paga o scrypt
+VERIFY_CACHE_MAX = int(os.environ.get('VERIFY_CACHE_MAX', 4096))
+
+_verified = OrderedDict()
+_verified_lock = threading.Lock()
+_verified_key = os.urandom(32)
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+def _scrypt(senha: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        senha.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+        maxmem=128 * n * r * p + 1024 * 1024, dklen=SCRYPT_DKLEN
+    )
+
+def hash_password(senha: str) -> str:
+    """Gera o hash armazenado em usuario.senha: scrypt$n$r$p$salt$hash"""
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(senha, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+def is_hashed(stored: str) -> bool:
+    return bool(stored) and stored.startswith(PREFIX + "$")
+
+def needs_rehash(stored: str) -> bool:
+    """Senhas em texto puro ou com parâmetros antigos devem ser regravadas"""
+    if not is_hashed(stored):
+        return True
+    try:
+        _, n, r, p, _, _ = stored.split("$")
+        return (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    except ValueError:
+        return True
+
+def _check(senha: str, stored: str) -> bool:
+    if not is_hashed(stored):
+        # Linhas ainda não migradas guardam a senha em texto puro
+        return hmac.compare_digest(senha.encode("utf-8"), (stored or "").encode("utf-8"))
+    try:
+        _, n, r, p, salt, expected = stored.split("$")
+        digest = _scrypt(senha, base64.b64decode(salt), int(n), int(r), int(p))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(digest, base64.b64decode(expected))
+
+def verify_password(email: str, senha: str, stored: str) -> bool:
+    """Confere a senha contra o valor armazenado, usando o cache LRU de verificações.
+
+    A chave do cache inclui o hash armazenado, então uma troca de senha
+    invalida automaticamente as entradas antigas.
+    """
+    key = hmac.new(
+        _verified_key, "\x00".join((email, senha, stored or "")).encode("utf-8"), hashlib.sha256
+    ).digest()
+    with _verified_lock:
+        if key in _verified:
+            _verified.move_to_end(key)
+            return True
+    if not _check(senha, stored):
+        return False
+    with _verified_lock:
+        _verified[key] = True
+        _verified.move_to_end(key)
+        while len(_verified) > VERIFY_CACHE_MAX:
+            _verified.popitem(last=False)
+    return True
+
+_dummy_hash = None
+
+def verify_dummy_password(senha: str) -> bool:
+    """Verifica `senha` contra um hash descartável, com os parâmetros atuais.
+
+    Usada quando o e-mail não existe, para o login levar o mesmo tempo.
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password(os.urandom(16).hex())
+    _check(senha, _dummy_hash)
+    return False
+
+def clear_verify_cache():
+    with _verified_lock:
+        _verified.clear()
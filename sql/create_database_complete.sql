@@ -1,7 +1,7 @@
 CREATE TABLE IF NOT EXISTS usuario (
     id_usuario SERIAL PRIMARY KEY,
     nome VARCHAR(100) NOT NULL,
-    senha VARCHAR(255) NOT NULL,
+    senha VARCHAR(255) NOT NULL, -- hash scrypt (senhas.py); texto puro legado é migrado no login ou por migrar_senhas.py
     tipo_usuario VARCHAR(50),
     email VARCHAR(100) UNIQUE
 );
@@ -122,6 +122,381 @@ CREATE TABLE IF NOT EXISTS pag_reserva (
 );
 
 
+-- Disponibilidade de campos: cada reserva ocupa o intervalo [data + hora_inicio, + quant_horas).
+-- A restrição de exclusão (GiST) impede duas reservas ativas no mesmo campo com horários sobrepostos.
+-- Reservas sem hora_inicio (clientes que não informam o horário, e as anteriores a esta coluna)
+-- ficam fora da restrição e da disponibilidade: não se sabe que horário ocupam.
+-- id_campo entra como int4range para usar o GiST nativo de ranges, sem depender da extensão btree_gist.
+
+ALTER TABLE reserva ADD COLUMN IF NOT EXISTS hora_inicio TIME;
+ALTER TABLE reserva ADD COLUMN IF NOT EXISTS periodo TSRANGE GENERATED ALWAYS AS (
+    CASE
+        WHEN data IS NULL THEN NULL
+        WHEN hora_inicio IS NULL THEN tsrange(data::timestamp, (data + 1)::timestamp)
+        ELSE tsrange(data + hora_inicio, data + hora_inicio + COALESCE(quant_horas, 1) * INTERVAL '1 hour')
+    END
+) STORED;
+
+DO $$
+DECLARE
+    conflitos TEXT;
+    total INTEGER;
+BEGIN
+    -- A primeira versão da restrição valia também para reservas sem horário
+    -- (dia inteiro) e bloqueava uma segunda reserva do campo no mesmo dia
+    IF EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'reserva_sem_conflito' AND pg_get_constraintdef(oid) NOT LIKE '%hora_inicio%'
+    ) THEN
+        ALTER TABLE reserva DROP CONSTRAINT reserva_sem_conflito;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'reserva_sem_conflito') THEN
+        -- Reservas com horário gravadas sem a restrição podem se sobrepor. Nada
+        -- é alterado automaticamente: o script para e lista os pares, para que
+        -- alguém cancele ou corrija o horário de uma delas e rode de novo
+        SELECT string_agg(format('%s x %s', o.id_reserva, r.id_reserva), ', ' ORDER BY o.id_reserva, r.id_reserva),
+               COUNT(*)
+        INTO conflitos, total
+        FROM reserva r
+        JOIN reserva o
+          ON o.id_reserva < r.id_reserva
+         AND int4range(o.id_campo, o.id_campo, '[]') && int4range(r.id_campo, r.id_campo, '[]')
+         AND o.periodo && r.periodo
+        WHERE r.hora_inicio IS NOT NULL AND r.status IS DISTINCT FROM 'cancelada'
+          AND o.hora_inicio IS NOT NULL AND o.status IS DISTINCT FROM 'cancelada';
+        IF total > 0 THEN
+            RAISE EXCEPTION 'reserva_sem_conflito: % par(es) de reservas com horários sobrepostos (id_reserva): %', total, conflitos
+                USING HINT = 'Cancele ou corrija hora_inicio de uma reserva de cada par e execute o script novamente.';
+        END IF;
+
+        ALTER TABLE reserva ADD CONSTRAINT reserva_sem_conflito
+            EXCLUDE USING gist (int4range(id_campo, id_campo, '[]') WITH &&, periodo WITH &&)
+            WHERE (hora_inicio IS NOT NULL AND status IS DISTINCT FROM 'cancelada');
+    END IF;
+END $$;
+
+-- Totais da comanda mantidos de forma incremental por crud_item_comanda,
+-- na mesma transação do item: ler o total de uma comanda não soma os itens.
+-- preco_unitario guarda o preço no momento do lançamento, para que o total
+-- não mude quando o preço do produto for alterado depois.
+
+ALTER TABLE item_comanda ADD COLUMN IF NOT EXISTS preco_unitario NUMERIC(10, 2);
+ALTER TABLE comanda ADD COLUMN IF NOT EXISTS subtotal NUMERIC(12, 2) NOT NULL DEFAULT 0;
+ALTER TABLE comanda ADD COLUMN IF NOT EXISTS quant_itens INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE comanda ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMP;
+
+UPDATE item_comanda ic
+SET preco_unitario = p.preco
+FROM produto p
+WHERE p.id_produto = ic.id_produto AND ic.preco_unitario IS NULL;
+
+UPDATE comanda c
+SET subtotal = t.subtotal, quant_itens = t.quant_itens, atualizado_em = COALESCE(c.atualizado_em, NOW())
+FROM (
+    SELECT co.id_comanda,
+           COALESCE(SUM(ic.quantidade * ic.preco_unitario), 0) AS subtotal,
+           COALESCE(SUM(ic.quantidade), 0) AS quant_itens
+    FROM comanda co
+    LEFT JOIN item_comanda ic ON ic.id_comanda = co.id_comanda
+    GROUP BY co.id_comanda
+) t
+WHERE t.id_comanda = c.id_comanda
+  AND (c.subtotal, c.quant_itens) IS DISTINCT FROM (t.subtotal, t.quant_itens);
+
+-- Importação CSV (crud_importacao.py): testa se um texto converte para o tipo
+-- informado, para validar a staging inteira com um único UPDATE.
+-- (No PostgreSQL 16+ equivale a pg_input_is_valid.)
+
+CREATE OR REPLACE FUNCTION importacao_valor_valido(valor TEXT, tipo TEXT) RETURNS BOOLEAN AS $$
+BEGIN
+    IF valor IS NULL OR btrim(valor) = '' THEN
+        RETURN TRUE;
+    END IF;
+    EXECUTE format('SELECT %L::%s', btrim(valor), tipo);
+    RETURN TRUE;
+EXCEPTION WHEN OTHERS THEN
+    RETURN FALSE;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Feed de alterações em tempo real (notificacoes.py): cada escrita em mesa,
+-- campo, comanda e reserva publica um NOTIFY no canal "alteracoes" (entregue
+-- só no COMMIT). O argumento do trigger é a coluna da chave primária.
+
+CREATE OR REPLACE FUNCTION notificar_alteracao() RETURNS TRIGGER AS $$
+DECLARE
+    linha JSONB;
+    payload TEXT;
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW IS NOT DISTINCT FROM OLD THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        linha := to_jsonb(OLD);
+    ELSE
+        linha := to_jsonb(NEW);
+    END IF;
+    payload := json_build_object(
+        'tabela', TG_TABLE_NAME, 'operacao', lower(TG_OP), 'id', linha -> TG_ARGV[0], 'dados', linha
+    )::text;
+    -- O payload do NOTIFY é limitado a 8000 bytes: linhas grandes vão só com a chave
+    IF octet_length(payload) > 7900 THEN
+        payload := json_build_object('tabela', TG_TABLE_NAME, 'operacao', lower(TG_OP), 'id', linha -> TG_ARGV[0])::text;
+    END IF;
+    PERFORM pg_notify('alteracoes', payload);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_mesa_notificar ON mesa;
+CREATE TRIGGER trg_mesa_notificar AFTER INSERT OR UPDATE OR DELETE ON mesa
+    FOR EACH ROW EXECUTE FUNCTION notificar_alteracao('id_mesa');
+
+DROP TRIGGER IF EXISTS trg_campo_notificar ON campo;
+CREATE TRIGGER trg_campo_notificar AFTER INSERT OR UPDATE OR DELETE ON campo
+    FOR EACH ROW EXECUTE FUNCTION notificar_alteracao('id_campo');
+
+DROP TRIGGER IF EXISTS trg_comanda_notificar ON comanda;
+CREATE TRIGGER trg_comanda_notificar AFTER INSERT OR UPDATE OR DELETE ON comanda
+    FOR EACH ROW EXECUTE FUNCTION notificar_alteracao('id_comanda');
+
+DROP TRIGGER IF EXISTS trg_reserva_notificar ON reserva;
+CREATE TRIGGER trg_reserva_notificar AFTER INSERT OR UPDATE OR DELETE ON reserva
+    FOR EACH ROW EXECUTE FUNCTION notificar_alteracao('id_reserva');
+
+-- produto e estoque não vão para o feed, mas respondem GETs em cache
+-- (cache.py): um NOTIFY por comando, só com a tabela, faz os demais processos
+-- invalidarem as respostas. Payloads iguais na mesma transação são entregues
+-- uma única vez.
+CREATE OR REPLACE FUNCTION notificar_tabela() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('alteracoes', json_build_object('tabela', TG_TABLE_NAME, 'operacao', lower(TG_OP))::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_produto_notificar ON produto;
+CREATE TRIGGER trg_produto_notificar AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON produto
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_tabela();
+
+DROP TRIGGER IF EXISTS trg_estoque_notificar ON estoque;
+CREATE TRIGGER trg_estoque_notificar AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON estoque
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_tabela();
+
+-- Revogação de tokens de sessão (auth.py), compartilhada entre processos.
+-- jti preenchido: um token (logout). jti nulo: todos os tokens do usuário
+-- emitidos até revogado_em (usuário alterado ou removido; sem FK, a linha
+-- sobrevive à remoção). Cada processo guarda uma cópia em memória, atualizada
+-- pelo NOTIFY abaixo; linhas com expira_em no passado já não têm efeito.
+CREATE TABLE IF NOT EXISTS token_revogado (
+    id_token_revogado SERIAL PRIMARY KEY,
+    jti VARCHAR(64),
+    id_usuario INTEGER NOT NULL,
+    revogado_em TIMESTAMPTZ NOT NULL,
+    expira_em TIMESTAMPTZ NOT NULL
+);
+
+DROP TRIGGER IF EXISTS trg_token_revogado_notificar ON token_revogado;
+CREATE TRIGGER trg_token_revogado_notificar AFTER INSERT ON token_revogado
+    FOR EACH ROW EXECUTE FUNCTION notificar_alteracao('id_token_revogado');
+
+-- Relatórios gerenciais (relatorios.py): agregados diários mantidos por um job
+-- que recalcula só os dias alterados. Triggers de instrução (com transition
+-- tables) registram em relatorio_dia_pendente cada dia tocado por uma escrita;
+-- o job consome a fila e reescreve esses dias nas tabelas relatorio_*_dia.
+-- A fila não tem chave única de propósito: uma escrita concorrente com o job
+-- sempre deixa sua própria linha, que só some no job seguinte.
+
+CREATE TABLE IF NOT EXISTS relatorio_dia_pendente (
+    dia DATE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS relatorio_vendas_dia (
+    dia DATE PRIMARY KEY,
+    comandas INTEGER NOT NULL DEFAULT 0,
+    itens INTEGER NOT NULL DEFAULT 0,
+    valor_comandas NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    compras INTEGER NOT NULL DEFAULT 0,
+    valor_compras NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    reservas INTEGER NOT NULL DEFAULT 0,
+    horas_reservadas INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS relatorio_pagamentos_dia (
+    dia DATE NOT NULL,
+    forma VARCHAR(50) NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    valor NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, forma)
+);
+
+CREATE TABLE IF NOT EXISTS relatorio_campos_dia (
+    dia DATE NOT NULL,
+    id_campo INTEGER NOT NULL,
+    reservas INTEGER NOT NULL DEFAULT 0,
+    canceladas INTEGER NOT NULL DEFAULT 0,
+    horas INTEGER NOT NULL DEFAULT 0,
+    valor_pago NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, id_campo)
+);
+
+CREATE TABLE IF NOT EXISTS relatorio_produtos_dia (
+    dia DATE NOT NULL,
+    id_produto INTEGER NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    valor NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    quant_compras INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, id_produto)
+);
+
+CREATE INDEX IF NOT EXISTS idx_relatorio_produtos_produto ON relatorio_produtos_dia(id_produto, dia);
+CREATE INDEX IF NOT EXISTS idx_relatorio_campos_campo ON relatorio_campos_dia(id_campo, dia);
+
+-- Pagamento não tem data própria: vale a data da comanda, compra ou reserva
+-- a que está vinculado (a mais antiga, se houver mais de um vínculo)
+CREATE OR REPLACE VIEW vw_pagamento_vinculos AS
+SELECT pc.id_pagamento, c.data AS dia
+FROM pag_comanda pc JOIN comanda c ON c.id_comanda = pc.id_comanda
+UNION ALL
+SELECT pg.id_pagamento, co.data
+FROM pag_compra pg JOIN compra co ON co.id_compra = pg.id_compra
+UNION ALL
+SELECT pr.id_pagamento, r.data
+FROM pag_reserva pr JOIN reserva r ON r.id_reserva = pr.id_reserva;
+
+CREATE OR REPLACE FUNCTION relatorio_marcar_dias() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF TG_TABLE_NAME IN ('comanda', 'compra', 'reserva') THEN
+            INSERT INTO relatorio_dia_pendente (dia) SELECT DISTINCT data FROM novos WHERE data IS NOT NULL;
+        ELSIF TG_TABLE_NAME = 'item_comanda' THEN
+            INSERT INTO relatorio_dia_pendente (dia)
+            SELECT DISTINCT c.data FROM novos n JOIN comanda c ON c.id_comanda = n.id_comanda WHERE c.data IS NOT NULL;
+        ELSIF TG_TABLE_NAME = 'item_compra' THEN
+            INSERT INTO relatorio_dia_pendente (dia)
+            SELECT DISTINCT co.data FROM novos n JOIN compra co ON co.id_compra = n.id_compra WHERE co.data IS NOT NULL;
+        ELSE
+            -- pagamento e pag_*: todos os dias a que o pagamento está vinculado
+            INSERT INTO relatorio_dia_pendente (dia)
+            SELECT DISTINCT v.dia FROM vw_pagamento_vinculos v
+            WHERE v.id_pagamento IN (SELECT id_pagamento FROM novos) AND v.dia IS NOT NULL;
+        END IF;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF TG_TABLE_NAME IN ('comanda', 'compra', 'reserva') THEN
+            INSERT INTO relatorio_dia_pendente (dia) SELECT DISTINCT data FROM antigos WHERE data IS NOT NULL;
+        ELSIF TG_TABLE_NAME = 'item_comanda' THEN
+            INSERT INTO relatorio_dia_pendente (dia)
+            SELECT DISTINCT c.data FROM antigos a JOIN comanda c ON c.id_comanda = a.id_comanda WHERE c.data IS NOT NULL;
+        ELSIF TG_TABLE_NAME = 'item_compra' THEN
+            INSERT INTO relatorio_dia_pendente (dia)
+            SELECT DISTINCT co.data FROM antigos a JOIN compra co ON co.id_compra = a.id_compra WHERE co.data IS NOT NULL;
+        ELSIF TG_TABLE_NAME = 'pag_comanda' THEN
+            INSERT INTO relatorio_dia_pendente (dia)
+            SELECT DISTINCT c.data FROM antigos a JOIN comanda c ON c.id_comanda = a.id_comanda WHERE c.data IS NOT NULL;
+        ELSIF TG_TABLE_NAME = 'pag_compra' THEN
+            INSERT INTO relatorio_dia_pendente (dia)
+            SELECT DISTINCT co.data FROM antigos a JOIN compra co ON co.id_compra = a.id_compra WHERE co.data IS NOT NULL;
+        ELSIF TG_TABLE_NAME = 'pag_reserva' THEN
+            INSERT INTO relatorio_dia_pendente (dia)
+            SELECT DISTINCT r.data FROM antigos a JOIN reserva r ON r.id_reserva = a.id_reserva WHERE r.data IS NOT NULL;
+        END IF;
+        -- Sem o vínculo removido, o dia do pagamento (o vínculo mais antigo)
+        -- pode passar para outro dia: marca os vínculos que restaram
+        IF TG_TABLE_NAME IN ('pag_comanda', 'pag_compra', 'pag_reserva') THEN
+            INSERT INTO relatorio_dia_pendente (dia)
+            SELECT DISTINCT v.dia FROM vw_pagamento_vinculos v
+            WHERE v.id_pagamento IN (SELECT id_pagamento FROM antigos) AND v.dia IS NOT NULL;
+        END IF;
+    END IF;
+    -- Mudar a data de uma comanda, compra ou reserva também move o dia dos
+    -- pagamentos vinculados a ela para qualquer um dos seus outros vínculos.
+    -- Só as linhas com data alterada entram (a comanda é atualizada a cada item).
+    IF TG_OP = 'UPDATE' AND TG_TABLE_NAME IN ('comanda', 'compra', 'reserva') THEN
+        EXECUTE format(
+            'INSERT INTO relatorio_dia_pendente (dia)
+             SELECT DISTINCT v.dia FROM vw_pagamento_vinculos v
+             WHERE v.dia IS NOT NULL AND v.id_pagamento IN (
+                 SELECT p.id_pagamento
+                 FROM novos n
+                 JOIN antigos a ON a.%1$I = n.%1$I
+                 JOIN %2$I p ON p.%1$I = n.%1$I
+                 WHERE n.data IS DISTINCT FROM a.data
+             )',
+            'id_' || TG_TABLE_NAME, 'pag_' || TG_TABLE_NAME
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    tabela TEXT;
+BEGIN
+    FOREACH tabela IN ARRAY ARRAY['comanda', 'item_comanda', 'compra', 'item_compra', 'reserva',
+                                  'pag_comanda', 'pag_compra', 'pag_reserva'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_relatorio_ins ON %I', tabela, tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_relatorio_upd ON %I', tabela, tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_relatorio_del ON %I', tabela, tabela);
+        EXECUTE format('CREATE TRIGGER trg_%s_relatorio_ins AFTER INSERT ON %I REFERENCING NEW TABLE AS novos '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION relatorio_marcar_dias()', tabela, tabela);
+        EXECUTE format('CREATE TRIGGER trg_%s_relatorio_upd AFTER UPDATE ON %I REFERENCING OLD TABLE AS antigos NEW TABLE AS novos '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION relatorio_marcar_dias()', tabela, tabela);
+        EXECUTE format('CREATE TRIGGER trg_%s_relatorio_del AFTER DELETE ON %I REFERENCING OLD TABLE AS antigos '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION relatorio_marcar_dias()', tabela, tabela);
+    END LOOP;
+    -- Pagamento novo ainda não tem vínculo; a exclusão remove os pag_* em cascata
+    DROP TRIGGER IF EXISTS trg_pagamento_relatorio_upd ON pagamento;
+    CREATE TRIGGER trg_pagamento_relatorio_upd AFTER UPDATE ON pagamento REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+        FOR EACH STATEMENT EXECUTE FUNCTION relatorio_marcar_dias();
+END $$;
+
+-- Banco já existente sem relatórios: agenda todos os dias com movimento
+INSERT INTO relatorio_dia_pendente (dia)
+SELECT dia FROM (
+    SELECT data AS dia FROM comanda
+    UNION SELECT data FROM compra
+    UNION SELECT data FROM reserva
+) d
+WHERE dia IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM relatorio_vendas_dia)
+  AND NOT EXISTS (SELECT 1 FROM relatorio_dia_pendente);
+
+-- Views servidas em /api/views/* (crud_views.py), paginadas por chave
+
+-- Preço do lançamento (preco_unitario); itens antigos, sem preço gravado,
+-- usam o preço atual do produto
+CREATE OR REPLACE VIEW vw_item_comanda_completo AS
+SELECT
+    ic.id_item_comanda,
+    ic.id_comanda,
+    ic.id_produto,
+    p.nome AS produto_nome,
+    ic.quantidade,
+    COALESCE(ic.preco_unitario, p.preco) AS preco_unitario,
+    ic.quantidade * COALESCE(ic.preco_unitario, p.preco) AS subtotal
+FROM item_comanda ic
+LEFT JOIN produto p ON ic.id_produto = p.id_produto;
+
+CREATE OR REPLACE VIEW vw_item_compra_completo AS
+SELECT
+    ic.id_item_compra,
+    ic.id_compra,
+    ic.id_produto,
+    p.nome AS produto_nome,
+    ic.quantidade,
+    p.preco AS preco_unitario,
+    ic.quantidade * p.preco AS subtotal
+FROM item_compra ic
+LEFT JOIN produto p ON ic.id_produto = p.id_produto;
+
+-- Dados de contato, sem o usuário que cadastrou
+CREATE OR REPLACE VIEW vw_clientes_publicos AS
+SELECT id_cliente, nome, email, tipo, cpf
+FROM cliente;
+
 CREATE OR REPLACE VIEW vw_produtos_estoque AS
 SELECT p.id_produto, p.nome, p.preco, COALESCE(e.quant_present, 0) AS quant_present
 FROM produto p
@@ -146,30 +521,93 @@ LEFT JOIN cliente c ON r.cpf_cliente = c.cpf
 LEFT JOIN campo f ON r.id_campo = f.id_campo
 LEFT JOIN usuario u ON r.id_usuario_cadastrou = u.id_usuario;
 
+-- Views materializadas (visoes.py): /api/views/reservas-detalhe lê
+-- mv_reservas_detalhe em vez de refazer os joins a cada chamada. Triggers de
+-- instrução registram em visao_pendente que a view ficou desatualizada; um
+-- job roda REFRESH MATERIALIZED VIEW CONCURRENTLY (exige índice único) e
+-- grava o resultado em visao_atualizacao. Como em relatorio_dia_pendente, a
+-- fila não tem chave única: uma escrita concorrente com o refresh deixa sua
+-- própria linha para o refresh seguinte.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_reservas_detalhe AS
+SELECT * FROM vw_reservas_detalhe;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_reservas_detalhe_id ON mv_reservas_detalhe(id_reserva);
+CREATE INDEX IF NOT EXISTS idx_mv_reservas_detalhe_data ON mv_reservas_detalhe(data DESC, id_reserva DESC);
+CREATE INDEX IF NOT EXISTS idx_mv_reservas_detalhe_status ON mv_reservas_detalhe(status, data DESC);
+CREATE INDEX IF NOT EXISTS idx_mv_reservas_detalhe_cliente ON mv_reservas_detalhe(cpf_cliente, data DESC, id_reserva DESC);
+CREATE INDEX IF NOT EXISTS idx_mv_reservas_detalhe_campo ON mv_reservas_detalhe(id_campo, data DESC, id_reserva DESC);
+
+CREATE TABLE IF NOT EXISTS visao_pendente (
+    nome VARCHAR(63) NOT NULL,
+    alterada_em TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE TABLE IF NOT EXISTS visao_atualizacao (
+    nome VARCHAR(63) PRIMARY KEY,
+    atualizada_em TIMESTAMPTZ NOT NULL,
+    duracao_ms NUMERIC(12, 3) NOT NULL,
+    linhas BIGINT
+);
+
+CREATE OR REPLACE FUNCTION visao_marcar_pendente() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO visao_pendente (nome) VALUES (TG_ARGV[0]);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Só as colunas que aparecem na view disparam o refresh (ex.: a troca do
+-- hash de senha no login não marca mv_reservas_detalhe)
+DROP TRIGGER IF EXISTS trg_reserva_mv_reservas_detalhe ON reserva;
+CREATE TRIGGER trg_reserva_mv_reservas_detalhe AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON reserva
+    FOR EACH STATEMENT EXECUTE FUNCTION visao_marcar_pendente('mv_reservas_detalhe');
+
+DROP TRIGGER IF EXISTS trg_cliente_mv_reservas_detalhe ON cliente;
+CREATE TRIGGER trg_cliente_mv_reservas_detalhe AFTER UPDATE OF cpf, nome, email OR DELETE ON cliente
+    FOR EACH STATEMENT EXECUTE FUNCTION visao_marcar_pendente('mv_reservas_detalhe');
+
+DROP TRIGGER IF EXISTS trg_campo_mv_reservas_detalhe ON campo;
+CREATE TRIGGER trg_campo_mv_reservas_detalhe AFTER UPDATE OF id_campo, numero, status OR DELETE ON campo
+    FOR EACH STATEMENT EXECUTE FUNCTION visao_marcar_pendente('mv_reservas_detalhe');
+
+DROP TRIGGER IF EXISTS trg_usuario_mv_reservas_detalhe ON usuario;
+CREATE TRIGGER trg_usuario_mv_reservas_detalhe AFTER UPDATE OF id_usuario, nome OR DELETE ON usuario
+    FOR EACH STATEMENT EXECUTE FUNCTION visao_marcar_pendente('mv_reservas_detalhe');
+
 CREATE INDEX IF NOT EXISTS idx_cliente_cpf ON cliente(cpf);
 CREATE INDEX IF NOT EXISTS idx_cliente_email ON cliente(email);
+CREATE INDEX IF NOT EXISTS idx_cliente_nome ON cliente(nome, id_cliente);
 
 CREATE INDEX IF NOT EXISTS idx_produto_nome ON produto(nome);
 
 CREATE INDEX IF NOT EXISTS idx_comanda_cpf_cliente ON comanda(cpf_cliente);
 CREATE INDEX IF NOT EXISTS idx_comanda_numero_mesa ON comanda(numero_mesa);
 CREATE INDEX IF NOT EXISTS idx_comanda_status ON comanda(status);
+CREATE INDEX IF NOT EXISTS idx_comanda_data ON comanda(data);
 
-CREATE INDEX IF NOT EXISTS idx_item_comanda_comanda ON item_comanda(id_comanda);
+-- (comanda, item): os itens de uma comanda em ordem, página a página, só pelo
+-- índice; substitui o antigo índice só em id_comanda
+DROP INDEX IF EXISTS idx_item_comanda_comanda;
+CREATE INDEX IF NOT EXISTS idx_item_comanda_comanda_item ON item_comanda(id_comanda, id_item_comanda);
 CREATE INDEX IF NOT EXISTS idx_item_comanda_produto ON item_comanda(id_produto);
 
 CREATE INDEX IF NOT EXISTS idx_reserva_cpf_cliente ON reserva(cpf_cliente);
 CREATE INDEX IF NOT EXISTS idx_reserva_campo ON reserva(id_campo);
 CREATE INDEX IF NOT EXISTS idx_reserva_status ON reserva(status);
+CREATE INDEX IF NOT EXISTS idx_reserva_data ON reserva(data);
 
 CREATE INDEX IF NOT EXISTS idx_compra_cpf_cliente ON compra(cpf_cliente);
+CREATE INDEX IF NOT EXISTS idx_compra_data ON compra(data);
 
-CREATE INDEX IF NOT EXISTS idx_item_compra_compra ON item_compra(id_compra);
+DROP INDEX IF EXISTS idx_item_compra_compra;
+CREATE INDEX IF NOT EXISTS idx_item_compra_compra_item ON item_compra(id_compra, id_item_compra);
 CREATE INDEX IF NOT EXISTS idx_item_compra_produto ON item_compra(id_produto);
 
 CREATE INDEX IF NOT EXISTS idx_estoque_produto ON estoque(id_produto);
 
 CREATE INDEX IF NOT EXISTS idx_movimenta_estoque ON movimenta(id_estoque);
+CREATE INDEX IF NOT EXISTS idx_movimenta_data ON movimenta(data);
 
 CREATE INDEX IF NOT EXISTS idx_pag_comanda_pagamento ON pag_comanda(id_pagamento);
 CREATE INDEX IF NOT EXISTS idx_pag_comanda_comanda ON pag_comanda(id_comanda);
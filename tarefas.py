@@ -0,0 +1,47 @@
+import threading
+from db import get_db_connection, get_db_cursor, release_db_connection
+
+class TarefaPeriodica:
+    """Thread que executa `funcao(cursor)` a cada `intervalo` segundos.
+
+    Cada execução usa uma conexão do pool; a função confirma a própria
+    transação e erros são registrados sem interromper a tarefa.
+    Intervalo <= 0 desliga a tarefa.
+    """
+
+    def __init__(self, nome, intervalo, funcao):
+        self.nome = nome
+        self.intervalo = intervalo
+        self.funcao = funcao
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        if self.intervalo <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name=self.nome, daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                conn = get_db_connection()
+            except Exception as e:
+                print(f"Aviso: {self.nome} não executada ({e})")
+                continue
+            cursor = get_db_cursor(conn)
+            try:
+                self.funcao(cursor)
+            except Exception as e:
+                conn.rollback()
+                print(f"Aviso: falha em {self.nome} ({e})")
+            finally:
+                cursor.close()
+                release_db_connection(conn)
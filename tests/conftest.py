@@ -0,0 +1,32 @@
+import os
+import sys
+import pytest
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+# Os testes usam o banco de db.DB_CONFIG; as variáveis padrão do PostgreSQL
+# (PGHOST, PGPORT, PGUSER, PGPASSWORD, PGDATABASE) sobrescrevem a configuração
+_VARIAVEIS = {
+    "PGHOST": "host",
+    "PGPORT": "port",
+    "PGUSER": "user",
+    "PGPASSWORD": "password",
+    "PGDATABASE": "database",
+}
+for variavel, chave in _VARIAVEIS.items():
+    if variavel in os.environ:
+        db.DB_CONFIG[chave] = os.environ[variavel]
+
+@pytest.fixture(scope="session")
+def banco():
+    """Pula o teste se o banco não estiver acessível"""
+    try:
+        psycopg2.connect(**db.DB_CONFIG).close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"banco indisponível: {e}")
+    db.get_db_pool()
+    yield
+    db.close_db_pool()
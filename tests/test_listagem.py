@@ -0,0 +1,43 @@
+import asyncio
+from listagem import exportar
+import db
+
+CONSULTA = "SELECT n FROM generate_series(1, 5000) AS n"
+
+def _em_uso():
+    return db.get_pool_stats()["in_use"]
+
+def test_exportar_devolve_conexao_quando_cliente_desconecta(banco, monkeypatch):
+    monkeypatch.setattr("listagem.EXPORT_CHUNK_SIZE", 100)
+    antes = _em_uso()
+    resposta = exportar(CONSULTA, "n", "ndjson", "numeros")
+    assert _em_uso() == antes + 1
+
+    async def desconectar_no_meio():
+        # Cliente lê dois blocos e desconecta: o gerador não é retomado e o
+        # Starlette só executa a tarefa de fundo da resposta
+        await resposta.body_iterator.__anext__()
+        await resposta.body_iterator.__anext__()
+        assert _em_uso() == antes + 1
+        await resposta.background()
+        assert _em_uso() == antes
+        # Finalizar o gerador depois não devolve a conexão uma segunda vez
+        await resposta.body_iterator.aclose()
+
+    asyncio.run(desconectar_no_meio())
+    assert _em_uso() == antes
+    assert db.get_pool_stats()["idle"] >= 1
+
+def test_exportar_devolve_conexao_ao_fim_do_stream(banco):
+    antes = _em_uso()
+    resposta = exportar(CONSULTA, "n", "csv", "numeros")
+
+    async def consumir():
+        blocos = [bloco async for bloco in resposta.body_iterator]
+        await resposta.background()
+        return "".join(blocos)
+
+    corpo = asyncio.run(consumir())
+    assert corpo.splitlines()[0] == "n"
+    assert len(corpo.splitlines()) == 5001
+    assert _em_uso() == antes
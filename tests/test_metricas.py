@@ -0,0 +1,27 @@
+from fastapi import FastAPI, APIRouter
+from fastapi.testclient import TestClient
+from metricas import MetricasMiddleware, REQUISICOES, ROTA_DESCONHECIDA
+
+def _app():
+    router = APIRouter()
+
+    @router.get("/itens/{id_item}")
+    def get_item(id_item: int):
+        return {"id_item": id_item}
+
+    app = FastAPI()
+    app.add_middleware(MetricasMiddleware)
+    app.include_router(router, prefix="/api/teste-metricas")
+    return app
+
+def test_rotulo_da_rota_inclui_prefixo_do_router():
+    cliente = TestClient(_app())
+    assert cliente.get("/api/teste-metricas/itens/7").status_code == 200
+    assert cliente.get("/api/teste-metricas/itens/8").status_code == 200
+    assert REQUISICOES.valores()[("GET", "/api/teste-metricas/itens/{id_item}", "200")] == 2
+
+def test_rota_inexistente_usa_rotulo_fixo():
+    cliente = TestClient(_app())
+    antes = REQUISICOES.valores().get(("GET", ROTA_DESCONHECIDA, "404"), 0)
+    assert cliente.get("/api/teste-metricas/nada/123").status_code == 404
+    assert REQUISICOES.valores()[("GET", ROTA_DESCONHECIDA, "404")] == antes + 1
@@ -0,0 +1,86 @@
+import os
+import time
+from psycopg2 import sql
+from tarefas import TarefaPeriodica
+from cache import invalidar_cache
+from notificacoes import CANAL
+
+# Intervalo (segundos) entre verificações de views materializadas desatualizadas
+MATVIEW_REFRESH_INTERVALO = float(os.environ.get('MATVIEW_REFRESH_INTERVALO', 5))
+
+# Views materializadas mantidas pelo job (sql/create_database_complete.sql)
+VISOES_MATERIALIZADAS = ("mv_reservas_detalhe",)
+
+# Chave base dos advisory locks: um refresh por view entre todos os processos
+_LOCK_VISOES = 7210024
+
+def atualizar_visao(cursor, nome, forcar=False):
+    """REFRESH MATERIALIZED VIEW CONCURRENTLY se houver alterações pendentes.
+
+    Retorna a duração em ms, ou None se não havia o que atualizar (ou outro
+    processo já está atualizando a mesma view).
+    """
+    conn = cursor.connection
+    cursor.execute(
+        "SELECT pg_try_advisory_xact_lock(%s, %s) AS obtido",
+        (_LOCK_VISOES, VISOES_MATERIALIZADAS.index(nome)),
+    )
+    if not cursor.fetchone()["obtido"]:
+        conn.rollback()
+        return None
+    # Leitores continuam usando a versão anterior durante o refresh
+    cursor.execute("DELETE FROM visao_pendente WHERE nome = %s", (nome,))
+    if cursor.rowcount == 0 and not forcar:
+        conn.rollback()
+        return None
+    inicio = time.perf_counter()
+    cursor.execute(sql.SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY {}").format(sql.Identifier(nome)))
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+    cursor.execute(
+        sql.SQL("""
+        INSERT INTO visao_atualizacao (nome, atualizada_em, duracao_ms, linhas)
+        VALUES (%s, NOW(), %s, (SELECT COUNT(*) FROM {}))
+        ON CONFLICT (nome) DO UPDATE
+        SET atualizada_em = EXCLUDED.atualizada_em, duracao_ms = EXCLUDED.duracao_ms, linhas = EXCLUDED.linhas
+        """).format(sql.Identifier(nome)),
+        (nome, round(duracao_ms, 3)),
+    )
+    # Respostas e ETags das rotas que leem a view só mudam com o refresh; o
+    # NOTIFY avisa os demais processos (notificacoes.py invalida o cache deles)
+    invalidar_cache(conn, nome)
+    cursor.execute("SELECT pg_notify(%s, json_build_object('tabela', %s::text, 'operacao', 'refresh')::text)", (CANAL, nome))
+    conn.commit()
+    return duracao_ms
+
+def situacao_visoes(cursor):
+    """Última atualização, duração e atraso (alteração pendente mais antiga) de cada view"""
+    cursor.execute(
+        """
+        SELECT v.nome, a.atualizada_em, a.duracao_ms, a.linhas,
+               pg_total_relation_size(v.nome::regclass) AS tamanho_bytes,
+               COALESCE(p.pendentes, 0) AS pendentes, p.pendente_desde,
+               COALESCE(EXTRACT(EPOCH FROM clock_timestamp() - p.pendente_desde), 0)::float AS atraso_segundos
+        FROM unnest(%s::text[]) AS v(nome)
+        LEFT JOIN visao_atualizacao a ON a.nome = v.nome
+        LEFT JOIN (
+            SELECT nome, COUNT(*) AS pendentes, MIN(alterada_em) AS pendente_desde
+            FROM visao_pendente
+            GROUP BY nome
+        ) p ON p.nome = v.nome
+        ORDER BY v.nome
+        """,
+        (list(VISOES_MATERIALIZADAS),),
+    )
+    return [dict(row) for row in cursor.fetchall()]
+
+def _atualizar_em_segundo_plano(cursor):
+    for nome in VISOES_MATERIALIZADAS:
+        atualizar_visao(cursor, nome)
+
+atualizador = TarefaPeriodica("atualizador-visoes", MATVIEW_REFRESH_INTERVALO, _atualizar_em_segundo_plano)
+
+def iniciar_atualizacao_visoes():
+    atualizador.iniciar()
+
+def parar_atualizacao_visoes():
+    atualizador.parar()